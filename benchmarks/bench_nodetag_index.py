@@ -0,0 +1,49 @@
+# Benchmark of the node tag -> node index map of createIN (gmsafir.py), which replaced allNodeTags.index()
+# Synthetic non-contiguous node tags (as after a partial remeshing), 1e4 to 1e6 nodes: build of the map, then one lookup per node of the elems
+# The time per node must stay about constant (linear scaling); the old allNodeTags.index() is timed up to 1e4 nodes only (quadratic)
+# Usage: python benchmarks/bench_nodetag_index.py [-old]
+import sys
+import time
+import numpy as np
+
+
+def buildIndex(allNodeTags):
+    # same code as in createIN
+    nnodes=len(allNodeTags)
+    allNodeTags_index=np.full(int(allNodeTags.max())+1,-1,dtype=np.int64)
+    allNodeTags_index[allNodeTags]=np.arange(nnodes,dtype=np.int64)
+    return allNodeTags_index
+
+
+def main():
+    rng=np.random.default_rng(0)
+    timeold="-old" in sys.argv[1:]
+    print("%10s %12s %12s %14s %14s" % ("nodes","build (s)","lookup (s)","per node (us)","index() (s)"))
+    perNode=[]
+    for nnodes in [10**4,10**5,10**6]:
+        allNodeTags=np.sort(rng.choice(3*nnodes,nnodes,replace=False))+1 # non-contiguous tags
+        rng.shuffle(allNodeTags)
+        elemNodeTags=rng.choice(allNodeTags,(2*nnodes,4)) # 4 nodes per elem, 2 elems per node
+        #
+        t0=time.perf_counter()
+        allNodeTags_index=buildIndex(allNodeTags)
+        t1=time.perf_counter()
+        elemNodes=allNodeTags_index[elemNodeTags]
+        t2=time.perf_counter()
+        assert (allNodeTags[elemNodes]==elemNodeTags).all()
+        perNode.append((t2-t0)/nnodes*1e6)
+        #
+        told=""
+        if(timeold and nnodes<=10**4):
+            tags=allNodeTags.tolist()
+            t3=time.perf_counter()
+            oldNodes=[[tags.index(k) for k in ielem] for ielem in elemNodeTags.tolist()]
+            told="%.3f" % (time.perf_counter()-t3)
+            assert (np.array(oldNodes)==elemNodes).all()
+        print("%10d %12.4f %12.4f %14.4f %14s" % (nnodes,t1-t0,t2-t1,perNode[-1],told))
+    #
+    print("Time per node, 1e6 vs 1e4 nodes: x%.1f (linear scaling: about 1, quadratic: 100)" % (perNode[-1]/perNode[0]))
+
+
+if __name__ == "__main__":
+    main()
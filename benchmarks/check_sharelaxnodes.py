@@ -0,0 +1,91 @@
+# Comparison of the Beam 4th nodes of gmsafir.py with and without the option -sharelaxnodes, on synthetic Structural 3D models
+# Straight Beam entities on a few lines far from the origin (some reversed, several y'), plus curved entities (never shared)
+# For every Beam elem, the local axes x', y', z' given to SAFIR (plane of the nodes 1, 2 and 4) must be the same with and without the option
+# getBeamLAXNodes and getSharedLAXNode are taken from gmsafir.py without importing it (no gmsh needed)
+# Usage: python benchmarks/check_sharelaxnodes.py
+import ast
+import os
+import sys
+import types
+import numpy as np
+from numpy import linalg as LA
+
+src=open(os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","gmsafir.py")).read()
+cls=[k for k in ast.parse(src).body if isinstance(k,ast.ClassDef) and k.name=="Myapp"][0]
+fns=[k for k in cls.body if isinstance(k,ast.FunctionDef) and k.name in ("getBeamLAXNodes","getSharedLAXNode")]
+ns={"np":np,"LA":LA}
+exec(compile(ast.Module(fns,[]),"gmsafir.py","exec"),ns)
+
+
+# Beam elems of a random model: entity, end points, (entity, LAX) and local axes of the entities (as getBeamsLAX)
+def getModel(rng,nents=60,nlines=5,offset=1.e4):
+    bents=[];P1s=[];P2s=[];entlaxs=[];beamslax={}
+    lines=[(offset*rng.uniform(-1,1,3),rng.normal(size=3)) for _ in range(nlines)]
+    yrefs=[np.array([0.,0.,1.]),np.array([1.,0.,0.])]
+    for ient in range(1,nents+1):
+        A,d=lines[rng.integers(nlines)]
+        d=d/LA.norm(d)
+        n=int(rng.integers(1,5))
+        ts=float(rng.integers(0,30))+np.concatenate(([0.],np.cumsum(rng.uniform(0.5,1.5,n))))
+        pts=[A+t*d for t in ts]
+        if(ient%5==0):
+            pts=pts[::-1] # reversed entity on the same line
+        if(ient%7==0):
+            pts=[p+np.array([0.,0.,0.3*np.sin(j)]) for j,p in enumerate(pts)] # curved entity
+        X=(pts[-1]-pts[0])/LA.norm(pts[-1]-pts[0])
+        ilax=ient%2
+        Y=yrefs[ilax]-np.dot(yrefs[ilax],X)*X
+        Y=Y/LA.norm(Y)
+        beamslax[(ient,ilax)]=(0.5*(pts[0]+pts[-1]),X,Y,np.cross(X,Y),0)
+        for j in range(n):
+            bents.append(ient);P1s.append(pts[j]);P2s.append(pts[j+1]);entlaxs.append((ient,ilax))
+    return np.array(bents),np.array(P1s),np.array(P2s),entlaxs,beamslax
+
+
+# Node table of the Beams as built in createIN: middle node of each elem, followed by the new 4th node if any
+# Returns the coordinates of all the nodes and the (node 3, node 4) numbers of each elem
+def getBeamNodes(share,bents,P1s,P2s,entlaxs,beamslax,nnodes):
+    app=types.SimpleNamespace(shareLAXNodes=share,checkLAXResult=lambda laxres: tuple(laxres[2]))
+    app.getSharedLAXNode=types.MethodType(ns["getSharedLAXNode"],app)
+    P3=(P1s+P2s)/2
+    node4s,isnew4,P4,nshared=ns["getBeamLAXNodes"](app,bents,P1s,P2s,P3,entlaxs,beamslax,nnodes)
+    node3s=nnodes+1+np.arange(len(bents))+np.cumsum(isnew4)-isnew4
+    nodes=np.zeros((nnodes+len(bents)+len(P4),3))
+    nodes[node3s-1]=P3
+    for k in P4:
+        nodes[node3s[k]]=P4[k]
+    return nodes,node3s,np.array([node4s[int(k)] for k in bents]),nshared
+
+
+# Local axes of each elem as defined by SAFIR: x' from node 1 to node 2, y' towards node 4 in the plane of the nodes 1, 2, 4
+def getElemAxes(nodes,P1s,P2s,node4s):
+    X=(P2s-P1s)/LA.norm(P2s-P1s,axis=1)[:,None]
+    v=nodes[node4s-1]-P1s
+    Y=v-np.sum(v*X,axis=1)[:,None]*X
+    Y=Y/LA.norm(Y,axis=1)[:,None]
+    return X,Y,np.cross(X,Y)
+
+
+def main():
+    rng=np.random.default_rng(0)
+    nnodes=100
+    ok=True
+    for itrial in range(20):
+        bents,P1s,P2s,entlaxs,beamslax=getModel(rng)
+        nodes0,node3s0,node4s0,_=getBeamNodes(False,bents,P1s,P2s,entlaxs,beamslax,nnodes)
+        nodes1,node3s1,node4s1,nshared=getBeamNodes(True,bents,P1s,P2s,entlaxs,beamslax,nnodes)
+        axes0=getElemAxes(nodes0,P1s,P2s,node4s0)
+        axes1=getElemAxes(nodes1,P1s,P2s,node4s1)
+        err=max([float(np.max(LA.norm(a0-a1,axis=1))) for a0,a1 in zip(axes0,axes1)])
+        L=LA.norm(P2s-P1s,axis=1)
+        dist0=np.max(LA.norm(nodes0[node4s0-1]-nodes0[node3s0-1],axis=1)/L)
+        dist1=np.max(LA.norm(nodes1[node4s1-1]-nodes1[node3s1-1],axis=1)/L)
+        print("model %2d: %2d/%d entities share a 4th node, %d nodes instead of %d, max |axes(on)-axes(off)| = %.1e, max distance node 4 - node 3 / elem length: %.1f (off) %.1f (on)"
+              % (itrial,nshared,len(set(bents.tolist())),len(nodes1),len(nodes0),err,dist0,dist1))
+        ok=ok and err<1e-9 and nshared>0
+    print("OK: same local axes for every Beam elem with and without -sharelaxnodes" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
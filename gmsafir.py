@@ -13,16 +13,152 @@ from datetime import datetime
 import numpy as np
 from numpy import linalg as LA
 import subprocess
+import multiprocessing
+import hashlib
+import contextlib
+import tempfile
+import shutil
 import matplotlib as mpl
 import matplotlib.pylab as plt
 import random
 import ezdxf
 from collections import defaultdict
 
+# Records of one section of the .IN file, stored by typed columns instead of one dict per line
+# The format of the section drives both the storage and the writing, in free format (space separated):
+#   A: text (int32 codes in a table of the distinct texts), I: integer (int64), Fw.d: real (float64) written with d decimals, G: real (float64) written exactly
+#   A repeat count gives several columns (8G), 'n' a variable number of values at the end of the line (nG)
+# The columns grow by doubling up to blocksize lines, then the block is formatted and spooled to a temporary file in spooldir (None: default temporary directory) and the columns are reused:
+#  only one block per section is kept in memory, the .IN file is then assembled by copying the spooled sections
+class INRecords:
+    dtypes={'A':np.int32,'I':np.int64,'F':np.float64,'G':np.float64}
+
+    def __init__(self,fmt,spooldir=None,blocksize=100000):
+        self.fmt=fmt
+        self.spooldir=spooldir
+        self.blocksize=blocksize
+        self.coltypes=[];convs=[]
+        self.tailtype=None;self.tailconv=""
+        for itok in fmt.strip("()").split(","):
+            m=re.match(r"^(n|\d*)([AIFG])\d*(?:\.(\d+))?$",itok.strip())
+            if(m==None or self.tailtype!=None):
+                raise ValueError("Unsupported format for the .IN file: "+fmt)
+            conv={'A':"%s",'I':"%d",'F':"%."+str(m.group(3) or 0)+"f",'G':"%r"}[m.group(2)]
+            if(m.group(1)=="n"):
+                self.tailtype=m.group(2);self.tailconv=conv
+            else:
+                self.coltypes+=int(m.group(1) or 1)*[m.group(2)]
+                convs+=int(m.group(1) or 1)*[conv]
+        self.template=" ".join(convs)
+        self.texts=[{} for k in self.coltypes] # text -> code, for each text column
+        self.tailtexts={}
+        self.capacity=min(1024,blocksize)
+        self.cols=[np.empty(self.capacity,dtype=INRecords.dtypes[k]) for k in self.coltypes]
+        self.tailcounts=np.zeros(self.capacity,dtype=np.int32)
+        self.tailvals=np.empty(self.capacity if self.tailtype!=None else 0,dtype=INRecords.dtypes.get(self.tailtype,np.float64))
+        self.ntail=0 # number of values in tailvals
+        self.n=0 # number of lines in the columns
+        self.nrows=0
+        self.spool=None # temporary file of the formatted full blocks
+
+    def getCode(self,table,val):
+        return table.setdefault(val,len(table))
+
+    def grow(self):
+        self.capacity=min(2*self.capacity,self.blocksize)
+        self.cols=[np.resize(col,self.capacity) for col in self.cols]
+        self.tailcounts=np.resize(self.tailcounts,self.capacity)
+
+    def append(self,row):
+        nfix=len(self.coltypes)
+        if(len(row)<nfix or (self.tailtype==None and len(row)>nfix)):
+            raise ValueError("Line of "+str(len(row))+" values for the format "+self.fmt+" of the .IN file")
+        if(self.n==self.capacity):
+            self.grow()
+        for k in range(nfix):
+            self.cols[k][self.n]=self.getCode(self.texts[k],row[k]) if self.coltypes[k]=='A' else row[k]
+        if(self.tailtype!=None):
+            ntl=len(row)-nfix
+            if(self.ntail+ntl>len(self.tailvals)):
+                self.tailvals=np.resize(self.tailvals,2*(self.ntail+ntl))
+            for k in range(ntl):
+                self.tailvals[self.ntail+k]=self.getCode(self.tailtexts,row[nfix+k]) if self.tailtype=='A' else row[nfix+k]
+            self.tailcounts[self.n]=ntl
+            self.ntail+=ntl
+        self.n+=1
+        self.nrows+=1
+        if(self.n==self.blocksize):
+            self.flush()
+
+    # Many lines at once (no variable part): one value or one array per column
+    def extend(self,cols):
+        m=max([len(col) for col in cols if np.ndim(col)>0]+[0])
+        i0=0
+        while(i0<m):
+            while(self.n==self.capacity and self.capacity<self.blocksize):
+                self.grow()
+            i1=min(m,i0+self.capacity-self.n)
+            for k,col in enumerate(cols):
+                if(self.coltypes[k]=='A'):
+                    col=self.getCode(self.texts[k],col) if np.ndim(col)==0 else [self.getCode(self.texts[k],v) for v in col[i0:i1]]
+                elif(np.ndim(col)>0):
+                    col=col[i0:i1]
+                self.cols[k][self.n:self.n+i1-i0]=col
+            self.tailcounts[self.n:self.n+i1-i0]=0
+            self.n+=i1-i0
+            self.nrows+=i1-i0
+            i0=i1
+            if(self.n==self.blocksize):
+                self.flush()
+
+    def flush(self):
+        if(self.n>0):
+            if(self.spool==None):
+                self.spool=tempfile.TemporaryFile('w+',dir=self.spooldir)
+            self.spool.seek(0,os.SEEK_END)
+            self.spool.write(self.formatBlock([col[0:self.n] for col in self.cols],self.tailcounts[0:self.n],self.tailvals[0:self.ntail]))
+            self.n=0
+            self.ntail=0
+
+    def __len__(self):
+        return self.nrows
+
+    def __repr__(self):
+        return "INRecords("+self.fmt+", "+str(self.nrows)+" lines)"
+
+    # Text of the lines of one block, formatted with the line template of the section (as numpy.savetxt)
+    def formatBlock(self,cols,tailcounts,tailvals):
+        texts=[list(table) for table in self.texts]
+        vals=[[texts[k][c] for c in col.tolist()] if self.coltypes[k]=='A' else col.tolist() for k,col in enumerate(cols)]
+        if(self.tailtype==None):
+            template=self.template+"\n"
+            return "".join([template % r for r in zip(*vals)])
+        tailtexts=list(self.tailtexts)
+        tailvals=[tailtexts[c] for c in tailvals.tolist()] if self.tailtype=='A' else tailvals.tolist()
+        templates={}
+        txt=[];i0=0
+        for r,ntl in zip(zip(*vals),tailcounts.tolist()):
+            if not ntl in templates:
+                templates[ntl]=" ".join([self.template]*(self.template!="")+[self.tailconv]*ntl)+"\n"
+            txt.append(templates[ntl] % (r+tuple(tailvals[i0:i0+ntl])))
+            i0+=ntl
+        return "".join(txt)
+
+    # Copy of the section in the file f: spooled blocks, then the current block
+    def writeTo(self,f):
+        if(self.spool!=None):
+            self.spool.seek(0)
+            shutil.copyfileobj(self.spool,f)
+        f.write(self.formatBlock([col[0:self.n] for col in self.cols],self.tailcounts[0:self.n],self.tailvals[0:self.ntail]))
+
+
 class Myapp: # Use of class only in order to share 'params' as a global variable with the "event manager" below (not working properly without class)
     def __init__(self, parent=None):
 
-        gmsh.initialize(sys.argv)
+        # GmSAFIR own command line options (-nworkers=N,...) are interpreted in getCmdLine and not passed to gmsh
+        self.cmdopts=[k for k in sys.argv[1:] if re.search("^(-nworkers=|-rebuild$|-meshcache$|-sharelaxnodes$)",k)!=None]
+        self.argv=[k for k in sys.argv if not k in self.cmdopts]
+        gmsh.initialize(self.argv)
 
         self.version="2026-08-13"
         self.authors0="Univ. of Liege & Efectis France"
@@ -47,6 +183,7 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
 
         #General Lists
         self.listMats=[]
+        self.listMatsIdx={} # "name;shp" -> index in self.listMats, kept in sync with self.listMats (see updateMatsIdx)
         #
         self.listLAX=[]
         self.laxid=0
@@ -71,6 +208,19 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
 
         # for subroutine CreatIN: Correspondence btw flag of elemType and number of nodes in the element
         self.allElemTypesNbNodes={15:1,1:2,2:3,3:4,4:4,5:8,6:6}
+        # for subroutine CreatIN: Local node numbers of the faces of each elemType, in the order of the faces in SAFIR
+        self.allElemTypesFaces={
+            1:[[0,1]], # lines
+            2:[[0,1],[1,2],[2,0]], # triangles
+            3:[[0,1],[1,2],[2,3],[3,0]], # quadrangles
+            4:[[0,2,1],[0,3,2],[0,1,3],[1,2,3]], # tets
+            5:[[0,4,7,3],[2,3,7,6],[1,2,6,5],[0,1,5,4],[0,3,2,1],[4,5,6,7]], # hexas
+            6:[[0,3,5,2],[1,2,5,4],[0,1,4,3],[0,2,1],[3,4,5]]} # prisms
+        # for subroutine CreatIN: size of the .IN file buffer (bytes) and number of lines formatted at once by writeBlockFortran
+        self.INbufsize=8*1024*1024
+        self.INblocksize=100000
+        self.sectFileMeta={} # Metadata of the section files (.TEM/.TSH), key: path|mtime|size, see getSectionFileMeta
+        self.sectCacheFile="gmsafir.sectcache.json" # Batch mode: persistent version of sectFileMeta, in the directory of the cases (next to the .IN files)
         #
         self.nopopup=False
         self.go_on=True
@@ -79,6 +229,14 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
         self.previousErrors=[] # check existing errors before launching the IN file creation
         self.g4sfileError="" # check existing errors before overwriting the G4S file
         self.geofile=""
+        self.nworkers=os.cpu_count() or 1 # Batch mode: number of cases processed in parallel
+        self.rebuildAll=False # Batch mode: rebuild all cases, even if their inputs did not change
+        self.shareLAXNodes=False # Struct 3D: straight 3D Beams with a same 4th node position and y' share their 4th node (see getSharedLAXNode)
+        self.meshCache=False # Save the generated mesh next to the GEO file and reuse it when the geometry and the mesh options did not change
+        self.meshCachePending=False # GUI: the GEO file has just been opened without cached mesh, its first generated mesh is saved in the cache (see eventLoop)
+        self.meshCacheOpts=["Mesh.Algorithm","Mesh.Algorithm3D","Mesh.RecombineAll","Mesh.RecombinationAlgorithm","Mesh.SubdivisionAlgorithm","Mesh.ElementOrder",
+                            "Mesh.MeshSizeFactor","Mesh.MeshSizeMin","Mesh.MeshSizeMax","Mesh.MeshSizeFromPoints","Mesh.MeshSizeFromCurvature","Mesh.MeshSizeExtendFromBoundary",
+                            "Mesh.Smoothing","Mesh.Optimize","Mesh.OptimizeNetgen","Mesh.RandomFactor","Mesh.RandomSeed"] # Mesh options taken into account in the mesh cache key
         self.getCmdLine() # Interpret the command line parameters
         #
         if not self.go_on: #  Error found in the command line parameters
@@ -426,15 +584,40 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
             3/ GUI mode: python gmsafir.py [directory name containing 0 or 1 GEO file]
             4/ Batch mode: python gmsafir.py [full_path_directory] -nopopup: process all couples (GEO,G4S) found in the directory
             5/ Batch mode: python gmsafir.py [full_path_G4Sfile] -nopopup: process all GEO files found in the directory with this G4S file
+            Options in GUI and Batch modes:
+               -sharelaxnodes: Structural 3D, straight Beams on a same line with a same local axis y' share their 4th node (smaller NNODE)
+               -meshcache: save the generated mesh ([case].gmsafir.msh) and reload it instead of regenerating it when the GEO file, the files it includes/merges and the mesh options did not change
+            Options in Batch mode (after -nopopup):
+               -nworkers=N: number of cases processed in parallel (default: number of cores), each case in its own process, with its own log [case].gmsafir.log
+               -rebuild: rebuild all cases (by default, a case is skipped when its GEO, G4S, the files they reference (Include/Merge, TEM/TSH...) and options did not change since its last build, see [case].gmsafir.build)
             """
 
         outmsg=""
+        # GmSAFIR own options
+        for iopt in self.cmdopts:
+            if(iopt=="-meshcache"):
+                self.meshCache=True
+            elif(iopt=="-sharelaxnodes"):
+                self.shareLAXNodes=True
+            elif(not "-nopopup" in self.argv):
+                msg="-- Option only available in Batch mode: "+iopt+" -- "
+                gmsh.logger.write(msg+"\n"+msg0, level="error")
+                self.go_on=False
+            elif(re.search("^-nworkers=[0-9]+$",iopt)!=None and int(iopt.split("=")[1])>0):
+                self.nworkers=int(iopt.split("=")[1])
+            elif(iopt=="-rebuild"):
+                self.rebuildAll=True
+            else:
+                msg="-- Incorrect option in command line: "+iopt+" -- "
+                gmsh.logger.write(msg+"\n"+msg0, level="error")
+                self.go_on=False
+
         # GUI MODE
-        if(not "-nopopup" in sys.argv):
+        if(not "-nopopup" in self.argv):
 
             # Manage input file
-            if len(sys.argv)==2:
-                arg0=sys.argv[1]
+            if len(self.argv)==2:
+                arg0=self.argv[1]
 
                 if("-help" in arg0):
                     msg=""
@@ -448,6 +631,7 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                         gmsh.logger.write("Ok, this .geo file does exist - The run directory is the directory containing this geofile", level="info")
                         try:
                             gmsh.open(self.geofile)
+                            self.openMeshCache(self.geofile)
                         except Exception as e:
                             gmsh.fltk.update()
                             gmsh.logger.write("Error when opening GEO file "+self.geofile+": "+str(e), level="error")
@@ -470,7 +654,7 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                             gmsh.logger.write("Ok, found a single GEO file in this directory, "+os.path.basename(self.geofile)+" - It will be used", level="info")
                             try:
                                 gmsh.open(self.geofile)
-
+                                self.openMeshCache(self.geofile)
                             except Exception as e:
                                 gmsh.fltk.update()
                                 gmsh.logger.write("Error when opening GEO file "+self.geofile+": "+str(e), level="error")
@@ -496,7 +680,7 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                     gmsh.logger.write(msg+"\n"+msg0, level="error")
                     self.go_on=False
             #
-            elif len(sys.argv)==1:
+            elif len(self.argv)==1:
                 #gmsh.logger.write("Start with no parameters", level="info")
                 self.dir=os.getcwd()
                 tmpfiles=[k for k in os.listdir(self.dir) if (re.search('.geo$',k)!=None)]
@@ -508,6 +692,7 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                         gmsh.logger.write("Ok, found a single GEO file in this directory, "+os.path.basename(self.geofile)+" - It will be used", level="info")
                         try:
                             gmsh.open(self.geofile)
+                            self.openMeshCache(self.geofile)
                         except Exception as e:
                             #gmsh.open()
                             gmsh.fltk.update()
@@ -529,9 +714,9 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
     #                 gmsh.open(self.geofile)
             #
 
-            elif len(sys.argv)==3:
-                arg0=sys.argv[1]
-                arg1=sys.argv[2]
+            elif len(self.argv)==3:
+                arg0=self.argv[1]
+                arg1=self.argv[2]
                 if(arg1!="-nopopup" or (not os.path.isdir(arg0))):
                     msg="-- Incorrect parameters in command line -- "
                     gmsh.logger.write(msg+"\n"+msg0, level="error")
@@ -556,9 +741,9 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
 
         # BATCH MODE
         else:
-            if len(sys.argv)==3:
-                arg0=sys.argv[1]
-                arg1=sys.argv[2]
+            if len(self.argv)==3:
+                arg0=self.argv[1]
+                arg1=self.argv[2]
                 if(arg1!="-nopopup"):
                     msg="-- Incorrect parameters in command line -- "
                     gmsh.logger.write(msg+"\n"+msg0, level="error")
@@ -1009,6 +1194,7 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
             tmp2=self.getDBValue(self.contextDB,[("children","name",self.allShapes[i]),("children","name",self.pbType),("children","name","New Material Definition")],False)
             rc=self.recursActionContextDB(tmp2,'list_names\tmat;'+str(i),self.listMats)
             self.listMats= sorted(self.listMats, key=lambda d: (list(d.keys())[0].upper(),list(d.keys())[0]))
+        self.updateMatsIdx()
         #
         print("self.listMats=",self.listMats)
         #exit(127)
@@ -1022,6 +1208,20 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
 
 
 
+    # Global material index: "name;shp" -> index in self.listMats (first one if duplicated, as for idxInGeneralList)
+    def updateMatsIdx(self):
+        self.listMatsIdx={}
+        for i in range(len(self.listMats)):
+            self.listMatsIdx.setdefault(list(self.listMats[i].keys())[0].split('/')[0],i)
+
+
+    def getGlobalMatIdx(self,imat,ishp): # ishp: dim of the shape (1: Beam/Truss/Rebar, 2: Shell, 3: Solid)
+        ikey=imat+";"+str(ishp)
+        if not ikey in self.listMatsIdx:
+            raise ValueError("Material "+ikey+" not found in the list of materials")
+        return self.listMatsIdx[ikey]
+
+
     def idxInGeneralList(self,tmpl,inam,ishp): # Returns a table with index
         tmpidx=[k for k in range(len(tmpl)) if list(tmpl[k].keys())[0].split("/")[0]==inam+";"+str(self.allShapes.index(ishp))]
         return tmpidx
@@ -1646,7 +1846,184 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
         self.isViewLAX=False
 
 
-    def recreateLAXView(self,ishp):
+    # Definition of a LAX: from self.listLAX[lax_id], or from the current 'New LAX Definition' menu if lax_id is None
+    def getLAXDef(self,lax_id):
+        if lax_id!=None:
+            props=[(list(k.keys())[0],list(k.values())[0]) for k in list(self.listLAX[lax_id].values())[0]]
+        else:
+            tmp0=self.getDBValue(self.contextDB,[("children","name","Curve"),("children","name",self.pbType),("children","name","New LAX Definition"),("children","name","-")],False)
+            props=[(iprop['name'],iprop['values']) for iprop in tmp0['props'] if 'name' in iprop and 'values' in iprop]
+        #
+        def getProp(keys):
+            return [v for k,v in props if [ik for ik in keys if ik in k]!=[]][0][0]
+        #
+        laxdef={}
+        laxdef['checklax']=getProp(["Check=LAX from"])
+        laxdef['reverse_xp']=getProp(["Reverse X","Reverse x"])
+        if(laxdef['checklax']=='YES'):
+            laxdef['theta_degrees']=getProp(["Rotation angle"])
+        else:
+            laxdef['Yp']=getProp(["Y'(dx,dy,dz)","y'(dx,dy,dz)"]).split(',')
+        return laxdef
+
+
+    # Local axes (x',y',z') of straight Beams from their end points P1,P2 (n x 3), for one LAX definition - vectorized on the Beams
+    # Returns Xp,Yp,Zp (n x 3) and an error code per Beam (0: ok, 1: user-defined y' is zero, 2: user-defined y' colinear with the tangent, y' returned as given)
+    def computeLAX(self,P1,P2,laxdef):
+        nb=P1.shape[0]
+        ierr=np.zeros(nb,dtype=np.int32)
+        Xp=P2-P1
+        if(laxdef['reverse_xp']==1):
+            Xp=-Xp
+        Xp=Xp/LA.norm(Xp,axis=1)[:,None]
+        #
+        if(laxdef['checklax']=='YES'): #4th point determined by LAX with rotation angle
+            X=np.array([1, 0, 0], dtype=np.float64)
+            Y=np.array([0, 1, 0], dtype=np.float64)
+            Z=np.array([0, 0, 1], dtype=np.float64)
+            theta_degrees=laxdef['theta_degrees']
+            if(theta_degrees!=0):
+                theta=theta_degrees/180.*np.pi
+                r0=np.array([[1,0,0],[0,np.cos(theta),-np.sin(theta)],[0,np.sin(theta),np.cos(theta)]])
+                Y=np.dot(r0,Y)
+                Z=np.dot(r0,Z)
+            #
+            # Rotation r from X to Xp (Rodrigues): r.W = W + v x W + v x (v x W).(1-c)/s^2, with v=X x Xp, c=X.Xp, s=|v|
+            v=np.cross(X,Xp)
+            c=np.dot(Xp,X)
+            s=LA.norm(v,axis=1)
+            isrot=s!=0
+            fact=np.zeros(nb)
+            fact[isrot]=(1-c[isrot])/s[isrot]**2
+            rneg=np.array([[-1,0,0],[0,0,1],[0,1,0]]) # Xp=-X: x'=-x,y'=z, z'=y
+            VPs=[]
+            for W in [Y,Z]:
+                Wp=W+np.cross(v,W)+np.cross(v,np.cross(v,W))*fact[:,None] # = W where s=0
+                Wp[(~isrot) & (c<0)]=np.dot(rneg,W)
+                VPs.append(Wp)
+            Yp,Zp=VPs
+        #
+        else:  #4th point determined by LAX with fix coordinates
+            Yp0=np.array([float(laxdef['Yp'][0]), float(laxdef['Yp'][1]), float(laxdef['Yp'][2])], dtype=np.float64)
+            Yp=np.tile(Yp0,(nb,1))
+            Zp=np.zeros((nb,3))
+            if LA.norm(Yp0)==0:
+                ierr[:]=1
+            else:
+                iscol=LA.norm(np.cross(Xp,Yp0),axis=1)==0
+                ierr[iscol]=2
+                ok=~iscol
+                Zp[ok]=np.cross(Xp[ok],Yp0/LA.norm(Yp0))
+                Yp[ok]=np.cross(Zp[ok],Xp[ok]) # new Yp
+        #
+        return Xp,Yp,Zp,ierr
+
+
+    # Local axes of Beam entities (Curves), for a list of (entity, LAX index in self.listLAX or None for the current menu):
+    # end points fetched once per entity, then one vectorized computation per LAX definition
+    # Returns {(ient,lax_id): (P0 middle of the Curve, Xp, Yp, Zp, ierr)}
+    def getBeamsLAX(self,entlaxs):
+        entlaxs=list(dict.fromkeys(entlaxs))
+        P1=np.zeros((len(entlaxs),3));P2=np.zeros((len(entlaxs),3))
+        for k in range(len(entlaxs)):
+            shpedges=gmsh.model.getBoundary([(1, entlaxs[k][0])],combined=False)
+            P1[k]=gmsh.model.getValue(0, abs(int(shpedges[0][1])),[])
+            P2[k]=gmsh.model.getValue(0, abs(int(shpedges[1][1])),[])
+        #
+        laxres={}
+        for lax_id in dict.fromkeys([k[1] for k in entlaxs]):
+            sel=[k for k in range(len(entlaxs)) if entlaxs[k][1]==lax_id]
+            Xp,Yp,Zp,ierr=self.computeLAX(P1[sel],P2[sel],self.getLAXDef(lax_id))
+            for j in range(len(sel)):
+                k=sel[j]
+                laxres[entlaxs[k]]=(0.5*(P1[k]+P2[k]),Xp[j],Yp[j],Zp[j],int(ierr[j]))
+        return laxres
+
+
+    # 4th node of the 3D Beam entities (longer axis of the beam slice), one per entity, added right after the middle node of the first elem of the entity
+    # bents, P1s, P2s, P3: entity, end points and middle point of each Beam elem - entlaxs, beamslax: (entity, LAX) of each elem and their local axes (see getBeamsLAX)
+    # Returns {entity: 4th node number}, the mask of the elems followed by a new 4th node, {elem: coordinates of the new 4th node} and the number of entities sharing a node
+    def getBeamLAXNodes(self,bents,P1s,P2s,P3,entlaxs,beamslax,nnodes):
+        node4s={}
+        isnew4=np.zeros(len(bents),dtype=bool)
+        P4={}
+        laxnodes={};nshared=0
+        curved=set()
+        if(self.shareLAXNodes): # Entities with an elem not on the chord of the Curve are never shared
+            P0s=np.array([beamslax[ilax][0] for ilax in entlaxs]).reshape(-1,3)
+            ds=np.array([beamslax[ilax][1] for ilax in entlaxs]).reshape(-1,3)
+            ds=ds/np.maximum(LA.norm(ds,axis=1),1e-300)[:,None]
+            for Pe in (P1s,P2s):
+                v=Pe-P0s
+                dist=LA.norm(v-np.sum(v*ds,axis=1)[:,None]*ds,axis=1)
+                curved.update(bents[dist>1e-6*np.maximum(LA.norm(v,axis=1),1.)].tolist())
+        #
+        _,bfirsts=np.unique(bents,return_index=True)
+        n4=0
+        for k in np.sort(bfirsts).tolist(): # first elem of each entity, in the order of the elems
+            ientity=int(bents[k])
+            laxres=beamslax[entlaxs[k]]
+            Yp=np.array(self.checkLAXResult(laxres),dtype=np.float64)
+            P4k=P3[k]+Yp
+            #
+            ikey4=None;inode4=-1
+            if(self.shareLAXNodes and laxres[4]==0 and not ientity in curved):
+                P4k,ikey4,inode4=self.getSharedLAXNode(laxnodes,laxres,Yp,P3[k])
+            if(inode4!=-1):
+                node4s[ientity]=inode4
+                nshared+=1
+            else:
+                node4s[ientity]=nnodes+1+k+n4+1 # right after the middle node of elem k
+                isnew4[k]=True
+                P4[k]=P4k
+                n4+=1
+                if(ikey4!=None):
+                    laxnodes[ikey4]=(node4s[ientity],P4k)
+        return node4s,isnew4,P4,nshared
+
+
+    # Option -sharelaxnodes: the 4th node of a straight Beam only defines the plane (x',y') with the Beam axis, it can be shared by the Beams on the same line with the same y'
+    # laxnodes: spatial hash {(line, y') quantized: (node number, node coordinates)} - line: foot of the line from the origin and direction (sign such that its first non-zero component is > 0)
+    # A new 4th node is put as without the option (middle of the first Beam elem of the line + y'), so it stays close to the Beams sharing it
+    # Returns the position of the 4th node, its hash key and the number of the node to share (-1 if none), after verifying that this node gives the same y' to the Beam
+    def getSharedLAXNode(self,laxnodes,laxres,Yp,P3):
+        P0,Xp,_,_,_=laxres
+        d=Xp/LA.norm(Xp)
+        if(d[np.nonzero(np.abs(d)>1e-6)[0][0]]<0):
+            d=-d
+        yp=Yp/LA.norm(Yp)
+        F=P0-np.dot(P0,d)*d
+        ikey4=tuple(np.round(np.concatenate((F,d,yp)),6).tolist())
+        if not ikey4 in laxnodes:
+            return P3+Yp,ikey4,-1
+        #
+        inode4,P4s=laxnodes[ikey4]
+        v=P4s-P3
+        vperp=v-np.dot(v,d)*d
+        if(LA.norm(vperp)==0 or LA.norm(vperp/LA.norm(vperp)-yp)>1e-6):
+            return P3+Yp,ikey4,-1
+        return P4s,ikey4,inode4
+
+
+    # Report the LAX errors of a Beam (see computeLAX) - returns the y' vector as given to SAFIR (4th node offset)
+    # The LAX error flag is only set here: it is cleared once at the start of createIN, so that an error on any Beam of the run blocks the .IN file
+    def checkLAXResult(self,laxres):
+        _,Xp,Yp,Zp,ierr=laxres
+        msg0="LAX problem"
+        if(ierr==1):
+            gmsh.logger.write("User-defined Y-Axis has zero coordinates!", level="error")
+            if not msg0 in self.previousErrors:
+                self.previousErrors.append(msg0)
+            return(0,0,0)
+        if(ierr==2):
+            gmsh.logger.write("Tangent Axis and user-defined Y-Axis cannot be colinear !", level="error")
+            if not msg0 in self.previousErrors:
+                self.previousErrors.append(msg0)
+        return(Yp[0],Yp[1],Yp[2])
+
+
+    # laxres: local axes of the Curve if already computed with getBeamsLAX (e.g. for all the Curves in manageInspect)
+    def recreateLAXView(self,ishp,laxres=None):
         #
         gmsh.option.setNumber('View.Axes',0) # Does not show the local axes
         gmsh.option.setNumber('View.ShowScale',0) # Show no color scale of the view
@@ -1662,135 +2039,24 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
 
         print("ishp=",ishp)
 
-        #Select the 2 points of the Curve
-        #shpedges=gmsh.model.getBoundary([(1, ient)],recursive=True)
-        shpedges=gmsh.model.getBoundary([(1, ient)],combined=False)
-
-        x=[];y=[];z=[]
-        for ie in range(2):
-            inode=abs(int(shpedges[ie][1]))
-            tmp=gmsh.model.getValue(0, inode,[])
-            x.append(tmp[0]);y.append(tmp[1]);z.append(tmp[2])
-        #Get middle of the Curve
-        x0=0.5*(x[0]+x[1]);y0=0.5*(y[0]+y[1]);z0=0.5*(z[0]+z[1])
-
-        # First axis - scaled to Curve length
-        #VP=[]
-        Xp=np.array([(x[1]-x[0]), (y[1]-y[0]), (z[1]-z[0])], dtype=np.float64)
-        #VP.append(Xp)
-        normXp=LA.norm(Xp)
-        Xp=Xp/normXp
-        # Calculate matrix passing from X-axis to local Xp-axis
-        X=np.array([1, 0, 0], dtype=np.float64)
-        Y=np.array([0, 1, 0], dtype=np.float64)
-        Z=np.array([0, 0, 1], dtype=np.float64)
-        #
-        # Perform additional rotation, from theta value
-        #
-        tmp0=self.getDBValue(self.contextDB,[("children","name","Curve"),("children","name",self.pbType),("children","name","New LAX Definition"),("children","name","-")],False)
-
-        # theta value comes from a loop on self.listLAX in manageInspect, to display all LAX
-
+        # LAX from a loop on self.listLAX in manageInspect or createIN, to display all LAX
         if self.LAXspecial:
             lax_id=self.laxid
-        # theta value comes from new choice and change in first index of self.listLAX, due to permutation in menu 'LAX Names Choice'
+        # LAX from new choice and change in first index of self.listLAX, due to permutation in menu 'LAX Names Choice'
         elif self.permutespecial:
             lax_id=0
-        #
-        if self.permutespecial or self.LAXspecial:
-            checklax=[list(k.values())[0] for k in list(self.listLAX[lax_id].values())[0] if "Check=LAX from" in list(k.keys())[0]][0][0]
-            reverse_xp=[list(k.values())[0] for k in list(self.listLAX[lax_id].values())[0] if ("Reverse X" in list(k.keys())[0] or "Reverse x" in list(k.keys())[0])][0][0]
-            if(checklax=='YES'):
-                theta_degrees=[list(k.values())[0] for k in list(self.listLAX[lax_id].values())[0] if "Rotation angle" in list(k.keys())[0]][0][0]
-            else:
-                Yp_str=[list(k.values())[0] for k in list(self.listLAX[lax_id].values())[0] if ("Y'(dx,dy,dz)" in list(k.keys())[0] or "y'(dx,dy,dz)" in list(k.keys())[0])][0][0].split(',')
-
-            #
-
-        #
-        # theta values in other cases
+        # LAX from the current menu in other cases
         else:
-            checklax=[iprop for iprop in tmp0['props'] if 'name' in iprop if "Check=LAX from" in iprop['name']][0]['values'][0]
-            reverse_xp=[iprop for iprop in tmp0['props'] if 'name' in iprop and ("Reverse X" in iprop['name'] or "Reverse x" in iprop['name'])][0]['values'][0]
-            if(checklax=='YES'):
-                theta_degrees=[iprop for iprop in tmp0['props'] if 'name' in iprop and "Rotation angle" in iprop['name']][0]['values'][0]
-            else:
-                Yp_str=[iprop for iprop in tmp0['props'] if 'name' in iprop and ("Y'(dx,dy,dz)" in iprop['name'] or "y'(dx,dy,dz)" in iprop['name'])][0]['values'][0].split(',')
-            #
-        VP=[]
-        if(reverse_xp==1):
-            Xp=np.array([(x[0]-x[1]), (y[0]-y[1]), (z[0]-z[1])], dtype=np.float64)
-            VP.append(Xp)
-            normXp=LA.norm(Xp)
-            Xp=Xp/normXp
+            lax_id=None
         #
-        else:
-            VP.append(Xp)
+        if laxres==None:
+            laxres=self.getBeamsLAX([(ient,lax_id)])[(ient,lax_id)]
+        (Yp_x,Yp_y,Yp_z)=self.checkLAXResult(laxres)
+        if(laxres[4]!=0):
+            return(Yp_x,Yp_y,Yp_z)
         #
-        if(checklax=='YES'): #4th point determined by LAX with rotation angle
-            print("theta_degrees=",theta_degrees)
-            #
-            if(theta_degrees!=0):
-                theta=theta_degrees/180.*np.pi
-                r0=np.array([[1,0,0],[0,np.cos(theta),-np.sin(theta)],[0,np.sin(theta),np.cos(theta)]])
-                Y=np.dot(r0,Y)
-                Z=np.dot(r0,Z)
-            #
-            v = np.cross(X,Xp)
-            c = np.dot(X, Xp)
-            s = LA.norm(v)
-            if(s!=0):
-                vx = np.array([[0, -v[2], v[1]], [v[2], 0, -v[0]], [-v[1], v[0], 0]])
-                r = np.eye(3) + vx + np.dot(vx,vx)*(1-c)/(s**2)
-            elif(c>=0):
-                r=np.eye(3)
-            else:
-                r=np.array([[-1,0,0],[0,0,1],[0,1,0]]) # x'=-x,y'=z, z'=y
-            #
-            #Second axis and third axis - scaled to Curve length
-            #Xp.append(np.dot(r,Y)*normXp);Xp.append(np.dot(r,Z)*normXp)
-            Yp=np.dot(r,Y)
-            Zp=np.dot(r,Z)
-            VP.append(Yp);VP.append(Zp)
-            #
-        else:  #4th point determined by LAX with fix coordinates
-            #
-            #VP=[]
-            # A priori normalized Yp:
-            Yp=np.array([float(Yp_str[0]), float(Yp_str[1]), float(Yp_str[2])], dtype=np.float64)
-            print('Xp=',Xp)
-            print('Yp=',Yp)
-            msg0="LAX problem"
-            if np.linalg.norm(Yp)==0:
-                gmsh.logger.write("User-defined Y-Axis has zero coordinates!", level="error")
-                #
-                if not msg0 in self.previousErrors:
-                    self.previousErrors.append(msg0)
-                 #
-                return(0,0,0)
-            else:
-                if msg0 in self.previousErrors:
-                    self.previousErrors.remove(msg0)
-            #
-            if np.linalg.norm(np.cross(Xp,Yp))==0:
-                gmsh.logger.write("Tangent Axis and user-defined Y-Axis cannot be colinear !", level="error")
-                if not msg0 in self.previousErrors:
-                    self.previousErrors.append(msg0)
-                #
-                return(Yp[0],Yp[1],Yp[2])
-            else:
-                if msg0 in self.previousErrors:
-                    self.previousErrors.remove(msg0)
-            #
-            normYp=LA.norm(Yp)
-            Yp=Yp/normYp
-            Zp=np.cross(Xp,Yp)
-            # new Yp
-            Yp=np.cross(Zp,Xp)
-            #
-            #VP.append(Xp);VP.append(Yp);VP.append(Zp)
-            VP.append(Yp);VP.append(Zp)
-
+        (x0,y0,z0)=laxres[0]
+        VP=[laxres[1],laxres[2],laxres[3]]
         for i in range(3):
             print(VP[i])
 
@@ -1817,7 +2083,7 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
             gmsh.graphics.draw()
         #
 
-        return(Yp[0],Yp[1],Yp[2])
+        return(Yp_x,Yp_y,Yp_z)
 
 
     # Recreate thg GUI menus (ONELAB.json object) from the ContextDB, SafirDB and InspectDB
@@ -2620,6 +2886,8 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
         # Permute in self.listMats or self.listLAX
         idx=self.idxInGeneralList(tmpl,ivlstr,ishp)[0]
         tmpl[idx],tmpl[0]=tmpl[0],tmpl[idx]
+        if tmpl is self.listMats:
+            self.updateMatsIdx()
 
         if(fdname=="New LAX Name"):
             self.isViewLAX=True
@@ -3331,51 +3599,114 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
     def writeLineFortran(self,fmtstr,vallist):
         #fmt = ff.FortranRecordWriter(fmtstr)
         #return fmt.write(vallist)
-        for i in range(len(vallist)):
-            ival=vallist[i]
-            if i==0:
-                str0=str(ival)
-            else:
-                str0+=" "+str(ival)
-        return str0
+        return " ".join([str(ival) for ival in vallist])
 
 
-    #Store the nodes and faces in coherent order for SAFIR
-    #Store the nodes and faces in coherent order for SAFIR
-    def getOrderedFaces(self,ielemtype,ielemnodes):
-        facenodes=[]
-        if(ielemtype==1): # lines
-            facenodes.append(ielemnodes)
-        if(ielemtype==2): #triangles
-            facenodes.append([ielemnodes[0],ielemnodes[1]])
-            facenodes.append([ielemnodes[1],ielemnodes[2]])
-            facenodes.append([ielemnodes[2],ielemnodes[0]])
-        if(ielemtype==3): #quadrangles
-            facenodes.append([ielemnodes[0],ielemnodes[1]])
-            facenodes.append([ielemnodes[1],ielemnodes[2]])
-            facenodes.append([ielemnodes[2],ielemnodes[3]])
-            facenodes.append([ielemnodes[3],ielemnodes[0]])
-        if(ielemtype==4): #tets
-            facenodes.append([ielemnodes[0],ielemnodes[2],ielemnodes[1]])
-            facenodes.append([ielemnodes[0],ielemnodes[3],ielemnodes[2]])
-            facenodes.append([ielemnodes[0],ielemnodes[1],ielemnodes[3]])
-            facenodes.append([ielemnodes[1],ielemnodes[2],ielemnodes[3]])
-        if(ielemtype==5): #hexas
-            facenodes.append([ielemnodes[0],ielemnodes[4],ielemnodes[7],ielemnodes[3]])
-            facenodes.append([ielemnodes[2],ielemnodes[3],ielemnodes[7],ielemnodes[6]])
-            facenodes.append([ielemnodes[1],ielemnodes[2],ielemnodes[6],ielemnodes[5]])
-            facenodes.append([ielemnodes[0],ielemnodes[1],ielemnodes[5],ielemnodes[4]])
-            facenodes.append([ielemnodes[0],ielemnodes[3],ielemnodes[2],ielemnodes[1]])
-            facenodes.append([ielemnodes[4],ielemnodes[5],ielemnodes[6],ielemnodes[7]])
-        if(ielemtype==6): #prisms
-            facenodes.append([ielemnodes[0],ielemnodes[3],ielemnodes[5],ielemnodes[2]])
-            facenodes.append([ielemnodes[1],ielemnodes[2],ielemnodes[5],ielemnodes[4]])
-            facenodes.append([ielemnodes[0],ielemnodes[1],ielemnodes[4],ielemnodes[3]])
-            facenodes.append([ielemnodes[0],ielemnodes[2],ielemnodes[1]])
-            facenodes.append([ielemnodes[3],ielemnodes[4],ielemnodes[5]])
-        return facenodes
+    #Write a whole section of the .IN file (list of value lists, one per line), same free format as writeLineFortran
+    # The lines are joined by chunks of INblocksize, each chunk being a single write in the file buffer
+    def writeBlockFortran(self,f,vallists):
+        if(isinstance(vallists,INRecords)):
+            vallists.writeTo(f)
+            return
+        nlines=len(vallists)
+        for i0 in range(0,nlines,self.INblocksize):
+            f.write("".join([" ".join([str(ival) for ival in vallist])+"\n" for vallist in vallists[i0:i0+self.INblocksize]]))
 
 
+    #Store the nodes and faces in coherent order for SAFIR
+    # Faces of all the elems of a dimension: the local face table of each elemType (allElemTypesFaces) is applied to the E x k connectivity of the elems of this type
+    # Returns the (E.f) x m node tags of the faces (sorted in each row, padded with 0 for the faces having less nodes), the elem index and the local face number of each face, ordered by elem then by face
+    def getOrderedFaces(self,elemTypes,elemNodeTags):
+        ityps=[int(k) for k in np.unique(elemTypes) if int(k) in self.allElemTypesFaces]
+        m=max([len(iface) for ityp in ityps for iface in self.allElemTypesFaces[ityp]]+[1])
+        faces=[];elems=[];ifaces=[]
+        for ityp in ityps:
+            rows=np.nonzero(elemTypes==ityp)[0]
+            for ifa,iface in enumerate(self.allElemTypesFaces[ityp]):
+                tmp=np.zeros((len(rows),m),dtype=np.int64)
+                tmp[:,0:len(iface)]=elemNodeTags[np.ix_(rows,iface)]
+                faces.append(tmp)
+                elems.append(rows)
+                ifaces.append(np.full(len(rows),ifa,dtype=np.int64))
+        if(faces==[]):
+            return np.zeros((0,m),dtype=np.int64),np.zeros(0,dtype=np.int64),np.zeros(0,dtype=np.int64)
+        faces=np.concatenate(faces);elems=np.concatenate(elems);ifaces=np.concatenate(ifaces)
+        order=np.lexsort((ifaces,elems))
+        return np.sort(faces[order],axis=1),elems[order],ifaces[order]
+
+
+    # Hash keys of faces (rows of sorted node tags): one fixed-size bytes value per row, big-endian so that the order of the keys is the order of the rows
+    def getFaceKeys(self,faces):
+        faces=np.ascontiguousarray(faces,dtype='>i8')
+        return faces.view(np.dtype((np.void,faces.dtype.itemsize*faces.shape[1]))).ravel()
+
+
+    # Run table of the elems of each entity: entity tag -> (first index, last index, number of elems), in one pass
+    # The elems of an entity are contiguous in the mesh snapshot (collected entity by entity), which is checked here
+    def getEntityRuns(self,elemEntityTags):
+        entruns={}
+        nelems=len(elemEntityTags)
+        if(nelems==0):
+            return entruns
+        starts=np.flatnonzero(np.diff(elemEntityTags))+1
+        starts=np.concatenate(([0],starts))
+        ends=np.concatenate((starts[1:],[nelems]))
+        for ifirst,iend in zip(starts.tolist(),ends.tolist()):
+            ientity=int(elemEntityTags[ifirst])
+            if ientity in entruns:
+                raise ValueError("Elems of entity "+str(ientity)+" are not contiguous")
+            entruns[ientity]=(ifirst,iend-1,iend-ifirst)
+        return entruns
+
+
+    # SAFIR number of the i-th mesh elem of a dimension, from the dense array filled when preparing the Beams/Shells
+    def getElemOutIdx(self,outidx,i,ielem,elemtyp):
+        idx=int(outidx[i])
+        if(idx==0):
+            raise ValueError("Elem "+str(ielem)+" is not a "+elemtyp)
+        return idx
+
+
+    # Shared index of the faces of the (ndims) elems: sorted unique face keys, and for each key the run of (elem index, local face number) in 'elems'/'faces'
+    # Built once for FLUX, FRONTIER and VOID, each of them is then resolved against it in time proportional to its own size
+    def getSolidFaceIndex(self,elemNodeTags,elemTypes):
+        faces,elems,ifaces=self.getOrderedFaces(elemTypes,elemNodeTags)
+        keys=self.getFaceKeys(faces)
+        order=np.argsort(keys,kind='stable') # the faces of a same key stay ordered by elem
+        ukeys,starts=np.unique(keys[order],return_index=True)
+        return {'keys':ukeys,'starts':np.append(starts,len(keys)),'elems':elems[order],'faces':ifaces[order],'width':faces.shape[1]}
+
+
+    # Faces of the (ndims) elems matching the (ndims-1) elems having a constraint (value!="-1")
+    # When the same face is found twice, the first (ndims-1) elem is kept
+    # Returns a list of (elem index, local face number, value), sorted by elem then by face
+    def getConstrainedFaces(self,faceidx,elemNodeTags,elemTypes,elemVals):
+        ev=np.asarray(elemVals,dtype=object)
+        sel=np.nonzero(ev!="-1")[0]
+        ukeys=faceidx['keys']
+        if(len(sel)==0 or len(ukeys)==0):
+            return []
+        m=faceidx['width']
+        qfaces=np.zeros((len(sel),m),dtype=np.int64) # an elem with more nodes than the faces stays null, and matches no face
+        for ityp in np.unique(elemTypes[sel]):
+            n=self.allElemTypesNbNodes[int(ityp)]
+            if(n<=m):
+                isel=np.nonzero(elemTypes[sel]==ityp)[0]
+                qfaces[isel,0:n]=elemNodeTags[sel[isel],0:n]
+        qkeys=self.getFaceKeys(np.sort(qfaces,axis=1))
+        iu=np.minimum(np.searchsorted(ukeys,qkeys),len(ukeys)-1)
+        found=np.nonzero(ukeys[iu]==qkeys)[0]
+        if(len(found)==0):
+            return []
+        # Expand each found key to all its (elem, face), in the order of the constrained elems
+        starts=faceidx['starts'][iu[found]]
+        counts=faceidx['starts'][iu[found]+1]-starts
+        iq=np.repeat(found,counts)
+        ipos=np.repeat(starts-np.cumsum(counts)+counts,counts)+np.arange(counts.sum())
+        ims=faceidx['elems'][ipos];ifas=faceidx['faces'][ipos]
+        _,ifirst=np.unique(ims*8+ifas,return_index=True) # sorted by elem then face (max 6 faces per elem), first constrained elem kept
+        return list(zip(ims[ifirst].tolist(),ifas[ifirst].tolist(),ev[sel[iq[ifirst]]].tolist()))
+
 
     def listProps(self,ndims,do_regroup):
         # Routine to recursively collect the information (material, flux,...) of the entities and physical groups, keeping track of the variations in properties (adding final index)
@@ -4240,6 +4571,12 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
             #
             if(len(PropEnts[ugtypdim])!=0):
                 nugtyps=len(PropEnts[ugtypdim])
+                #
+                # Local axes of all the Curves, computed at once
+                if "lax" in ctyps[ctyp] and not "relax" in ctyps[ctyp]:
+                    laxids=[[k for k in range(len(self.listLAX)) if str(ival)+";1" in list(self.listLAX[k].keys())[0]][0] for ival in PropExtValEnts[ugtypdim]]
+                    beamslax=self.getBeamsLAX([(int(PropEnts[ugtypdim][i]),laxids[i]) for i in range(nugtyps)])
+                #
                 for i in range(nugtyps):
                     itag=int(PropEnts[ugtypdim][i])
                     ugtyp,idim=ugtypdim.split(';')
@@ -4265,7 +4602,7 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                         print('ival=',ival)
                         self.LAXspecial=True
                         print("self.listLAX=",self.listLAX)
-                        self.laxid=[k for k in range(len(self.listLAX)) if ival+";1" in list(self.listLAX[k].keys())[0]][0]
+                        self.laxid=laxids[i]
                         #
                         if(i==0):
                             self.LAXspecial=True
@@ -4278,7 +4615,7 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                         self.isViewLAX=True
                         #
                         print("Curve "+str(itag)+": ")
-                        (xp0,yp0,zp0)=self.recreateLAXView("Curve "+str(itag))
+                        (xp0,yp0,zp0)=self.recreateLAXView("Curve "+str(itag),beamslax[(itag,laxids[i])])
                         #
                         self.isViewLAX=False
                         #
@@ -4538,37 +4875,13 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
         return 0
 
 
-    def reOrderMeshBordersTSH(self,iborder0,ntags,ncoords):
-        #
-        ibordercoords=[]
-        iborder=deepcopy(iborder0)
-        for i in range(len(iborder)):
-            j=ntags.index(iborder[i])
-            ibordercoords.append(ncoords[3*j+1]) #Only y-coordinate is needed
-
-        def aInfb(i,j):
-            isthecase=False
-            ya=ibordercoords[i]
-            yb=ibordercoords[j]
-            if(ya<yb):
-                isthecase=True
-            return isthecase
-        #
-        #Sort the array in ascending order
-        for i in range(0, len(iborder)):
-            for j in range(i+1, len(iborder)):
-                if(aInfb(j,i)):
-                    temp = iborder[i]
-                    iborder[i] = iborder[j]
-                    iborder[j] = temp
-                    temp2=ibordercoords[i]
-                    ibordercoords[i] = ibordercoords[j]
-                    ibordercoords[j] = temp2
-        #
-        return iborder
+    # Sort the node tags of a border by ascending y-coordinate
+    def reOrderMeshBordersTSH(self,iborder0,ntagsidx,ncoords):
+        iborder=np.asarray(iborder0,dtype=np.int64)
+        return iborder[np.argsort(ncoords[ntagsidx[iborder],1],kind='stable')]
 
 
-    def specialNodeNumberingTSH(self,propPgsMats,propEntsMats,meshEntityTags,meshNodeTags,nTags,nCoords):
+    def specialNodeNumberingTSH(self,propPgsMats,propEntsMats,meshEntityTags,meshNodeTags,nTagsIdx,nCoords):
         cornodes=[]
         print('Renumbering (TSH has a special numbering of nodes)...')
         idim=2
@@ -4608,29 +4921,17 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
             #
             # Reorder elements in allMeshesm and allMeshesp
             if(allMeshesp!=[] and allMeshesm!=[]):
-                #allMeshesp=self.reOrderMeshBordersTSH(allMeshesp,nTags,nCoords)
-                #allMeshesm=self.reOrderMeshBordersTSH(allMeshesm,nTags,nCoords)!
-                meshnodesp=[];meshnodesm=[]
-                for i in allMeshesp:
-                    for imsh in range(len(meshEntityTags)):
-                        if(meshEntityTags[imsh]==i):
-                            meshnodesp+=meshNodeTags[imsh]
-
-                for i in allMeshesm:
-                    for imsh in range(len(meshEntityTags)):
-                        if(meshEntityTags[imsh]==i):
-                            meshnodesm+=meshNodeTags[imsh]
-
-                meshnodesm=list(set(meshnodesm))
-                meshnodesp=list(set(meshnodesp))
-                meshnodespO=self.reOrderMeshBordersTSH(meshnodesp,nTags,nCoords)
-                meshnodesmO=self.reOrderMeshBordersTSH(meshnodesm,nTags,nCoords)
-
-                cornodes=[]
-                for i in range(len(meshnodesmO)):
-                    cornodes.append(nTags.index(meshnodesmO[i]))
-                for i in range(len(meshnodespO)):
-                    cornodes.append(nTags.index(meshnodespO[i]))
+                #allMeshesp=self.reOrderMeshBordersTSH(allMeshesp,nTagsIdx,nCoords)
+                #allMeshesm=self.reOrderMeshBordersTSH(allMeshesm,nTagsIdx,nCoords)!
+                # Nodes of the mesh lines of each border (mask on the entities), without duplicates and padding
+                meshnodesp=np.unique(meshNodeTags[np.isin(meshEntityTags,allMeshesp)])
+                meshnodesm=np.unique(meshNodeTags[np.isin(meshEntityTags,allMeshesm)])
+                meshnodesp=meshnodesp[meshnodesp>0]
+                meshnodesm=meshnodesm[meshnodesm>0]
+                meshnodespO=self.reOrderMeshBordersTSH(meshnodesp,nTagsIdx,nCoords)
+                meshnodesmO=self.reOrderMeshBordersTSH(meshnodesm,nTagsIdx,nCoords)
+
+                cornodes=nTagsIdx[np.concatenate((meshnodesmO,meshnodespO))] # left border, then right border
 
             else:
                 raise ValueError("Pb in TSH geometry: Could not collect the left and right borders")
@@ -4644,103 +4945,240 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
 
 
 
-    def mergeSameIdx(self,s0):
-        #
-        s=s0
-        notfinal=True
-        initstep=True
-        newidx=[]
+    # BLOCK: marks the nodes of the elems having a value (elemVals[i]!="-1"), in one pass over the elems of a dimension
+    # The first value assigned to a node is kept (order of the elems, then of their nodes), isFixed and blockVals (by node index) are updated in place
+    # Returns the number of nodes receiving a value different from the kept one
+    def addBlockNodeVals(self,isFixed,blockVals,elemVals,elemTypes,elemNodeTags,nodeTagsIdx):
+        ev=np.asarray(elemVals,dtype=object)
+        sel=np.nonzero(ev!="-1")[0]
+        if(len(sel)==0):
+            return 0
+        kmax=elemNodeTags.shape[1]
+        nodes=[];keys=[]
+        for ityp in np.unique(elemTypes[sel]): # connectivity without the padding of each elem type
+            rows=sel[elemTypes[sel]==ityp]
+            n=self.allElemTypesNbNodes[int(ityp)]
+            nodes.append(nodeTagsIdx[elemNodeTags[rows,0:n]].ravel())
+            keys.append((rows[:,None]*kmax+np.arange(n)).ravel())
+        keys=np.concatenate(keys)
+        order=np.argsort(keys,kind='stable')
+        nodes=np.concatenate(nodes)[order]
+        vals=ev[keys[order]//kmax]
+        unodes,ifirst,inv=np.unique(nodes,return_index=True,return_inverse=True)
+        uvals=vals[ifirst]
+        #
+        contras=np.zeros(len(unodes),dtype=bool)
+        np.logical_or.at(contras,inv.ravel(),vals!=uvals[inv.ravel()])
+        known=isFixed[unodes]
+        contras|=known&(blockVals[unodes]!=uvals)
+        #
+        newnodes=unodes[~known]
+        blockVals[newnodes]=uvals[~known]
+        isFixed[newnodes]=True
+        return int(np.count_nonzero(contras))
+
+
+    # Boundary points of the entities of dimension 1 or 2 (symAxis...) as node indexes, from the mesh snapshot (no call to gmsh), for all the entities at once
+    # Curve: start point then end point, as getBoundary - the point nodes used only as 1st node / only as 2nd node of the elems of the curve (closed curve: its 1st node twice)
+    # Surface: points of the boundary curves by increasing point tag, as getBoundary(recursive=True) - the point nodes of the mesh edges belonging to one elem only of the surface
+    #  (points embedded in the curve or in the surface are not boundary points)
+    # Returns entity -> list of node indexes
+    def getEntityBoundaryNodes(self,dim,ents,elemTypes,elemEntityTags,elemNodeTags,nodeTagsIdx,ptNodeIdx):
+        res={ient:[] for ient in ents}
+        rows=np.nonzero(np.isin(elemEntityTags,ents))[0]
+        if(len(rows)==0):
+            return res
+        nodePt={inode:ient for ient,inode in ptNodeIdx.items()} # node index -> point entity
+        isPtNode=np.zeros(int(nodeTagsIdx.max())+1,dtype=bool)
+        isPtNode[list(nodePt.keys())]=True
+        rowents=elemEntityTags[rows].astype(np.int64)
+        if(dim==1):
+            n0=nodeTagsIdx[elemNodeTags[rows,0]]
+            n1=nodeTagsIdx[elemNodeTags[rows,1]]
+            nn=int(max(n0.max(),n1.max()))+1
+            k0=rowents*nn+n0
+            k1=rowents*nn+n1
+            isstart=~np.isin(k0,k1)
+            isend=~np.isin(k1,k0)
+            starts=dict(zip(rowents[isstart].tolist(),n0[isstart].tolist()))
+            ends=dict(zip(rowents[isend].tolist(),n1[isend].tolist()))
+            uents,ifirst=np.unique(rowents,return_index=True)
+            for ient,inode in zip(uents.tolist(),n0[ifirst].tolist()):
+                res[ient]=[k for k in [starts.get(ient,inode),ends.get(ient,inode)] if isPtNode[k]]
+            return res
+        faces,ielems,_=self.getOrderedFaces(elemTypes[rows],elemNodeTags[rows])
+        ukeys,counts=np.unique(np.column_stack([rowents[ielems],faces]),axis=0,return_counts=True)
+        bnd=ukeys[counts==1] # boundary mesh edges: entity, node tags
+        nodes=nodeTagsIdx[bnd[:,1:]] # padding (tag 0) gives -1
+        bndents=np.repeat(bnd[:,0],nodes.shape[1])
+        nodes=nodes.ravel()
+        keep=nodes>=0
+        keep[keep]=isPtNode[nodes[keep]]
+        for ient,inode in set(zip(bndents[keep].tolist(),nodes[keep].tolist())):
+            res[ient].append(inode)
+        for ient in res:
+            res[ient].sort(key=lambda inode:nodePt[inode])
+        return res
+
+
+    # SAFIR index (from 0) of a node index, from the inverse permutation of the node numbering
+    def getSafirNodeIdx(self,nodeSafirIdx,inode):
+        inode_safir=int(nodeSafirIdx[inode])
+        if(inode_safir==-1):
+            raise ValueError("Node "+str(inode+1)+" is not in the node numbering")
+        return inode_safir
+
+
+    # SAME: nodes sharing a group (entity or physgroup) are tied, transitively through the nodes belonging to several groups
+    # Disjoint-set (union-find) on the group identifiers - sameNodeVals: node -> [value, list of groups]
+    # Returns (value, root group) -> list of tied nodes, in the order of the first node of each set
+    def mergeSameGroups(self,sameNodeVals):
+        parent={}
+        def findRoot(igroup):
+            iroot=igroup
+            while parent[iroot]!=iroot:
+                iroot=parent[iroot]
+            while parent[igroup]!=iroot: # path compression
+                inext=parent[igroup]
+                parent[igroup]=iroot
+                igroup=inext
+            return iroot
+        #
+        for ival,igroups in sameNodeVals.values():
+            for igroup in igroups:
+                parent.setdefault(igroup,igroup)
+            iroot0=findRoot(igroups[0])
+            for igroup in igroups[1:]:
+                iroot=findRoot(igroup)
+                if(iroot!=iroot0):
+                    parent[iroot]=iroot0
         #
-        while(notfinal):
-            keys={}
-            for k in range(len(s)):
-                i,v=s[k].split("/")
-                if i in keys:
-                    keys[i].append(k)
-                else:
-                    keys[i]=[k]
-            #
-            testisfinal=True
-            #
-            if(initstep):
-                n=0
-                for k,tab in keys.items():
-                    for i in range(len(tab)):
-                        newidx.append(tab[i])
-                initstep=False
-            snew=[]
-            for k,tab in keys.items():
-                tabi=[tab[i] for i in range(len(tab)) if len(s[tab[i]].split("/")[1].split(";"))>1]
-                if(tabi!=[]):
-                    testisfinal=False
-                    i1=tabi[0] # first with 2 indexes
-                    #
-                    part1=s[i1].split("/")[0]
-                    part2=s[i1].split("/")[1]
-                    ri1=part2.split(";")[0]
-                    ri2=part2.split(";")[1]
-                    #print('ri1,ri2=',ri1,ri2)
-                    #
-                    for i in range(len(tab)):
-                        parttmp2=s[tab[i]].split("/")[1].split(";")
-                        #print('parttmp2=',parttmp2)
-                        parttmp3tab=[]
-                        for m0 in parttmp2:
-                            if(m0==ri1):
-                                parttmp3tab.append(ri2)
-                            elif(m0==ri2):
-                                parttmp3tab.append(ri2)
-                            elif(m0!=ri2):
-                                parttmp3tab.append(m0)
-                        parttmp3tab=list(set(parttmp3tab))
-                        parttmp3=';'.join(parttmp3tab)
-                        snew.append(part1+"/"+parttmp3)
-                        #print('parttmp3=',part1+"/"+parttmp3)
-                else:
-                    for i in range(len(tab)):
-                        snew.append(s[tab[i]])
-            s=snew
-                #
-            notfinal=not testisfinal
-
-        sfinal=[]
-        for i in range(len(newidx)):
-            sfinal.append(snew[newidx.index(i)])
-        return(sfinal)
+        samevals={}
+        for inode,(ival,igroups) in sameNodeVals.items():
+            samevals.setdefault((ival,findRoot(igroups[0])),[]).append(inode)
+        return samevals
 
 
-    def verifyQuads(self,pents,ppgs,meshEntityTags,meshNodeTags):
+    def verifyQuads(self,pents,ppgs,meshEntityTags,meshElemTypes):
         rc=0
 
-        # Test the entities in the physgroups
+        # Collect the entities of the physgroups and the other entities
         idim=2
-        if(ppgs!=[]):
-            for i in range(len(ppgs)):
-                ipg=ppgs[i]
-                for ient in gmsh.model.getEntitiesForPhysicalGroup(idim, int(ipg)):
-                    for imsh in range(len(meshEntityTags)):
-                        if meshEntityTags[imsh]==ient:
-                            if(len(meshNodeTags[imsh])!=4):
-                                gmsh.logger.write("Having Shells in your geometry, you need to force the 2Dmeshing to be composed only of quads: use Mesh/Recombine2D when meshing.", level="error")
-                                return -1
-        #
-        # Test the other entities
-        if(pents!=[]):
-            for i in range(len(pents)):
-                ient=pents[i]
-                for imsh in range(len(meshEntityTags)):
-                        if meshEntityTags[imsh]==ient:
-                            if(len(meshNodeTags[imsh])!=4):
-                                gmsh.logger.write("Having Shells in your geometry, you need to force the 2Dmeshing to be composed only of quads: use Mesh/Recombine2D when meshing.", level="error")
-                                return -1
+        ents=[int(k) for k in pents]
+        for ipg in ppgs:
+            ents+=[int(k) for k in gmsh.model.getEntitiesForPhysicalGroup(idim, int(ipg))]
+        #
+        # Test that all their mesh elems are quadrangles (gmsh elem type 3)
+        if(ents!=[]):
+            if np.any(meshElemTypes[np.isin(meshEntityTags,ents)]!=3):
+                gmsh.logger.write("Having Shells in your geometry, you need to force the 2Dmeshing to be composed only of quads: use Mesh/Recombine2D when meshing.", level="error")
+                return -1
         return rc
 
 
+    # Metadata of a section file (.TEM/.TSH), read once per version of the file (path, mtime, size):
+    # cached in memory for the reruns of the GUI session, and in batch mode on disk in the directory of the case for the cases sharing the same sections
+    # (never in the directory of the section files, often a shared or read-only library)
+    # The file is read line by line and only up to the header fields needed (NFIBERBEAM)
+    def getSectionFileMeta(self,file0):
+        ipath=os.path.abspath(file0)
+        st=os.stat(ipath)
+        ikey=ipath+"|"+str(st.st_mtime_ns)+"|"+str(st.st_size)
+        if ikey in self.sectFileMeta:
+            return self.sectFileMeta[ikey]
+        #
+        cachefile=os.path.join(self.dir,self.sectCacheFile) if self.nopopup else ""
+        diskcache={}
+        if cachefile!="" and os.path.exists(cachefile):
+            try:
+                with open(cachefile,'r') as f:
+                    diskcache=json.load(f)
+            except Exception:
+                diskcache={}
+        #
+        if ikey in diskcache:
+            meta=diskcache[ikey]
+        else:
+            meta={"NFIBERBEAM":None}
+            with open(ipath,'r',errors='replace') as f:
+                for iline in f:
+                    if 'NFIBERBEAM' in iline:
+                        meta["NFIBERBEAM"]=int(iline.split('NFIBERBEAM')[1].replace("\r","").replace("\n",""))
+                        break
+            # Replace the entries of the previous versions of the file - write then rename, the cache may be shared by parallel batch cases
+            if(cachefile!=""):
+                diskcache={k:v for k,v in diskcache.items() if k.split("|")[0]!=ipath}
+                diskcache[ikey]=meta
+                try:
+                    tmpfile=cachefile+"."+str(os.getpid())+".tmp"
+                    with open(tmpfile,'w') as f:
+                        json.dump(diskcache,f,indent=1)
+                    os.replace(tmpfile,cachefile)
+                except Exception as emsg:
+                    gmsh.logger.write("Pb in saving the section files cache "+cachefile+": "+str(emsg), level="warning")
+        #
+        self.sectFileMeta[ikey]=meta
+        return meta
+
+
+    # Snapshot of the mesh used by createIN, stored as contiguous numpy arrays:
+    # - nodeTags (N), nodeCoords (Nx3)
+    # - for each dim in [0,ndims]: elemTags (E), elemTypes (E), elemEntityTags (E), elemNodeTags (E x kmax, padded with 0)
+    #   The (E x k) connectivity of one element type ityp is elemNodeTags[dim][elemTypes[dim]==ityp,:k]
+    # Elements are kept in the order entity by entity (then type by type), since SAFIR element numbering relies on it
+    def getMeshSnapshot(self,ndims):
+        # Nodes: one call per dimension (entities of a dimension are returned sorted by tag, as for gmsh.model.getEntities())
+        nodeTags=[];nodeCoords=[]
+        for dim in range(4):
+            tags,coords,_=gmsh.model.mesh.getNodes(dim,-1,returnParametricCoord=False)
+            nodeTags.append(np.asarray(tags,dtype=np.int64))
+            nodeCoords.append(np.asarray(coords,dtype=np.float64).reshape(-1,3))
+        nodeTags=np.concatenate(nodeTags)
+        nodeCoords=np.concatenate(nodeCoords)
+        #
+        # Elements: the entity tag of each element is needed to allocate the properties, hence one call per entity, without any loop on elems
+        elemTags=[];elemTypes=[];elemEntityTags=[];elemNodeTags=[]
+        for dim in range(4):
+            tags=[];typs=[];ents=[];conns=[]
+            for _,tag in gmsh.model.getEntities(dim):
+                etypes,etags,enodetags=gmsh.model.mesh.getElements(dim,tag)
+                for ityp in range(len(etypes)): # elements can be of different types (2D: mix of triangles-quadrangles..., 3D:...)
+                    nelemtags=len(etags[ityp])
+                    if(nelemtags==0):
+                        continue
+                    if(dim>ndims):
+                        raise ValueError("Mesh elements of dimension "+str(dim)+" found in a "+str(ndims)+"D problem")
+                    nnodesperelem=self.allElemTypesNbNodes[int(etypes[ityp])]
+                    tags.append(np.asarray(etags[ityp],dtype=np.int64))
+                    typs.append(np.full(nelemtags,etypes[ityp],dtype=np.int32))
+                    ents.append(np.full(nelemtags,tag,dtype=np.int64))
+                    conns.append(np.asarray(enodetags[ityp],dtype=np.int64).reshape(nelemtags,nnodesperelem))
+            if(dim>ndims):
+                continue
+            #
+            kmax=max([k.shape[1] for k in conns]+[1])
+            conn=np.zeros((sum([k.shape[0] for k in conns]),kmax),dtype=np.int64)
+            i0=0
+            for k in conns:
+                conn[i0:i0+k.shape[0],:k.shape[1]]=k
+                i0+=k.shape[0]
+            elemTags.append(np.concatenate(tags) if tags!=[] else np.zeros(0,dtype=np.int64))
+            elemTypes.append(np.concatenate(typs) if typs!=[] else np.zeros(0,dtype=np.int32))
+            elemEntityTags.append(np.concatenate(ents) if ents!=[] else np.zeros(0,dtype=np.int64))
+            elemNodeTags.append(conn)
+        #
+        return nodeTags,nodeCoords,elemTags,elemTypes,elemEntityTags,elemNodeTags
+
+
     def createIN(self):
         #print('Create SAFIR .IN file with the given parameters...')
 
         gmsh.logger.write("Create SAFIR .IN file with the given parameters...", level="info")
 
+        # The LAX errors are collected again over all the Beams of this run (see checkLAXResult)
+        if "LAX problem" in self.previousErrors:
+            self.previousErrors.remove("LAX problem")
+
         gmsh.model.geo.synchronize()
 
         # Verification: Test that previous step (meshing) has been done
@@ -4750,6 +5188,11 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
 
             for e in entities:
                 elemTypes, elemTags, elemNodeTags = gmsh.model.mesh.getElements(1, -1)
+            if(elemTags==[] and self.loadMeshCache(self.geofile)):
+                self.meshCachePending=False
+                self.ReverseOnce=False
+                self.updateReverse() # as after a generated mesh
+                elemTypes, elemTags, elemNodeTags = gmsh.model.mesh.getElements(1, -1)
             if(elemTags==[]):
                 raise ValueError("Mesh not yet generated - Generate it")
         except Exception as emsg:
@@ -4844,16 +5287,12 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                     return -1
 
         #
-        #Retrieve all mesh elements and physical groups
-        allNodeTags=[]
-        allNodeCoords=[]
-        allElemTags=[];allElemTypes=[];allElemEntityTags=[];allElemNodeTags=[]
-        #
-        for i in range(ndims+1):
-            allElemTags.append([])
-            allElemTypes.append([])
-            allElemEntityTags.append([])
-            allElemNodeTags.append([])
+        #Retrieve all mesh elements (as numpy arrays, see getMeshSnapshot) and physical groups
+        try:
+            allNodeTags,allNodeCoords,allElemTags,allElemTypes,allElemEntityTags,allElemNodeTags=self.getMeshSnapshot(ndims)
+        except Exception as emsg:
+            gmsh.logger.write("Pb with mesh Nodes or Elements:"+str(emsg), level="error")
+            return -1
         #
         GroupTags={}
         for iprop in propstrs:
@@ -4868,43 +5307,6 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
             dim = e[0]
             tag = e[1]
 
-            # Rearrange the entities/elems/nodes/physical groups
-            try:
-                # Nodes and coords: stored as developed lists
-                nodeTags, nodeCoords, nodeParams = gmsh.model.mesh.getNodes(dim, tag)
-
-                allNodeTags+=list(nodeTags)
-
-                allNodeCoords+=list(nodeCoords)
-                # Elements of mesh according to the dimension:
-                # - elemTypes stored in allElemTypes[dim][...]
-                # - elemTags stored in allElemTags[dim][...]
-                # - keeping track of the entity tag for each elem tag in allElemEntityTags[dim][...]
-                # - elemNodeTags stored in allElemNodeTags[dim][elems...][nodes]
-
-                elemTypes, elemTags, elemNodeTags = gmsh.model.mesh.getElements(dim, tag)
-
-                ntyps=len(elemTypes)
-                for ityp in range(ntyps): # elements can be of different types (2D: mix of triangles-quadrangles..., 3D:...)
-                    ielemtype=elemTypes[ityp]
-                    nnodesperelem=self.allElemTypesNbNodes[ielemtype]
-                    nelemtags=len(elemTags[ityp])
-                    allElemTags[dim]+=list(elemTags[ityp])
-                    allElemTypes[dim]+=[ielemtype for i in range(nelemtags)]
-                    allElemEntityTags[dim]+=[tag for i in range(nelemtags)] # recall which entity for each elem, to allocate the materials and constraints
-                    tmpelemnodes=[]
-                    for i in range(nelemtags):
-                        tmpelemnode=[]
-                        for j in range(nnodesperelem):
-                            tmpelemnode.append(elemNodeTags[ityp][nnodesperelem*i+j])
-                        tmpelemnodes.append(tmpelemnode)
-                    allElemNodeTags[dim]+=tmpelemnodes
-
-            except Exception as emsg:
-                gmsh.logger.write("Pb with mesh Nodes or Elements:"+str(emsg), level="error")
-                return -1
-
-
             # Store group tag by entity tag, if physgroup is a property physgroup - TBD : verify that "raise Value Error" below is always required in Structural case (maybe not for Global Material)
 
             try:
@@ -4942,25 +5344,28 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
 #             igtypdim=iprop[0]
 #             print("igtypdim=",igtypdim,":GroupTags=",GroupTags[igtypdim])
 
-        # Number of nodes, elems(ndims), elems(ndims-1)
+        # Number of nodes, elems(ndims)
         nnodes=len(allNodeTags)
         nelems=len(allElemTags[ndims])
         ndimsm=ndims-1
-        nelemsm=len(allElemTags[ndimsm])
         nalldims=[k for k in range(ndims+1)]
         nallelems=[len(allElemTags[nalldims[k]]) for k in range(ndims+1)]
 
-        #allNodeTags.index() is slow when often called it can be can be replaced by
-        allNodeTags_index = np.empty((len(allNodeTags)+1), dtype=np.int64)
-        for index, NodeTag in enumerate(allNodeTags):
-            allNodeTags_index[NodeTag] = index
-        print(allNodeTags)
-        #exit()
+        # Node tag -> node index (0-based, SAFIR node number is index+1), built once for the whole createIN run:
+        # allNodeTags.index() is O(nnodes) for each call, which made the whole conversion O(nnodes^2)
+        # Gmsh node tags are not necessarily contiguous (e.g. after partial remeshing): size on the max tag, -1 for unused tags
+        allNodeTags_index=np.full(int(allNodeTags.max())+1,-1,dtype=np.int64)
+        allNodeTags_index[allNodeTags]=np.arange(nnodes,dtype=np.int64)
+        #
+        # Point entity tag -> node index (0-based), from the dim-0 mesh (one node per point entity): end nodes of Truss, Springs, Obliques...
+        ptNodeIdx={}
+        for ient,inodetag in zip(allElemEntityTags[0].tolist(),allElemNodeTags[0][:,0].tolist()):
+            ptNodeIdx.setdefault(ient,int(allNodeTags_index[inodetag]))
 
         # Verifications for Structural 3D:
         if(not self.isThermal and ndims==3):
             if len(PropEnts['shcormat;2'])>0 or len(PropPgs['shcormat;2'])>0:
-                rc=self.verifyQuads(PropEnts['shcormat;2'],PropPgs['shcormat;2'],allElemEntityTags[2],allElemNodeTags[2])
+                rc=self.verifyQuads(PropEnts['shcormat;2'],PropPgs['shcormat;2'],allElemEntityTags[2],allElemTypes[2])
                 if(rc!=0):
                     return rc
 
@@ -4989,8 +5394,11 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
             gmsh.logger.write("No mats defined!", level="error")
             return -1
         #
+        # All the elems of an entity share the same property value: the value is computed once per entity, then broadcast to the elems of the entity
+        # Entities are visited in the order of their first elem, so that errors are reported on the same elem as an elem-by-elem scan
         try:
             ElemVals={}
+            entsUniq={}
             for iprop in propstrs:
                 igtypdim=iprop[0]
                 igtyp,idim=igtypdim.split(';')
@@ -4999,48 +5407,55 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                 kdims=nalldims[idim]
 
                 if(igtyp!='real_sym' and igtyp!='void_sym' and igtyp!="trusscormat"):
-                    ElemVals[igtypdim]=[]
-                    for i in range(kelems):
-                        ielem=allElemTags[kdims][i]
-                        ientity=allElemEntityTags[kdims][i]
+                    if not kdims in entsUniq:
+                        uents,ufirst,uinv=np.unique(allElemEntityTags[kdims],return_index=True,return_inverse=True)
+                        entsUniq[kdims]=(uents,ufirst,uinv.reshape(-1),np.argsort(ufirst))
+                    uents,ufirst,uinv,uorder=entsUniq[kdims]
+                    #
+                    # entity->value and physgroup->value (first definition kept, as with list.index)
+                    entvals={};pgvals={}
+                    for ient,ival in zip(PropEnts[igtypdim],PropValEnts[igtypdim]):
+                        entvals.setdefault(ient,ival)
+                    for ipg,ival in zip(PropPgs[igtypdim],PropValPgs[igtypdim]):
+                        pgvals.setdefault(ipg,ival)
+                    #
+                    uvals=np.full(len(uents),"-1",dtype=object)
+                    for k in uorder:
+                        ientity=int(uents[k])
+                        ielem=allElemTags[kdims][ufirst[k]]
                         #
                         valuestr=""
-                        if str(ientity) in PropEnts[igtypdim]:
-                            valuestr=PropValEnts[igtypdim][PropEnts[igtypdim].index(str(ientity))]
-
-                            if(igtyp!="same"):
-                                ElemVals[igtypdim].append(valuestr)
-                            else: # for SAME, aggregate the info on group
+                        isEnt=str(ientity) in entvals
+                        if isEnt:
+                            valuestr=entvals[str(ientity)]
+                            if(igtyp=="same"): # for SAME, aggregate the info on group
                                 valuestr+="/e_"+str(idim)+"_"+str(ientity)
-                                ElemVals[igtypdim].append(valuestr)
                         #
                         if ientity in GroupTags[igtypdim]:
 
-                            if(len(ElemVals[igtypdim])==i+1 and not 'load' in igtyp and not 'blks' in igtyp):
+                            if(isEnt and not 'load' in igtyp and not 'blks' in igtyp):
                                 raise ValueError("ielem="+str(ielem)+" has simultaneously a '"+igtypdim+"' property as physgroup '"+str(GroupTags[igtypdim][ientity])+"' and as entity '"+str(ientity)+"'! Need to select only one definition")
                             elif 'load' in igtyp or 'blks' in igtyp:
                                 igps=GroupTags[igtypdim][ientity].split(';')
 
                                 for igp in igps:
                                     if(valuestr==""):
-                                        valuestr=PropValPgs[igtypdim][PropPgs[igtypdim].index(igp)]
+                                        valuestr=pgvals[igp]
                                     else:
-                                        valuestr+=";"+PropValPgs[igtypdim][PropPgs[igtypdim].index(igp)]
-                                ElemVals[igtypdim].append(valuestr)
+                                        valuestr+=";"+pgvals[igp]
                             else:
-                                valuestr=PropValPgs[igtypdim][PropPgs[igtypdim].index(GroupTags[igtypdim][ientity])]
-                                if(igtyp!="same"):
-                                    ElemVals[igtypdim].append(valuestr)
-                                else:
+                                valuestr=pgvals[GroupTags[igtypdim][ientity]]
+                                if(igtyp=="same"):
                                     valuestr+="/p_"+str(idim)+"_"+str(GroupTags[igtypdim][ientity])
-                                    ElemVals[igtypdim].append(valuestr)
-
+                            uvals[k]=valuestr
                         #
-                        if not (ientity in GroupTags[igtypdim] or str(ientity) in PropEnts[igtypdim]):
-                            if(igtyp=='mats'): # Special case for material: every elem needs a material allocated (not the case for Struct, because a 1D object is not necessarily a Beam or Truss
-                                raise ValueError("No "+igtyp+" entity or physgroup found for ielem="+str(ielem)+" in entity="+str(ientity)+"!")
-                            else:
-                                ElemVals[igtypdim].append("-1")
+                        elif isEnt:
+                            uvals[k]=valuestr
+                        #
+                        elif(igtyp=='mats'): # Special case for material: every elem needs a material allocated (not the case for Struct, because a 1D object is not necessarily a Beam or Truss
+                            raise ValueError("No "+igtyp+" entity or physgroup found for ielem="+str(ielem)+" in entity="+str(ientity)+"!")
+                    #
+                    ElemVals[igtypdim]=uvals[uinv].tolist()
         except Exception as emsg:
             gmsh.logger.write("Pb in allocating property value to elems:"+str(emsg), level="error")
             return -1
@@ -5054,36 +5469,31 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
         idim=1
         kelems=nallelems[idim]
         kdims=nalldims[idim]
-        nbelems={}
-        for i in range(kelems):
-            ientity=allElemEntityTags[kdims][i]
-            if ientity in nbelems:
-                nbelems[ientity]+=1
-            else:
-                nbelems[ientity]=1
+        try:
+            entruns=self.getEntityRuns(allElemEntityTags[kdims])
+        except Exception as emsg:
+            gmsh.logger.write("Pb in collecting the elems of the Beams:"+str(emsg), level="error")
+            return -1
 
         for igtypdim in ["beamrelax;1","tgload;1","tlload;1"]:
             if igtypdim in ElemVals and ElemVals[igtypdim]!=[]:
                 for i in range(kelems):
                     if ElemVals[igtypdim][i]!="-1":
+                        ientity=allElemEntityTags[kdims][i]
+                        ifirst,ilast,nbelems=entruns[ientity]
+                        ielem_idx=i-ifirst # index of the elem in the Beam
                         if igtypdim=="beamrelax;1":
-                            ientity=allElemEntityTags[kdims][i]
-                            if allElemEntityTags[kdims].count(ientity)==1:
+                            if nbelems==1:
                                 ElemVals[igtypdim][i]+="/S"
-                            else:
-                                #
-                                if (i>0 and allElemEntityTags[kdims][i-1]!=ientity) or i==0: # identifies the first left elem of the Beam
-                                    ElemVals[igtypdim][i]+="/L"
-                                    ielem_idx=0
-                                elif (i<kelems-1 and allElemEntityTags[kdims][i+1]!=ientity) or i==kelems-1: # identifies the last right elem of the Beam
-                                    ElemVals[igtypdim][i]+="/R"
-                                    ielem_idx+=1
-                                else: # intermediate elems in the Beam
-                                    ElemVals[igtypdim][i]+="/I"
-                                    ielem_idx+=1
+                            elif i==ifirst: # identifies the first left elem of the Beam
+                                ElemVals[igtypdim][i]+="/L"
+                            elif i==ilast: # identifies the last right elem of the Beam
+                                ElemVals[igtypdim][i]+="/R"
+                            else: # intermediate elems in the Beam
+                                ElemVals[igtypdim][i]+="/I"
                         #
                         else:
-                            ElemVals[igtypdim][i]+=";"+str(ielem_idx)+";"+str(nbelems[ientity])
+                            ElemVals[igtypdim][i]+=";"+str(ielem_idx)+";"+str(nbelems)
                         #
 
 
@@ -5138,230 +5548,108 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                             ityp=allElemTypes[kdims][i]
                             inodesperelem=self.allElemTypesNbNodes[ityp]
                             for icoord in range(inodesperelem):
-                                inode=allNodeTags.index(allElemNodeTags[kdims][i][icoord])+1
+                                inode=allNodeTags_index[allElemNodeTags[kdims][i][icoord]]+1
                                 #inode=allElemNodeTags[kdims][i][icoord]
                                 if(inode in SameNodeVals):
-                                    svalpart1=SameNodeVals[inode].split("/")[0]
-                                    svalpart2=SameNodeVals[inode].split("/")[1]
-                                    svaltab=svalpart2.split(";")
+                                    svalpart1,svaltab=SameNodeVals[inode]
                                     if(ivalpart1!=svalpart1):
-                                        gmsh.logger.write("Error: Node has already been assigned with '"+svalpart1+"' from '"+svalpart2+"', now trying to assign contradictory '"+ivalpart1+"' from '"+ivalpart2+"'", level="error")
+                                        gmsh.logger.write("Error: Node has already been assigned with '"+svalpart1+"' from '"+";".join(svaltab)+"', now trying to assign contradictory '"+ivalpart1+"' from '"+ivalpart2+"'", level="error")
                                         return -1
                                     else:
                                         if(not ivalpart2 in svaltab):
-                                            SameNodeVals[inode]=SameNodeVals[inode]+";"+ivalpart2
+                                            svaltab.append(ivalpart2)
 
                                 else:
-                                    SameNodeVals[inode]=ival
+                                    SameNodeVals[inode]=[ivalpart1,[ivalpart2]]
         #
-        samevals={}
-        snodes=list(SameNodeVals.keys())
-        svals=list(SameNodeVals.values())
-        svalmerged=self.mergeSameIdx(svals)
-        #
-        for i in range(len(svalmerged)):
-            ival=svalmerged[i]
-            inode=snodes[i]
-            if(ival in samevals):
-                samevals[ival].append(inode)
-            else:
-                samevals[ival]=[inode]
+        samevals=self.mergeSameGroups(SameNodeVals)
         #
         # Prepare SAME to write (Thermal and Structural)
-        SAMEnodes=[]
+        # Sections (INRecords): full blocks spooled next to the .IN file (spooldir=self.dir), not in a /tmp possibly in RAM
+        SAMEnodes=INRecords('(A10,I6,I6,nA10)',spooldir=self.dir) # n: up to ndofmax values
         for ival in samevals:
-            ivaltab=ival.split("/")[0].split(self.sep3)
+            ivaltab=ival[0].split(self.sep3)
 
             for i in range(1,len(samevals[ival])):
-                tmp={}
-                tmp['val']=['SAME',samevals[ival][i],samevals[ival][0]]+ivaltab[0:ndofmax]
-                tmp['fmt']='(A10,I6,I6'
-                for i0 in range(ndofmax):
-                    tmp['fmt']+=',A10'
-                tmp['fmt']+=")"
-                SAMEnodes.append(tmp)
+                SAMEnodes.append(['SAME',samevals[ival][i],samevals[ival][0]]+ivaltab[0:ndofmax])
 
         # (Thermal) : Special storage for 'real_sym' and 'void_sym', where a same point(=elem) can belong to multiple symAxis
-        # len(gmsh.model.mesh.getNodes(0, int(ient)))
+        # The boundary points of all the symAxis are taken at once from the mesh snapshot (no call to gmsh)
         if(self.isThermal):
             syms={}
             symvals={}
-            if(ndims==2):
-                for igtypdim in ['real_sym;1','void_sym;1']:
-                    syms[igtypdim]={}
-                    symvals[igtypdim]={}
-                    kdims=1
-                    if(self.nvoids>0):
-                        if(PropEnts[igtypdim]!={}):
-                            for i in range(len(PropEnts[igtypdim])):
-                                ikey=i
-                                val=PropValEnts[igtypdim][i]
-                                ient=PropEnts[igtypdim][i]
-                                inodes=gmsh.model.getBoundary([(1, int(ient))])
-                                for itup in inodes:
-                                    inode,_,_=gmsh.model.mesh.getNodes(0,itup[1])
-                                    inode_safir=allNodeTags.index(inode[0])+1
-                                    if(not ikey in syms[igtypdim]):
-                                        syms[igtypdim][ikey]=[inode_safir]
-                                    else:
-                                        syms[igtypdim][ikey].append(inode_safir)
-                                symvals[igtypdim][ikey]=val
-                print("syms=",syms['void_sym;1'])
-        #
-            if(ndims==3):
-                for igtypdim in ['void_sym;2']:
-                    syms[igtypdim]={}
-                    symvals[igtypdim]={}
-                    kdims=1
-                    if(self.nvoids>0):
-                        if(PropEnts[igtypdim]!={}):
-                            for i in range(len(PropEnts[igtypdim])):
-                                ikey=i
-                                val=PropValEnts[igtypdim][i]
-                                ient=PropEnts[igtypdim][i]
-                                inodes=gmsh.model.getBoundary([(2, int(ient))],recursive=True)
-                                for itup in inodes:
-                                    inode,_,_=gmsh.model.mesh.getNodes(0,itup[1])
-                                    inode_safir=allNodeTags.index(inode[0])+1
-                                    if(not ikey in syms[igtypdim]):
-                                        syms[igtypdim][ikey]=[inode_safir]
-                                    else:
-                                        syms[igtypdim][ikey].append(inode_safir)
-                                symvals[igtypdim][ikey]=val
-                print("syms=",syms['void_sym;2'])
+            symtypdims=(['real_sym;1','void_sym;1'] if ndims==2 else ['void_sym;2']) if self.nvoids>0 else []
+            symdim=ndims-1
+            syments=[int(ient) for igtypdim in symtypdims for ient in PropEnts[igtypdim]]
+            sympts=self.getEntityBoundaryNodes(symdim,syments,allElemTypes[symdim],allElemEntityTags[symdim],allElemNodeTags[symdim],allNodeTags_index,ptNodeIdx)
+            for igtypdim in (['real_sym;1','void_sym;1'] if ndims==2 else ['void_sym;2']):
+                syms[igtypdim]={}
+                symvals[igtypdim]={}
+                if(igtypdim in symtypdims):
+                    for i in range(len(PropEnts[igtypdim])):
+                        syms[igtypdim][i]=[inode+1 for inode in sympts[int(PropEnts[igtypdim][i])]]
+                        symvals[igtypdim][i]=PropValEnts[igtypdim][i]
+            print("syms=",syms['void_sym;1' if ndims==2 else 'void_sym;2'])
         #
 
         # Prepare Nodes to write (Thermal and Structural)
-        INnodes=[]
+        # Node table: list of blocks of node coordinates (n x 2 or n x 3, in SAFIR axes), the nodes are numbered from 1 in the order of the blocks
+        INnodecols=[1,0] if (ndims==2 and self.isThermal) else [0,1,2][0:ndims] # Thermal 2D: SAFIR X-coord is GMSH Y-coord, and SAFIR Y-coord is GMSH X-coord
         # Node Nubmering is very specific for TSH calculation:
         if istsh:
-            rc,correspnodes=self.specialNodeNumberingTSH(PropPgs['mats;'+str(ishptyp)],PropEnts['mats;'+str(ishptyp)],allElemEntityTags[1],allElemNodeTags[1],allNodeTags,allNodeCoords)
+            rc,correspnodes=self.specialNodeNumberingTSH(PropPgs['mats;'+str(ishptyp)],PropEnts['mats;'+str(ishptyp)],allElemEntityTags[1],allElemNodeTags[1],allNodeTags_index,allNodeCoords)
             nnodes=len(correspnodes)
             if(rc==-1):
                 return -1 # Message has already been displayed in subroutine
             #
-        for i in range(nnodes):
-                idx=i+1 # Redefine the node indexes in the outfile
-                if istsh:
-                    icor=correspnodes[i]
-                else:
-                    icor=i
-                tmp={}
-                if(ndims==2 and self.isThermal):
-                    tmp['val']=['NODE',idx,allNodeCoords[3*icor+1],allNodeCoords[3*icor]]  # Reverse because SAFIR X-coord is GMSH Y-coord, and SAFIR Y-coord is GMSH X-coord
-                    tmp['fmt']='(A10,I6,F11.4,F11.4)'
-                elif(ndims==2):
-                    tmp['val']=['NODE',idx,allNodeCoords[3*icor],allNodeCoords[3*icor+1]]  # Reverse because SAFIR X-coord is GMSH Y-coord, and SAFIR Y-coord is GMSH X-coord
-                    tmp['fmt']='(A10,I6,F11.4,F11.4)'
-                elif(ndims==3):
-                    tmp['val']=['NODE',idx,allNodeCoords[3*icor],allNodeCoords[3*icor+1],allNodeCoords[3*icor+2]]
-                    tmp['fmt']='(A10,I6,F11.4,F11.4,F11.4)'
-                INnodes.append(tmp)
+        if istsh:
+            icors=np.asarray(correspnodes,dtype=np.int64)
+        else:
+            icors=np.arange(nnodes)
+        INnodes=INRecords('(A10,I6,'+str(len(INnodecols))+'F11.6)',spooldir=self.dir)
+        INnodes.extend(['NODE',np.arange(1,len(icors)+1)]+list(allNodeCoords[icors][:,INnodecols].T))
+        # Inverse permutation: node index -> SAFIR node index (from 0), -1 if the node is not written
+        nodeSafirIdx=np.full(len(allNodeTags),-1,dtype=np.int64)
+        nodeSafirIdx[icors]=np.arange(len(icors))
 
 
         # 2/ Prepare imposed temperatures for writing (separately Thermal and Structural)
-        INfixnodes=[]
-        singlenodes=[]
-
-        if(self.isThermal): #(Thermal)
-            fixnodes={}
-            try:
-                for iprop in propstrs:
-                    igtypdim=iprop[0]
-                    if('blks' in igtypdim or ('tors' in igtypdim and istorsrun)):
-                        igtyp,idim=igtypdim.split(';')
-                        idim=int(idim)
-                        kelems=nallelems[idim]
-                        kdims=nalldims[idim]
-                        if PropAtts[igtypdim]!={}:
-                            #
-                            for i in range(kelems):
-                                ielem=allElemTags[kdims][i]
-                                ival=ElemVals[igtypdim][i]
-                                #
-                                if(ival!="-1"):
-
-                                    inodesperelem=self.allElemTypesNbNodes[allElemTypes[kdims][i]]
-                                    #
-                                    for icoord in range(inodesperelem):
-                                        #print
-                                        inode=allNodeTags.index(allElemNodeTags[kdims][i][icoord])
-                                        if istsh:
-                                            inode_safir=correspnodes.index(inode)+1
-                                        else:
-                                            inode_safir=inode+1
-                                        #
-                                        #if(inode_safir in fixnodes):
-                                        #    if(ival!=fixnodes[inode_safir]):
-                                        #        raise ValueError("Node "+str(inode_safir)+" has already been assigned a different value: "+fixnodes[inode_safir])
-                                        #else:
-                                        #    fixnodes[inode_safir]=ival
-
-                                        #TBCkecked if needs to be inside or outside the icoord-loop above
-                                        #ival0=fixnodes[inode_safir]
-                                        if (singlenodes==[] or not inode in singlenodes):
-                                            singlenodes.append(inode)
-                                            print(inode_safir)
-
-                                            for ijval in ival.split(";"):
-                                                tmp={}
-                                                tmp['val']=['BLOCK',inode_safir,ijval]
-                                                tmp['fmt']='(A10,I6,A15)'
-                                                INfixnodes.append(tmp)
-
-                            print('INfixnodes=',INfixnodes)
-            except Exception as emsg:
-                gmsh.logger.write("Pb in getting fixations by node:"+str(emsg), level="error")
-                return -1
-
-        else: # (Structural)
-        # BLOCKS : Agregate from ElemVals to fixnodes - Verfication: Detect if contradictory constraint has been assigned to nodes
-            fixnodes={}
+        INfixnodes=INRecords('(A10,I6,A15)' if self.isThermal else '(A10,I6,nA15)',spooldir=self.dir) # n: up to ndofmax values
+        # BLOCKS : Agregate from ElemVals to the nodes, the first value assigned to a node is kept - Verification: count the nodes assigned with contradictory values
+        isFixed=np.zeros(len(allNodeTags),dtype=bool)
+        blockVals=np.full(len(allNodeTags),None,dtype=object)
+        ncontras=0
+        try:
             for iprop in propstrs:
                 igtypdim=iprop[0]
                 igtyp,idim=igtypdim.split(';')
-
-                if(igtyp=="blks"):
-                    idim=int(idim)
-                    kelems=nallelems[idim]
-                    kdims=nalldims[idim]
-                    #if():
-
+                if(igtyp=="blks" or (self.isThermal and igtyp=="tors" and istorsrun)):
+                    kdims=nalldims[int(idim)]
                     if PropAtts[igtypdim]!={}:
-                        for i in range(kelems):
-                            ival=ElemVals[igtypdim][i]
-                            if(ival!="-1"):
-                                ityp=allElemTypes[kdims][i]
-                                inodesperelem=self.allElemTypesNbNodes[ityp]
-                                for icoord in range(inodesperelem):
-                                    inode=allNodeTags.index(allElemNodeTags[kdims][i][icoord])+1
-                                    #inode=allElemNodeTags[kdims][i][icoord]
-                                    #if(inode in fixnodes):
-                                    #    ival0=fixnodes[inode]
-                                    #    if(ival!=ival0):
-                                    #        gmsh.logger.write("Error: Node has already been assigned with '"+ival0+"', now trying to assign contradictory '"+ival+"'", level="error")
-                                    #        return -1
-                                    #else:
-                                    #    fixnodes[inode]=ival
-        #
-            #for inode,ival in fixnodes.items():
-                                    if (singlenodes==[] or not inode in singlenodes):
-                                        singlenodes.append(inode)
-
-                                        for ijval in ival.split(";"):
-                                            ivaltab=ijval.split("/")[0].split(self.sep3)
-                                            tmp={}
-                                            tmp['val']=['BLOCK',inode]+ivaltab[0:ndofmax]
-                                            tmp['fmt']='(A10,I6,'
-                                            for i0 in range(ndofmax):
-                                                tmp['fmt']+=',A15'
-                                            tmp['fmt']+=")"
-                                            INfixnodes.append(tmp)
+                        ncontras+=self.addBlockNodeVals(isFixed,blockVals,ElemVals[igtypdim],allElemTypes[kdims],allElemNodeTags[kdims],allNodeTags_index)
+            if(ncontras>0):
+                gmsh.logger.write(str(ncontras)+" node(s) have been assigned contradictory BLOCK values - The first assigned value is kept", level="warning")
+            #
+            # BLOCK lines in the order of the SAFIR nodes
+            fixed=np.nonzero(isFixed)[0]
+            fixed=fixed[np.argsort(nodeSafirIdx[fixed],kind='stable')]
+            for inode in fixed.tolist():
+                inode_safir=self.getSafirNodeIdx(nodeSafirIdx,inode)+1
+                ival=blockVals[inode]
+                for ijval in ival.split(";"):
+                    if(self.isThermal):
+                        INfixnodes.append(['BLOCK',inode_safir,ijval])
+                    else:
+                        ivaltab=ijval.split("/")[0].split(self.sep3)
+                        INfixnodes.append(['BLOCK',inode_safir]+ivaltab[0:ndofmax])
+        except Exception as emsg:
+            gmsh.logger.write("Pb in getting fixations by node:"+str(emsg), level="error")
+            return -1
 
 
         # 4/ Prepare F.E. for writing (separately Thermal nd Structural)
         if(self.isThermal): # (Thermal)
-            INelems=[]
+            INelems=INRecords('(A10,I8,'+str(8 if ndims==3 else 4)+'I6,A8,A7)',spooldir=self.dir)
 
             try:
                 if(ndims==2):
@@ -5369,7 +5657,6 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                 if(ndims==3):
                     nnodesperelemmax=8
                 for i in range(nelems):
-                    tmp={}
                     ielem=allElemTags[ndims][i]
                     ientity=allElemEntityTags[ndims][i]
                     imat,iepsr=ElemVals['mats;'+str(ishptyp)][i].split(self.sep3)
@@ -5377,28 +5664,14 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                     ncoords=[] #number of nodes for the elems, completed for SAFIR to 4 (dim=2) or to 8 (dim=3)
                     for icoord in range(inodesperelem):
                         inode=allNodeTags_index[allElemNodeTags[ndims][i][icoord]]
-                        if istsh:
-                            inode_safir=correspnodes.index(inode)
-                        else:
-                            inode_safir=inode
-                        ncoords.append(inode_safir+1)
+                        ncoords.append(self.getSafirNodeIdx(nodeSafirIdx,inode)+1)
 
                     if(inodesperelem<nnodesperelemmax):
                         for icoord in range(nnodesperelemmax-inodesperelem):
                             ncoords.append(0)
 
-                    ffmt="(A10,I8,"
                     idx=i+1  # Redefine the elem indexes in the outfile
-                    flst=[];flst.append('ELEM');flst.append(idx); # write the elem index in the outfile, not the elemtag
-                    for icoord in range(nnodesperelemmax):
-                        ffmt+="I6,"
-                        flst.append(ncoords[icoord])
-                    #ffmt+="I8,F7.0)"
-                    ffmt+="I8,I7)"
-                    flst.append(imat);flst.append(iepsr)
-                    tmp['val']=flst
-                    tmp['fmt']=ffmt
-                    INelems.append(tmp)
+                    INelems.append(['ELEM',idx]+ncoords[0:nnodesperelemmax]+[imat,iepsr]) # write the elem index in the outfile, not the elemtag
 
             except Exception as emsg:
                 gmsh.logger.write("Pb for preparing F.E. for writing:"+str(emsg), level="error")
@@ -5408,9 +5681,11 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
             #
             #  Prepare Beams for writing (Structural)
             idxelem=0
-            idxbeams=[]
-            INelemBeams=[]
+            idxbeams=np.zeros(nallelems[1],dtype=np.int64) # SAFIR Beam number of each 1D mesh elem (0: not a Beam)
+            INelemBeams=INRecords('(A10,I6,I11,I11,I11,I11)' if ndims==2 else '(A10,I6,I11,I11,I11,I11,I11)',spooldir=self.dir)
             INsectionBeams=[]
+            INsectionBeamsIdx={} # Section signature -> section number (first-seen order)
+            INsectionBeamsElem=np.zeros(nallelems[1],dtype=np.int32) # Section number of each 1D mesh elem (0: not a Beam)
             NFIBER=1
             #
             try:
@@ -5422,7 +5697,6 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                 idx=nnodes;idxelem=0
                 igtypdim='beamcormat;1'
                 igtypdim2='beamlax;1'
-                ientityold=-999
 
 # This was installed during debug_RS_20241104 (with no clear goal), but removed with no major effect for debug_JPM_20250504
 #                 if PropAtts[igtypdim]!={}:
@@ -5435,88 +5709,69 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
 
 
                 if PropAtts[igtypdim]!={}:
-                    for i in range(nallelems[1]):
+                    ib=np.array([i for i in range(nallelems[1]) if ElemVals[igtypdim][i]!="-1"],dtype=np.int64) # 1D mesh elems that are Beams
+                    nb=len(ib)
+                    if(ndims==3):
+                        for i in ib.tolist():
+                            if(ElemVals[igtypdim2][i]=="-1"):
+                                raise ValueError(" Need to assign a local axes to 'Curve "+str(allElemEntityTags[1][i])+"'")
+                    #
+                    # 3rd (middle) node of all the Beams at once
+                    bidx1=allNodeTags_index[allElemNodeTags[1][ib,0]] # left point of Beam
+                    bidx2=allNodeTags_index[allElemNodeTags[1][ib,1]] # right point of Beam
+                    P3=(allNodeCoords[bidx1][:,INnodecols]+allNodeCoords[bidx2][:,INnodecols])/2
+                    #
+                    # Struct 3D Only: 4th node (longer axis of the beam slice), one per entity, added right after the middle node of the first elem of the entity
+                    # Local axes of all the Beam entities, computed once per (entity, LAX)
+                    node4s={}
+                    isnew4=np.zeros(nb,dtype=bool)
+                    P4={}
+                    nsharedlax=0 # -sharelaxnodes option
+                    if(ndims==3):
+                        laxids={};entlaxs=[]
+                        for i in ib.tolist():
+                            ilax=ElemVals[igtypdim2][i]
+                            if not ilax in laxids:
+                                laxids[ilax]=[k for k in range(len(self.listLAX)) if ilax+";1" in list(self.listLAX[k].keys())[0]][0]
+                            entlaxs.append((int(allElemEntityTags[1][i]),laxids[ilax]))
+                        beamslax=self.getBeamsLAX(entlaxs)
+                        node4s,isnew4,P4,nsharedlax=self.getBeamLAXNodes(allElemEntityTags[1][ib],allNodeCoords[bidx1][:,INnodecols],allNodeCoords[bidx2][:,INnodecols],P3,entlaxs,beamslax,nnodes)
+                    #
+                    # Node numbers of the middle nodes (shifted by the 4th nodes added before) and block of new nodes in the node table
+                    node3s=nnodes+1+np.arange(nb)+np.cumsum(isnew4)-isnew4
+                    beamnodes=np.zeros((nb+len(P4),len(INnodecols)))
+                    beamnodes[node3s-nnodes-1]=P3
+                    for k in P4:
+                        beamnodes[node3s[k]-nnodes]=P4[k]
+                    INnodes.extend(['NODE',np.arange(len(INnodes)+1,len(INnodes)+len(beamnodes)+1)]+list(beamnodes.T))
+                    idx=nnodes+len(beamnodes)
+                    #
+                    for k in range(nb):
+                        i=int(ib[k])
                         ielem=allElemTags[1][i]
                         ientity=allElemEntityTags[1][i]
-
-                        if(ElemVals[igtypdim][i]!="-1"):
-                            tmp={};tmpelem={}
-
-
-                            if(ndims==3 and ElemVals[igtypdim2][i]=="-1"):
-                                raise ValueError(" Need to assign a local axes to 'Curve "+str(ientity)+"'")
-                            #
-                            inodesperelem=self.allElemTypesNbNodes[allElemTypes[1][i]]
-                            idx1=allNodeTags.index(allElemNodeTags[1][i][0])
-                            idx2=allNodeTags.index(allElemNodeTags[1][i][1])
-                            node1=idx1+1 # left point of Beam
-                            node2=idx2+1 # rightpoint of Beam
-                            #
-                            # Add 3rd (middle node)
-                            idx+=1
-                            node3=idx
-                            if(ndims==2 and self.isThermal):
-                                x1=allNodeCoords[3*idx1+1];y1=allNodeCoords[3*idx1]
-                                x2=allNodeCoords[3*idx2+1];y2=allNodeCoords[3*idx2]
-                                x3=(x1+x2)/2;y3=(y1+y2)/2;z3=0
-                                tmp['val']=['NODE',idx,x3,y3]
-                                tmp['fmt']='(A10,I6,F11.4,F11.4)'
-
-                            elif(ndims==2):
-                                x1=allNodeCoords[3*idx1];y1=allNodeCoords[3*idx1+1]
-                                x2=allNodeCoords[3*idx2];y2=allNodeCoords[3*idx2+1]
-                                x3=(x1+x2)/2;y3=(y1+y2)/2;z3=0
-                                tmp['val']=['NODE',idx,x3,y3]
-                                tmp['fmt']='(A10,I6,F11.4,F11.4)'
-                            #
-                            elif(ndims==3):
-                                x1=allNodeCoords[3*idx1];y1=allNodeCoords[3*idx1+1];z1=allNodeCoords[3*idx1+2]
-                                x2=allNodeCoords[3*idx2];y2=allNodeCoords[3*idx2+1];z2=allNodeCoords[3*idx2+2]
-                                x3=(x1+x2)/2;y3=(y1+y2)/2;z3=(z1+z2)/2
-                                tmp['val']=['NODE',idx,x3,y3,z3]
-                                tmp['fmt']='(A10,I6,F11.4,F11.4,F11.4)'
-                            #
-                            INnodes.append(tmp)
-                            #
-                            # Store different sections:
-                            imat=ElemVals[igtypdim][i]
-                            if(imat in INsectionBeams):
-                                sectidx=INsectionBeams.index(imat)+1
-                            else:
-                                INsectionBeams.append(imat)
-                                sectidx=len(INsectionBeams)
-                            #
-                            # Struct 3D Only: Add 4th node (longer axis of the beam slice)
-                            #
-                            if(ndims==3):
-                                if(ientity!=ientityold):
-                                    ilax=ElemVals[igtypdim2][i]
-                                    idx+=1
-                                    node4=idx
-                                    #
-                                    self.laxid=[k for k in range(len(self.listLAX)) if ilax+";1" in list(self.listLAX[k].keys())[0]][0]
-                                    #self.isViewLAX=False
-                                    self.LAXspecial=True
-                                    (Yp_x,Yp_y,Yp_z)=self.recreateLAXView("Curve "+str(ientity))
-                                    x4=x3+Yp_x;y4=y3+Yp_y;z4=z3+Yp_z
-                                    self.LAXspecial=False
-                                    ientityold=ientity
-                                    tmp={}
-                                    tmp['val']=['NODE',idx,x4,y4,z4]
-                                    tmp['fmt']='(A10,I6,F11.4,F11.4,F11.4)'
-                                    INnodes.append(tmp)
-
-                            # Add NODOFBEAM
-                            idxbeams.append(ielem)
-                            idxelem+=1
-                            if(ndims==2):
-                                tmpelem['val']=['ELEM',idxelem,node1,node3,node2,sectidx]
-                                tmpelem['fmt']='(A10,I6,I11,I11,I11,I11)'
-                            if(ndims==3):
-                                tmpelem['val']=['ELEM',idxelem,node1,node3,node2,node4,sectidx]
-                                tmpelem['fmt']='(A10,I6,I11,I11,I11,I11,I11)'
-                            #
-                            INelemBeams.append(tmpelem)
+                        node1=bidx1[k]+1
+                        node2=bidx2[k]+1
+                        node3=node3s[k]
+                        #
+                        # Store different sections:
+                        imat=ElemVals[igtypdim][i]
+                        sectidx=INsectionBeamsIdx.setdefault(imat,len(INsectionBeamsIdx)+1)
+                        INsectionBeamsElem[i]=sectidx
+
+                        # Add NODOFBEAM
+                        idxelem+=1
+                        idxbeams[i]=idxelem
+                        if(ndims==2):
+                            tmpelem=['ELEM',idxelem,node1,node3,node2,sectidx]
+                        if(ndims==3):
+                            node4=node4s[int(ientity)]
+                            tmpelem=['ELEM',idxelem,node1,node3,node2,node4,sectidx]
+                        #
+                        INelemBeams.append(tmpelem)
+                INsectionBeams=list(INsectionBeamsIdx)
+                if(self.shareLAXNodes and ndims==3 and PropAtts[igtypdim]!={}):
+                    gmsh.logger.write(str(nsharedlax)+" Beam entities share the 4th node of another Beam (-sharelaxnodes)", level="info")
                 #
                 # Get NFIBER
                 for i in range(len(INsectionBeams)):
@@ -5524,12 +5779,10 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                     ifile=imat.split(self.sep3)[0].strip()
                     try:
                         file0=os.path.join(self.dir,ifile)
-                        f=open(file0,'r')
-                        lines=f.readlines()
-                        iline=[k for k in lines if 'NFIBERBEAM' in k][0]
-                        NFIB=int(iline.split('NFIBERBEAM')[1].replace("\r","").replace("\n",""))
+                        NFIB=self.getSectionFileMeta(file0)["NFIBERBEAM"]
+                        if(NFIB==None):
+                            raise ValueError("NFIBERBEAM not found")
                         NFIBER=max(NFIBER,NFIB)
-                        f.close()
                     except Exception as emsg0:
                         gmsh.logger.write("Pb in reading file "+file0+": "+str(emsg0)+" - will keep precedent determined value", level="warning")
                         #
@@ -5542,10 +5795,12 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
 
             #
             # Prepare Shell for writing (Structural)
-            INelemShells=[]
+            INelemShells=INRecords('(A10,I6,I11,I11,I11,I11,I11)',spooldir=self.dir)
             NREBARS=0
-            idxshells=[]
+            idxshells=np.zeros(nallelems[2],dtype=np.int64) # SAFIR Shell number of each 2D mesh elem (0: not a Shell)
             INsectionShells=[]
+            INsectionShellsIdx={} # Section signature (material//rebar) -> section number (first-seen order)
+            INsectionShellsElem=np.zeros(nallelems[2],dtype=np.int32) # Section number of each 2D mesh elem (0: not a Shell)
             idxelem=0
             #
             try:
@@ -5554,22 +5809,18 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                 igtypdim='shcormat;2'
                 igtypdim2='rebar;2'
 
-                ientityold=-999
-
                 if igtypdim in PropAtts and PropAtts[igtypdim]!={}:
                     for i in range(nallelems[2]):
                         ielem=allElemTags[2][i]
                         ientity=allElemEntityTags[2][i]
-                        #idxshells.append(ielem)
 
                         if(ElemVals[igtypdim][i]!="-1"):
-                            tmp={};tmpelem={}
                             #
                             inodesperelem=self.allElemTypesNbNodes[allElemTypes[2][i]]
-                            idx1=allNodeTags.index(allElemNodeTags[2][i][0])
-                            idx2=allNodeTags.index(allElemNodeTags[2][i][1])
-                            idx3=allNodeTags.index(allElemNodeTags[2][i][2])
-                            idx4=allNodeTags.index(allElemNodeTags[2][i][3])
+                            idx1=allNodeTags_index[allElemNodeTags[2][i][0]]
+                            idx2=allNodeTags_index[allElemNodeTags[2][i][1]]
+                            idx3=allNodeTags_index[allElemNodeTags[2][i][2]]
+                            idx4=allNodeTags_index[allElemNodeTags[2][i][3]]
                             #
                             node1=idx1+1
                             node2=idx2+1
@@ -5583,20 +5834,17 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                                 nbar=int(irebar.split("/")[0])
                                 NREBARS=max(NREBARS,nbar)
                             ikey=imat+"//"+irebar
-                            if(ikey in INsectionShells):
-                                sectidx=INsectionShells.index(ikey)+1
-                            else:
-                                INsectionShells.append(ikey)
-                                sectidx=len(INsectionShells)
+                            sectidx=INsectionShellsIdx.setdefault(ikey,len(INsectionShellsIdx)+1)
+                            INsectionShellsElem[i]=sectidx
 
                             # Add NODOFSHELL
-                            idxshells.append(ielem)
                             idxelem+=1
-                            tmpelem['val']=['ELEM',idxelem,node1,node2,node3,node4,sectidx]
-                            tmpelem['fmt']='(A10,I6,I11,I11,I11,I11,I11)'
+                            idxshells[i]=idxelem
+                            tmpelem=['ELEM',idxelem,node1,node2,node3,node4,sectidx]
                             #
                             INelemShells.append(tmpelem)
                         #
+                INsectionShells=list(INsectionShellsIdx)
             except Exception as emsg:
                 gmsh.logger.write("Pb in preparing Shell elems for writing (Did you Recombine to get only quads before meshing?):"+str(emsg), level="error")
                 return -1
@@ -5607,17 +5855,16 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
 
             #
             # Prepare Truss for writing (Structural): FE is the entire Curve (mesh=2 extrem points)
-            INelemTruss=[]
+            INelemTruss=INRecords('(A10,I6,I11,I11,I11)',spooldir=self.dir)
             INgroupTruss=[]
             idxelem=0
             #
             for i in range(len(PropPgs['trusscormat;1'])):
                 ipg=int(PropPgs['trusscormat;1'][i])
                 for ient in gmsh.model.getEntitiesForPhysicalGroup(1, int(ipg)):
-                    tmpelem={}
                     shpedges=gmsh.model.getBoundary([(1, int(ient))],recursive=True)
-                    node1=allNodeTags.index([allElemNodeTags[0][i0] for i0 in range(nallelems[0]) if allElemEntityTags[0][i0]==shpedges[0][1]][0][0])+1
-                    node2=allNodeTags.index([allElemNodeTags[0][i0] for i0 in range(nallelems[0]) if allElemEntityTags[0][i0]==shpedges[1][1]][0][0])+1
+                    node1=ptNodeIdx[shpedges[0][1]]+1
+                    node2=ptNodeIdx[shpedges[1][1]]+1
                     #
                     # Store different sections:
                     imat=PropValPgs['trusscormat;1'][i]
@@ -5629,17 +5876,15 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                     #
                     # Add NODOFTRUSS
                     idxelem+=1
-                    tmpelem['val']=['ELEM',idxelem,node1,node2,sectidx]
-                    tmpelem['fmt']='(A10,I6,I11,I11,I11)'
+                    tmpelem=['ELEM',idxelem,node1,node2,sectidx]
                     #
                     INelemTruss.append(tmpelem)
             #
             for i in range(len(PropEnts['trusscormat;1'])):
                 ient=int(PropEnts['trusscormat;1'][i])
-                tmpelem={}
                 shpedges=gmsh.model.getBoundary([(1, int(ient))],recursive=True)
-                node1=allNodeTags.index([allElemNodeTags[0][i0] for i0 in range(nallelems[0]) if allElemEntityTags[0][i0]==shpedges[0][1]][0][0])+1
-                node2=allNodeTags.index([allElemNodeTags[0][i0] for i0 in range(nallelems[0]) if allElemEntityTags[0][i0]==shpedges[1][1]][0][0])+1
+                node1=ptNodeIdx[shpedges[0][1]]+1
+                node2=ptNodeIdx[shpedges[1][1]]+1
                 #
                 # Store different sections:
                 imat=PropValEnts['trusscormat;1'][i]
@@ -5651,8 +5896,7 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                 #
                 # Add NODOFTRUSS
                 idxelem+=1
-                tmpelem['val']=['ELEM',idxelem,node1,node2,sectidx]
-                tmpelem['fmt']='(A10,I6,I11,I11,I11)'
+                tmpelem=['ELEM',idxelem,node1,node2,sectidx]
                 #
                 INelemTruss.append(tmpelem)
             #
@@ -5662,48 +5906,36 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
 
             #
             # Prepare Springs for writing (Structural)
-            INelemSpring=[]
+            INelemSpring=INRecords('(A10,I6,I6,nG)',spooldir=self.dir) # n: number of parameters of the spring
             idxelem=0
             #
             for i in range(len(PropPgs['spring;0'])):
                 ipg=int(PropPgs['spring;0'][i])
                 for ient in gmsh.model.getEntitiesForPhysicalGroup(0, int(ipg)):
-                    tmpelem={}
-                    shpedges=gmsh.model.getBoundary([(0, int(ient))],recursive=True)
-                    node1=allNodeTags.index([allElemNodeTags[0][i0] for i0 in range(nallelems[0]) if allElemEntityTags[0][i0]==shpedges[0][1]][0][0])+1
+                    node1=ptNodeIdx[int(ient)]+1
                     #
                     # Add NDFSPRING
                     idxelem+=1
                     ivaltab=PropValPgs['spring;0'][i].split(self.sep3)
                     nparams=len(ivaltab)
-                    tmpelem={}
-                    tmpelem['val']=['ELEM',idxelem,node1]
-                    tmpelem['fmt']='(A10,I6,I6'
+                    tmpelem=['ELEM',idxelem,node1]
                     for iparam in range(nparams):
-                        tmpelem['fmt']+=',F10.1'
-                        tmpelem['val'].append(float(ivaltab[iparam]))
-                    tmpelem['fmt']+=")"
+                        tmpelem.append(float(ivaltab[iparam]))
                     #
                     INelemSpring.append(tmpelem)
             #
             for i in range(len(PropEnts['spring;0'])):
                 ient=int(PropEnts['spring;0'][i])
-                tmpelem={}
-                shpedges=gmsh.model.getBoundary([(0, int(ient))],recursive=True)
-                node1=allNodeTags.index([allElemNodeTags[0][i0] for i0 in range(nallelems[0]) if allElemEntityTags[0][i0]==shpedges[0][1]][0][0])+1
+                node1=ptNodeIdx[int(ient)]+1
                 #
                 # Add NDFSPRING
                 idxelem+=1
                 #print('PropValPgs["spring;0][i]=',PropValPgs['spring;0'][i])
                 ivaltab=PropValEnts['spring;0'][i].split(self.sep3)
                 nparams=len(ivaltab)
-                tmpelem={}
-                tmpelem['val']=['ELEM',idxelem,node1]
-                tmpelem['fmt']='(A10,I6,I6'
+                tmpelem=['ELEM',idxelem,node1]
                 for iparam in range(nparams):
-                    tmpelem['fmt']+=',F10.1'
-                    tmpelem['val'].append(float(ivaltab[iparam]))
-                tmpelem['fmt']+=")"
+                    tmpelem.append(float(ivaltab[iparam]))
                 #
                 INelemSpring.append(tmpelem)
             #
@@ -5712,7 +5944,7 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
 
             #
             # Prepare Solid for writing (Structural)
-            INelemSolid=[]
+            INelemSolid=INRecords('(A10,I6,8G,I6,3G)',spooldir=self.dir)
             idxelem=0
             NSOLID=0
 
@@ -5722,19 +5954,17 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                 #
                 idxelem=0
                 igtypdim='solcormat;3'
-                ientityold=-999
 
                 if igtypdim in PropAtts and PropAtts[igtypdim]!={}:
                     for i in range(nallelems[3]):
                         if(ElemVals[igtypdim][i]!="-1"):
-                            tmp={};tmpelem={}
                             ielem=allElemTags[3][i]
                             ientity=allElemEntityTags[3][i]
                             #
                             inodesperelem=self.allElemTypesNbNodes[allElemTypes[3][i]]
                             ncoords=[] #number of nodes for the elems
                             for icoord in range(inodesperelem):
-                                ncoords.append(allNodeTags.index(allElemNodeTags[3][i][icoord])+1) # node numbering in SAFIR
+                                ncoords.append(allNodeTags_index[allElemNodeTags[3][i][icoord]]+1) # node numbering in SAFIR
                                 #ncoords.append(allElemNodeTags[3][i][icoord]) # DEBUG: node numbering in GMSH
                             if(inodesperelem<nnodesperelemmax):
                                 for icoord in range(nnodesperelemmax-inodesperelem):
@@ -5744,21 +5974,15 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
 
                             idxelem+=1
                             _,imat,res1,res2,res3=ElemVals[igtypdim][i].split(self.sep3)
-                            iglomat=[i0 for i0 in range(len(self.listMats)) if list(self.listMats[i0].keys())[0].split('/')[0]==imat+";3"][0]
+                            iglomat=self.getGlobalMatIdx(imat,3)
                             res1=float(res1);res2=float(res2);res3=float(res3)
                             #
-                            tmpelem={}
-                            tmpelem['val']=['ELEM',idxelem]
-                            tmpelem['fmt']='(A10,I6,'
+                            tmpelem=['ELEM',idxelem]
                             #
                             for icoord in range(nnodesperelemmax):
-                                tmpelem['fmt']+=',F10.1'
-                                tmpelem['val'].append(float(ncoords[icoord]))
-                            tmpelem['fmt']+=',I6'
-                            tmpelem['val'].append(iglomat+1)
-                            tmpelem['fmt']+=',F10.1,F10.1,F10.1'
-                            tmpelem['val'].append(res1);tmpelem['val'].append(res2);tmpelem['val'].append(res3)
-                            tmpelem['fmt']+=")"
+                                tmpelem.append(float(ncoords[icoord]))
+                            tmpelem.append(iglomat+1)
+                            tmpelem.append(res1);tmpelem.append(res2);tmpelem.append(res3)
                             INelemSolid.append(tmpelem)
 
                         #
@@ -5778,7 +6002,11 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                 if(ndims==3):
                     nfacesperelemmax=6
                 #
-                INfrontiers=[]
+                INfrontiers=INRecords('(A5,I6,'+str(nfacesperelemmax)+'A12)',spooldir=self.dir)
+                # Shared face index of the (ndims) elems, for FLUX, FRONTIER and VOID (built once, only if one of them is defined)
+                solidfaces={}
+                if(any([PropAtts[iprop[0]]!={} for iprop in propstrs if ('flxs' in iprop[0] or 'frtiers' in iprop[0])]) or (self.nvoids>0 and PropAtts['void;'+str(ndimsm)]!={})):
+                    solidfaces=self.getSolidFaceIndex(allElemNodeTags[ndims],allElemTypes[ndims])
                 for iprop in propstrs:
                     igtypdim=iprop[0]
                     if('flxs' in igtypdim or 'frtiers' in igtypdim):
@@ -5794,54 +6022,13 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                             else:
                                 ipref='F'
 
-                            # Préparation des variables : on a besoin d'un vecteur frtierfaceS
-                            frtierfaceS = []
-                            frtierfaceSi = []
-                            for i in range(nelemsm):
-                                if(ElemVals[igtypdim][i]!="-1"):
-                                    ielem=allElemTags[ndimsm][i]
-                                    ientity=allElemEntityTags[ndimsm][i]
-                                    frtierface=allElemNodeTags[ndimsm][i]
-                                    frtierface.sort()
-                                    frtierfaceS.append(frtierface)
-                                    frtierfaceSi.append(i)
-                            # Boucle de recherche
-                            for im in range(nelems):
-                                ielem=allElemTags[ndims][im]
-                                ielemnodes = allElemNodeTags[ndims][im]
-                                ielemtype=allElemTypes[ndims][im]
-                                ifaces=self.getOrderedFaces(ielemtype,ielemnodes)
-                                #if(ielem==615): print(str(ifaces))
-                                found=False
-                                faceConstraints=['NO' for i0 in range(nfacesperelemmax)]
-                                for ifa in range(len(ifaces)):
-                                    elemface=ifaces[ifa]
-                                    elemface.sort()
-                                    try:
-                                        #if(elemface[0]==36 and elemface[1]==37): print("FRTIERS2-1: "+str(ifa)+","+str(elemface))
-                                        j = frtierfaceS.index(elemface)
-                                        #print("FRTIERS2-2: "+str(ifa)+","+str(elemface))
-                                        idx=im+1
-                                        ifa0=ifa
-                                        tmp={}
-                                        i = frtierfaceSi[j]
-                                        faceConstraints[ifa0]=ElemVals[igtypdim][i]
-                                        strtmp=""
-                                        for it in range(nfacesperelemmax-1):
-                                            strtmp+="A12,"
-                                        ffmt='(A5,I6,'+strtmp+'A12)'
-                                        flst=[ipref,idx]+faceConstraints
-                                        tmp['val']=flst
-                                        tmp['fmt']=ffmt
-                                        if(found):
-                                            INfrontiers[-1] = tmp
-                                        else:
-                                            INfrontiers.append(tmp)
-                                        found=True
-                                    except:
-                                        pass
-                            del frtierfaceS
-                            del frtierfaceSi
+                            # Faces of the (ndims) elems having the constraint, from the shared face index
+                            elemfaces={}
+                            for im,ifa,ival in self.getConstrainedFaces(solidfaces,allElemNodeTags[ndimsm],allElemTypes[ndimsm],ElemVals[igtypdim]):
+                                elemfaces.setdefault(im,['NO' for i0 in range(nfacesperelemmax)])[ifa]=ival
+                            for im,faceConstraints in elemfaces.items(): # one line per elem, with the constraints of all its faces
+                                idx=im+1
+                                INfrontiers.append([ipref,idx]+faceConstraints)
 
             except Exception as emsg:
                 gmsh.logger.write("Pb in preparing constraints flxs,frtiers for writing:"+str(emsg), level="error")
@@ -5868,59 +6055,27 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                     ipref='ELEM'
                     if PropAtts[igtypdim]!={}:
                         print("PropAtts[igtypdim]=",PropAtts[igtypdim])
-                        frtierfaceS = []
-                        frtierfaceSi = []
-
-                        for i in range(nelemsm):
-                            if(ElemVals[igtypdim][i]!="-1"):
-                                ielem=allElemTags[ndimsm][i]
-                                ientity=allElemEntityTags[ndimsm][i]
-                                frtierface=allElemNodeTags[ndimsm][i]
-                                frtierface.sort()
-                                frtierfaceS.append(frtierface)
-                                frtierfaceSi.append(i)
-                        # Boucle de recherche
-                        for im in range(nelems):
-                            ielem=allElemTags[ndims][im]
-                            ielemnodes = allElemNodeTags[ndims][im]
-                            ielemtype=allElemTypes[ndims][im]
-                            ifaces=self.getOrderedFaces(ielemtype,ielemnodes)
-                            for ifa in range(len(ifaces)):
-                                elemface=ifaces[ifa]
-                                elemface.sort()
-                                try:
-                                    j = frtierfaceS.index(elemface)
-                                    i = frtierfaceSi[j]
-                                    ival0=ElemVals[igtypdim][i]
-                                    idx=im+1
-                                    ifa0=ifa
-                                    tmp={}
-                                    tmp['val']=[ipref,idx,ifa0+1]
-                                    tmp['fmt']='(A5,I6,I4)'
-
-                                    if(ival0 in INvoids):
-                                        INvoids[ival0].append(tmp)
-                                        frtvoids[ival0]+=1
-                                    else:
-                                        INvoids[ival0]=[tmp]
-                                        frtvoids[ival0]=1
-                                #
-                                except:
-                                    pass
-                        del frtierfaceS
-                        del frtierfaceSi
+                        # Faces of the (ndims) elems on a void boundary, from the shared face index (see frontiers above)
+                        for im,ifa,ival0 in self.getConstrainedFaces(solidfaces,allElemNodeTags[ndimsm],allElemTypes[ndimsm],ElemVals[igtypdim]):
+                            idx=im+1
+                            if(ival0 in INvoids):
+                                frtvoids[ival0]+=1
+                            else:
+                                INvoids[ival0]=INRecords('(A5,I6,I4)',spooldir=self.dir)
+                                frtvoids[ival0]=1
+                            INvoids[ival0].append([ipref,idx,ifa+1])
 
                         for k,ifrtvoid in frtvoids.items():
                             nfrontiervoids=max(nfrontiervoids,ifrtvoid)
 
                 except Exception as emsg:
-                    gmsh.logger.write("Pb in preparing Void for writing "+str(ivoid)+":"+str(emsg), level="error")
+                    gmsh.logger.write("Pb in preparing Void for writing:"+str(emsg), level="error")
                     return -1
 
 
         #7/ Prepare Mass for writing (Structural)
         if(not self.isThermal):
-            INelemMass=[]
+            INelemMass=INRecords('(A10,I6,nG)',spooldir=self.dir) # n: number of mass values
             #
             try:
                 for iprop in propstrs:
@@ -5939,25 +6094,21 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                                 if(ElemVals[igtypdim][i]!="-1"):
                                     if(idim==0):
                                         inodetag=allElemNodeTags[kdims][i][0]
-                                        idx=allNodeTags.index(inodetag)+1
+                                        idx=allNodeTags_index[inodetag]+1
                                         iflag="M_NODE"
                                     elif(idim==1):
-                                        idx=idxbeams.index(ielem)+1
+                                        idx=self.getElemOutIdx(idxbeams,i,ielem,'Beam')
                                         iflag="M_BEAM"
                                     elif(idim==2):
-                                        idx=idxshells.index(ielem)+1
+                                        idx=self.getElemOutIdx(idxshells,i,ielem,'Shell')
                                         iflag="M_SHELL"
                                     #
 
                                     ivaltab=ElemVals[igtypdim][i].split(self.sep3)
                                     nparams=len(ivaltab)
-                                    tmpelem={}
-                                    tmpelem['val']=[iflag,idx]
-                                    tmpelem['fmt']='(A10,I6'
+                                    tmpelem=[iflag,idx]
                                     for iparam in range(nparams):
-                                        tmpelem['fmt']+=',F10.1'
-                                        tmpelem['val'].append(float(ivaltab[iparam]))
-                                    tmpelem['fmt']+=")"
+                                        tmpelem.append(float(ivaltab[iparam]))
                                     INelemMass.append(tmpelem)
                             #
             except Exception as emsg:
@@ -5992,7 +6143,7 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                                         nparams=len(ivaltab[1:])
                                         #
                                         if(not ifunc in INelemLoads):
-                                            INelemLoads[ifunc]=[]
+                                            INelemLoads[ifunc]=INRecords('(A10,I6,nG)',spooldir=self.dir) # n: number of load values
                                         #
                                         # Recalculate values for special case of trapezoidal loads:
                                         if(igtyp=="tlload" or igtyp=="tgload"):
@@ -6006,10 +6157,10 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                                         #
                                         if(idim==0):
                                             inodetag=allElemNodeTags[kdims][i][0]
-                                            idx=allNodeTags.index(inodetag)+1
+                                            idx=allNodeTags_index[inodetag]+1
                                             iflag="NODELOAD"
                                         elif(idim==1):
-                                            idx=idxbeams.index(ielem)+1
+                                            idx=self.getElemOutIdx(idxbeams,i,ielem,'Beam')
                                             if igtyp=="sload":
                                                 iflag="DISTRBEAM"
                                             elif igtyp=="tgload":
@@ -6017,16 +6168,12 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                                             elif igtyp=="tlload":
                                                 iflag="TRAPLOCBM"
                                         elif(idim==2):
-                                            idx=idxshells.index(ielem)+1
+                                            idx=self.getElemOutIdx(idxshells,i,ielem,'Shell')
                                             iflag="DISTRSH"
                                         #
-                                        tmpelem={}
-                                        tmpelem['val']=[iflag,idx]
-                                        tmpelem['fmt']='(A10,I6'
+                                        tmpelem=[iflag,idx]
                                         for iparam in range(nparams):
-                                            tmpelem['fmt']+=',F10.2'
-                                            tmpelem['val'].append(float(ivaltab[iparam+1]))
-                                        tmpelem['fmt']+=")"
+                                            tmpelem.append(float(ivaltab[iparam+1]))
                                         INelemLoads[ifunc].append(tmpelem)
                             #
             except Exception as emsg:
@@ -6037,7 +6184,7 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
 
         #7/ Prepare Beam Relaxtion for writing (Structural)
         if(not self.isThermal):
-            INelemRelax=[]
+            INelemRelax=INRecords('(A10,I6,nG)',spooldir=self.dir) # n: 6 (2D) or 14 (3D) dofs
             #
             try:
                 #
@@ -6057,15 +6204,13 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                         if(ElemVals[igtypdim][i]!="-1"):
                             ielem=allElemTags[kdims][i]
 
-                            idx=idxbeams.index(ielem)+1
+                            idx=self.getElemOutIdx(idxbeams,i,ielem,'Beam')
                             print("RELAX:",idx," | ",ielem," | ",ElemVals[igtypdim][i])
                             ivaltab0,ivalcompl=ElemVals[igtypdim][i].split('/')
                             ivaltab=ivaltab0.split(self.sep3)
                             #
                             if ivalcompl=="L" or ivalcompl=="R":
-                                tmpelem={}
-                                tmpelem['val']=['ELEM',idx]
-                                tmpelem['fmt']='(A10,I6'
+                                tmpelem=['ELEM',idx]
                                 #
                                 if(ivalcompl=="L"):
                                     noffset=0
@@ -6074,29 +6219,21 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                                 #
                                 if(ivalcompl=="R"):
                                     for idof in range(int(ndofperelem/2)):
-                                        tmpelem['fmt']+=',F10.1'
-                                        tmpelem['val'].append(-1.0)
+                                        tmpelem.append(-1.0)
                                 #
                                 for idof in range(int(ndofperelem/2)):
-                                    tmpelem['fmt']+=',F10.1'
-                                    tmpelem['val'].append(float(ivaltab[idof+noffset]))
+                                    tmpelem.append(float(ivaltab[idof+noffset]))
                                 #
                                 if(ivalcompl=="L"):
                                     for idof in range(int(ndofperelem/2)):
-                                        tmpelem['fmt']+=',F10.1'
-                                        tmpelem['val'].append(-1.0)
-                                tmpelem['fmt']+=")"
+                                        tmpelem.append(-1.0)
                                 INelemRelax.append(tmpelem)
                             #
                             elif ivalcompl=="S":
-                                tmpelem={}
-                                tmpelem['val']=['ELEM',idx]
-                                tmpelem['fmt']='(A10,I6'
+                                tmpelem=['ELEM',idx]
 
                                 for idof in range(int(ndofperelem)):
-                                    tmpelem['fmt']+=',F10.1'
-                                    tmpelem['val'].append(float(ivaltab[idof]))
-                                tmpelem['fmt']+=")"
+                                    tmpelem.append(float(ivaltab[idof]))
                                 INelemRelax.append(tmpelem)
                                 #
 
@@ -6124,15 +6261,13 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                         if(ElemVals[igtypdim][i]!="-1"):
                             #
                             ielem=allElemTags[kdims][i]
-                            idx=idxbeams.index(ielem)+1
+                            idx=self.getElemOutIdx(idxbeams,i,ielem,'Beam')
                             ivaltab=ElemVals[igtypdim][i].split(self.sep3)
-                            ifunc=ivaltab[0]+","+ivaltab[1]
+                            ifuncwght=ivaltab[0]+","+ivaltab[1]
                             if(not ifuncwght in INelemHydrost):
-                                INelemHydrost[ifuncwght]=[]
+                                INelemHydrost[ifuncwght]=INRecords('(A10,I6)',spooldir=self.dir)
                             #
-                            tmpelem={}
-                            tmpelem['val']=['HYDROBM',idx]
-                            tmpelem['fmt']='(A10,I6)'
+                            tmpelem=['HYDROBM',idx]
 
                             INelemHydrost[ifuncwght].append(tmpelem)
 
@@ -6143,7 +6278,7 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
 
         # Prepare Oblique Support (Structural)
         if(not self.isThermal):
-            INOblique=[]
+            INOblique=INRecords('(A10,I6,I6)' if ndims==2 else '(A10,I6,I6,I6)',spooldir=self.dir)
             NOBLIQUE=0
             #
             try:
@@ -6166,54 +6301,43 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                             if(ElemVals[igtypdim][i]!="-1"):
                                 ielem=allElemTags[kdims][i]
                                 ientity=allElemEntityTags[kdims][i]
-                                inodetag=allElemNodeTags[kdims][i][0]
                                 ivaltab=ElemVals[igtypdim][i].split(self.sep3)
-                                idx1=allNodeTags.index(inodetag) #first node of oblique
+                                idx1=ptNodeIdx[ientity] #first node of oblique
                                 node1=idx1+1
                                 #
                                 if(ndims==2):
-                                    x1=allNodeCoords[3*idx1];y1=allNodeCoords[3*idx1+1]
+                                    x1=allNodeCoords[idx1,0];y1=allNodeCoords[idx1,1]
                                     pt2coords=ivaltab[0].split(',')
                                     dx2=float(pt2coords[0]);dy2=float(pt2coords[1])
                                 else:
-                                    x1=allNodeCoords[3*idx1];y1=allNodeCoords[3*idx1+1];z1=allNodeCoords[3*idx1+2]
+                                    x1=allNodeCoords[idx1,0];y1=allNodeCoords[idx1,1];z1=allNodeCoords[idx1,2]
                                     pt2coords=ivaltab[0].split(',')
                                     pt3coords=ivaltab[1].split(',')
                                     dx2=float(pt2coords[0]);dy2=float(pt2coords[1]);dz2=float(pt2coords[2])
                                     dx3=float(pt3coords[0]);dy3=float(pt3coords[1]);dz3=float(pt3coords[2])
 
                                 # second node of oblique:
-                                tmp={}
                                 idx+=1
                                 node2=idx+1
                                 if(ndims==2):
                                     x2=x1+dx2;y2=y1+dy2
-                                    tmp['val']=['NODE',node2,x2,y2]
-                                    tmp['fmt']='(A10,I6,F11.4,F11.4)'
+                                    INnodes.append(['NODE',node2,x2,y2])
                                 else:
                                     x2=x1+dx2;y2=y1+dy2;z2=z1+dz2
-                                    tmp['val']=['NODE',node2,x2,y2,z2]
-                                    tmp['fmt']='(A10,I6,F11.4,F11.4,F11.4)'
-                                INnodes.append(tmp)
+                                    INnodes.append(['NODE',node2,x2,y2,z2])
                                 #
                                 # third node of oblique:
                                 if(ndims==3):
-                                    tmp={}
                                     idx+=1
                                     node3=idx+1
                                     x3=x1+dx3;y3=y1+dy3;z3=z1+dz3
-                                    tmp['val']=['NODE',node3,x3,y3,z3]
-                                    tmp['fmt']='(A10,I6,F11.4,F11.4,F11.4)'
-                                    INnodes.append(tmp)
-#                                 idx=idxbeams.index(ielem)+1
+                                    INnodes.append(['NODE',node3,x3,y3,z3])
+#                                 idx=self.getElemOutIdx(idxbeams,i,ielem,'Beam')
 #                                 ivaltab=ElemVals[igtypdim][i].split(self.sep3)
-                                tmpelem={}
                                 if(ndims==2):
-                                    tmpelem['val']=['INCLIN',signObliq[i0]*node1,node2]
-                                    tmpelem['fmt']='(A10,I6,I6)'
+                                    tmpelem=['INCLIN',signObliq[i0]*node1,node2]
                                 else:
-                                    tmpelem['val']=['INCLIN',signObliq[i0]*node1,node2,node3]
-                                    tmpelem['fmt']='(A10,I6,I6,I6)'
+                                    tmpelem=['INCLIN',signObliq[i0]*node1,node2,node3]
                                 #
                                 INOblique.append(tmpelem)
             except Exception as emsg:
@@ -6229,726 +6353,738 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
             gmsh.logger.write("Problem with previously existing errors - Solve them before proceeding to the IN file creation - use 'reload properties' to see g4s error message", level="error")
             return -1
 
+        # Check the materials of the sections before writing anything (error in the middle of the writing otherwise)
+        if(not self.isThermal):
+            imatlst=[]
+            if(len(INelemBeams)>0):
+                imatlst+=[(k,1,".TEM") for imat in INsectionBeams for k in imat.split(self.sep3)[1].strip().split()]
+            if(len(INelemShells)>0):
+                for ikey in INsectionShells:
+                    imat,irebar=ikey.split("//")
+                    imatlst.append((imat.split(self.sep3)[3],2,".TSH"))
+                    if(irebar!="-1"):
+                        imatlst+=[(k,1,".TSH") for k in irebar.split('/')[1].strip().split()]
+            if(len(INelemTruss)>0):
+                imatlst+=[(iparam.split(self.sep3)[3].strip(),1,"truss") for iparam in INgroupTruss]
+            for imat,ishp,iorig in imatlst:
+                try:
+                    self.getGlobalMatIdx(imat,ishp)
+                except Exception as emsg:
+                    gmsh.logger.write("Material "+imat+" recovered from your "+iorig+" files is not assigned correctly in the current structural case:"+str(emsg), level="error")
+                    return -1
+
+        # Header counts are all known here (1st pass, sections spooled block by block while computed): the sections are then streamed to a temporary file, renamed at the end (2nd pass)
+        INpath=os.path.join(self.dir,self.INfile)
+        INtmpfile=INpath+".tmp"
+
 
         # FINAL WRITING OF .IN FILE (F.E., materials and constraints)
         #
         # 1/ SERIES 1 (thermal and meca) - Comments
-        f=open(os.path.join(self.dir,self.INfile),'w')
-        #
-        f.write("InputFile created with GMSH-SAFIR Interface : Ver. "+self.version+"\n")
-        #f.write("#\n")
-        #
-        tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","Title1")],False)
-        f.write(tmp0['values'][0]+"\n")
-
-        tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","Title2")],False)
-        #title2=tmp0['values'][0].replace("1990-01-01",self.version)
-        #title2=tmp0['values'][0] #suppress title2: date is alraedy printed
-        #f.write(title2+"\n")
-        f.write("\n")
-        f.write("\n")
+        INdone=False
+        f=open(INtmpfile,'w',buffering=self.INbufsize) # single large buffer, sections are written by blocks (see writeBlockFortran)
+        try:
+            #
+            f.write("InputFile created with GMSH-SAFIR Interface : Ver. "+self.version+"\n")
+            #f.write("#\n")
+            #
+            tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","Title1")],False)
+            f.write(tmp0['values'][0]+"\n")
+
+            tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","Title2")],False)
+            #title2=tmp0['values'][0].replace("1990-01-01",self.version)
+            #title2=tmp0['values'][0] #suppress title2: date is alraedy printed
+            #f.write(title2+"\n")
+            f.write("\n")
+            f.write("\n")
         
-        # SERIES 2 (thermal and meca) - Quantity of nodes
-        f.write(self.writeLineFortran('(A10,I6)',['NNODE',len(INnodes)])+"\n")
+            # SERIES 2 (thermal and meca) - Quantity of nodes
+            f.write(self.writeLineFortran('(A10,I6)',['NNODE',len(INnodes)])+"\n")
 
 
-        # SERIES 3 (thermal and meca) - Quantity of dimensions
-        f.write(self.writeLineFortran('(A10,I6)',['NDIM',ndims])+"\n")
-        #
-        # SERIES 4 (thermal and meca) - Degrees of freedom
-        if(self.isThermal):
-            f.write(self.writeLineFortran('(A10,I6)',['NDOFMAX',1])+"\n")
-        else:
-            f.write(self.writeLineFortran('(A10,I6)',['NDOFMAX',ndofmax])+"\n")
-        # Added SERIES 4.1 (thermal) - Solver for Voids
-        if(self.isThermal):
-        #
-            if( ndims==2):
-                self.nvoids=len(PropAtts['void;1'])
-            elif(ndims==3):
-                self.nvoids=len(PropAtts['void;2'])
+            # SERIES 3 (thermal and meca) - Quantity of dimensions
+            f.write(self.writeLineFortran('(A10,I6)',['NDIM',ndims])+"\n")
             #
-            if(self.nvoids>0):
-                    f.write(self.writeLineFortran('(A8,A5)',['SOLVER','NOSYM'])+"\n")
-
-        #
-        # OBSOLETE
-#         f.write(self.writeLineFortran('(A10,I6,A5,I6,A5,I6,A5,I6)',['FROM',1,'TO',nnodes,'STEP',1,'NDDL',1])+"\n")
-#         f.write(self.writeLineFortran('(A11)',['END_NDDL'])+"\n")
-        #
-
-        # SERIES 5 (thermal and meca) - Number of cores (OBSOLETE)
-
-#         # OBSOLETE - Only 1 SOLVER left = PARDISO
-#         tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","name","PARDISO"),("props","name","NCORES")],False)
-#         val=tmp0['values'][0]
-#         f.write(self.writeLineFortran('(A10,I11)',['NCORES',val])+"\n")
-
-
-        # SERIES 6 (thermal) - Thermal calculation
-        if self.isThermal and not istorsrun:
-            f.write(self.writeLineFortran('(A10)',['TEMPERAT'])+"\n")
+            # SERIES 4 (thermal and meca) - Degrees of freedom
+            if(self.isThermal):
+                f.write(self.writeLineFortran('(A10,I6)',['NDOFMAX',1])+"\n")
+            else:
+                f.write(self.writeLineFortran('(A10,I6)',['NDOFMAX',ndofmax])+"\n")
+            # Added SERIES 4.1 (thermal) - Solver for Voids
+            if(self.isThermal):
             #
-            tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","TETA")],False)
-            val=tmp0['values'][0]
-            f.write(self.writeLineFortran('(A11,F11.4)',['TETA',val])+"\n")
+                if( ndims==2):
+                    self.nvoids=len(PropAtts['void;1'])
+                elif(ndims==3):
+                    self.nvoids=len(PropAtts['void;2'])
+                #
+                if(self.nvoids>0):
+                        f.write(self.writeLineFortran('(A8,A5)',['SOLVER','NOSYM'])+"\n")
+
             #
-            tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","TINITIAL")],False)
-            val=tmp0['values'][0]
-            f.write(self.writeLineFortran('(A11,F11.4)',['TINITIAL',val])+"\n")
+            # OBSOLETE
+    #         f.write(self.writeLineFortran('(A10,I6,A5,I6,A5,I6,A5,I6)',['FROM',1,'TO',nnodes,'STEP',1,'NDDL',1])+"\n")
+    #         f.write(self.writeLineFortran('(A11)',['END_NDDL'])+"\n")
             #
 
+            # SERIES 5 (thermal and meca) - Number of cores (OBSOLETE)
 
-        # SERIES 6 (meca) - Loads
-        if(not self.isThermal):
-            # Loads
-            tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","key","Mode")],False)
-            modename=tmp0['name']
-            modecode=tmp0['codename']
-            f.write(self.writeLineFortran('(A15)',[modecode])+"\n")
-            #
-            # NLOAD
-            f.write(self.writeLineFortran('(A5,I6)',['NLOAD',NLOAD])+"\n")
-            #
-            # HYDROST
-            f.write(self.writeLineFortran('(A7,I6)',['HYDROST',NHYDROST])+"\n")
+    #         # OBSOLETE - Only 1 SOLVER left = PARDISO
+    #         tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","name","PARDISO"),("props","name","NCORES")],False)
+    #         val=tmp0['values'][0]
+    #         f.write(self.writeLineFortran('(A10,I11)',['NCORES',val])+"\n")
 
-        # SERIES 7 (meca) - Inclined supports
-        if(not self.isThermal):
-            # OBLIQUE
-            f.write(self.writeLineFortran('(A7,I6)',['OBLIQUE',NOBLIQUE])+"\n")
 
-        # SERIES 7 (thermal) and SERIES 8 (meca) - Convergence strategy (COMEBACK)
-        if not istorsrun:
-            tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","key","Convergence")],False)
-            convname=tmp0['name']
-            iscomeback=convname=="COMEBACK"
-            if convname=="COMEBACK":
-                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","key","Convergence"),("props","name","TIMESTEPMIN")],False)
-                val=float(tmp0['values'][0])
-                f.write(self.writeLineFortran('(A15,F15.1)',[convname,val])+"\n")
-        # Next lines commented (2021-09-06) for sake of compatibility with SAFIR2019
-#             else:
-#                 f.write(self.writeLineFortran('(A15)',[convname])+"\n")
+            # SERIES 6 (thermal) - Thermal calculation
+            if self.isThermal and not istorsrun:
+                f.write(self.writeLineFortran('(A10)',['TEMPERAT'])+"\n")
+                #
+                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","TETA")],False)
+                val=tmp0['values'][0]
+                f.write(self.writeLineFortran('(A11,F11.4)',['TETA',val])+"\n")
+                #
+                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","TINITIAL")],False)
+                val=tmp0['values'][0]
+                f.write(self.writeLineFortran('(A11,F11.4)',['TINITIAL',val])+"\n")
+                #
 
-        # SERIES 8 (thermal) - Diagonal capacity
-        #DIAG CAPA: Use matrix diag (DIAG CAPA)
-        if self.isThermal and not istorsrun:
-            tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","DIAG CAPA")],False)
-            hasdcapa=tmp0["values"]==[1]
-            if hasdcapa:
-                f.write(self.writeLineFortran('(A10)',['DIAG_CAPA'])+"\n")
-        #
-
-        # SERIES 9 (thermal) - Storage of results
-        if(ndims==2 and self.isThermal):
-            if(temtyp!="NOMAKE"):
-                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","key","Type of calculation")],False)
-                typcal=tmp0['name']
-                typcalcode=tmp0['codename']
-                _,sufftem=temtyp.split('.')
-                typcalcode=typcalcode.replace('TEM',sufftem)
-            else:
-               typcal="USE_CURVES"
 
-            if istorsrun:
-                typcalcode="TORSION"
-
-            #
-            f.write(self.writeLineFortran('(A15)',[typcalcode])+"\n")
-            if(typcal=="USE_LOCAFI" or typcal=="USE_HASEMI" or typcal=="USE_CFD") and not istorsrun:
-                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","name",typcal),("props","name","Expected name of the structural input File")],False)
-                structfile=tmp0['values'][0]
-                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","name",typcal),("props","name","IELEMTYPE")],False)
-                ielem=int(tmp0['values'][0])
-                f.write(self.writeLineFortran('(A15)',[structfile])+"\n")
-                if(sufftem=="TSH"):
-                    preftype="SHELL_TYPE"
-                elif(sufftem=="TEM"):
-                    preftype="BEAM_TYPE"
-                f.write(self.writeLineFortran('(A10,I6)',[preftype,ielem])+"\n")
-        #
-        else:
-            typcal="USE_CURVES"
-        #
+            # SERIES 6 (meca) - Loads
+            if(not self.isThermal):
+                # Loads
+                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","key","Mode")],False)
+                modename=tmp0['name']
+                modecode=tmp0['codename']
+                f.write(self.writeLineFortran('(A15)',[modecode])+"\n")
+                #
+                # NLOAD
+                f.write(self.writeLineFortran('(A5,I6)',['NLOAD',NLOAD])+"\n")
+                #
+                # HYDROST
+                f.write(self.writeLineFortran('(A7,I6)',['HYDROST',NHYDROST])+"\n")
 
-        # SERIES 10 (thermal) and SERIES 9 (meca) - Materials
-        #MATS
-        f.write(self.writeLineFortran('(A4,I3)',['NMAT',len(self.listMats)])+"\n")
-        #
+            # SERIES 7 (meca) - Inclined supports
+            if(not self.isThermal):
+                # OBLIQUE
+                f.write(self.writeLineFortran('(A7,I6)',['OBLIQUE',NOBLIQUE])+"\n")
 
-        # SERIES 11 (thermal) and SERIES 10 (meca) - Elements
-        f.write(self.writeLineFortran('(A11)',['ELEMENTS'])+"\n")
-        #
-        if(self.isThermal): # Header (Thermal)
-            f.write(self.writeLineFortran('(A5,I6)',['SOLID',nelems])+"\n")
-            #
-            f.write(self.writeLineFortran('(A2,I6)',['NG',2])+"\n")
-            #
-            if(self.isThermal and ndims==2):
-                self.nvoids=len(PropAtts['void;1'])
-                if(not istorsrun):
-                    f.write(self.writeLineFortran('(A5,I6)',['NVOID',self.nvoids])+"\n")
-                    if(self.nvoids>0):
-                        f.write(self.writeLineFortran('(A11,I6)',['FRTIERVOID',nfrontiervoids])+"\n")
+            # SERIES 7 (thermal) and SERIES 8 (meca) - Convergence strategy (COMEBACK)
+            if not istorsrun:
+                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","key","Convergence")],False)
+                convname=tmp0['name']
+                iscomeback=convname=="COMEBACK"
+                if convname=="COMEBACK":
+                    tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","key","Convergence"),("props","name","TIMESTEPMIN")],False)
+                    val=float(tmp0['values'][0])
+                    f.write(self.writeLineFortran('(A15,F15.1)',[convname,val])+"\n")
+            # Next lines commented (2021-09-06) for sake of compatibility with SAFIR2019
+    #             else:
+    #                 f.write(self.writeLineFortran('(A15)',[convname])+"\n")
+
+            # SERIES 8 (thermal) - Diagonal capacity
+            #DIAG CAPA: Use matrix diag (DIAG CAPA)
+            if self.isThermal and not istorsrun:
+                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","DIAG CAPA")],False)
+                hasdcapa=tmp0["values"]==[1]
+                if hasdcapa:
+                    f.write(self.writeLineFortran('(A10)',['DIAG_CAPA'])+"\n")
+            #
+
+            # SERIES 9 (thermal) - Storage of results
+            if(ndims==2 and self.isThermal):
+                if(temtyp!="NOMAKE"):
+                    tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","key","Type of calculation")],False)
+                    typcal=tmp0['name']
+                    typcalcode=tmp0['codename']
+                    _,sufftem=temtyp.split('.')
+                    typcalcode=typcalcode.replace('TEM',sufftem)
                 else:
-                    f.write(self.writeLineFortran('(A5,I6)',['NVOID','0'])+"\n")
+                   typcal="USE_CURVES"
+
+                if istorsrun:
+                    typcalcode="TORSION"
+
+                #
+                f.write(self.writeLineFortran('(A15)',[typcalcode])+"\n")
+                if(typcal=="USE_LOCAFI" or typcal=="USE_HASEMI" or typcal=="USE_CFD") and not istorsrun:
+                    tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","name",typcal),("props","name","Expected name of the structural input File")],False)
+                    structfile=tmp0['values'][0]
+                    tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","name",typcal),("props","name","IELEMTYPE")],False)
+                    ielem=int(tmp0['values'][0])
+                    f.write(self.writeLineFortran('(A15)',[structfile])+"\n")
+                    if(sufftem=="TSH"):
+                        preftype="SHELL_TYPE"
+                    elif(sufftem=="TEM"):
+                        preftype="BEAM_TYPE"
+                    f.write(self.writeLineFortran('(A10,I6)',[preftype,ielem])+"\n")
             #
-            elif(self.isThermal and ndims==3):
-                self.nvoids=len(PropAtts['void;2'])
-                f.write(self.writeLineFortran('(A5,I6)',['NVOID',self.nvoids])+"\n")
-                if(self.nvoids>0):
-                    f.write(self.writeLineFortran('(A11,I6)',['FRTIERVOID',nfrontiervoids])+"\n")
+            else:
+                typcal="USE_CURVES"
             #
-        #
-        else: # Header (Structural)
+
+            # SERIES 10 (thermal) and SERIES 9 (meca) - Materials
+            #MATS
+            f.write(self.writeLineFortran('(A4,I3)',['NMAT',len(self.listMats)])+"\n")
             #
-            # Beams
-            if(len(INelemBeams)>0):
-                f.write(self.writeLineFortran('(A4,I6,I6)',['BEAM',NBEAM,NGEOBEAM])+"\n")
+
+            # SERIES 11 (thermal) and SERIES 10 (meca) - Elements
+            f.write(self.writeLineFortran('(A11)',['ELEMENTS'])+"\n")
+            #
+            if(self.isThermal): # Header (Thermal)
+                f.write(self.writeLineFortran('(A5,I6)',['SOLID',nelems])+"\n")
                 #
-                # NG Beam
-                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","NG BEAM")],False)
-                val=int(tmp0['values'][0])
-                f.write(self.writeLineFortran('(A2,I6)',['NG',val])+"\n")
+                f.write(self.writeLineFortran('(A2,I6)',['NG',2])+"\n")
                 #
-                # NFIBER
-                f.write(self.writeLineFortran('(A6,I6)',['NFIBER',NFIBER])+"\n")
-            #
-            # Truss
-            if(len(INelemTruss)>0):
-                f.write(self.writeLineFortran('(A5,I6,I6)',['TRUSS',NTRUSS,NGEOTRUSS])+"\n")
-            #
-            # Shells
-            if(len(INelemShells)>0):
-                f.write(self.writeLineFortran('(A5,I6,I6)',['SHELL',NSHELL,NGEOSHELL])+"\n")
+                if(self.isThermal and ndims==2):
+                    self.nvoids=len(PropAtts['void;1'])
+                    if(not istorsrun):
+                        f.write(self.writeLineFortran('(A5,I6)',['NVOID',self.nvoids])+"\n")
+                        if(self.nvoids>0):
+                            f.write(self.writeLineFortran('(A11,I6)',['FRTIERVOID',nfrontiervoids])+"\n")
+                    else:
+                        f.write(self.writeLineFortran('(A5,I6)',['NVOID','0'])+"\n")
                 #
-                # NG Shells
-                if(ndims==3):
-                    tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","NG SHELLTHICK")],False)
-                    val=int(tmp0['values'][0])
-                else:
-                    val=0
-                f.write(self.writeLineFortran('(A7,I6)',['NGTHICK',val])+"\n")
+                elif(self.isThermal and ndims==3):
+                    self.nvoids=len(PropAtts['void;2'])
+                    f.write(self.writeLineFortran('(A5,I6)',['NVOID',self.nvoids])+"\n")
+                    if(self.nvoids>0):
+                        f.write(self.writeLineFortran('(A11,I6)',['FRTIERVOID',nfrontiervoids])+"\n")
                 #
-                # Shell rebars
-                f.write(self.writeLineFortran('(A7,I6)',['NREBARS',NREBARS])+"\n")
             #
-            # Solids
-            if(len(INelemSolid)>0 or self.isThermal):
-                f.write(self.writeLineFortran('(A6,I6)',['SOLID',NSOLID])+"\n")
+            else: # Header (Structural)
                 #
-                # NG Solids
-                if(ndims==3):
-                    tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","NG SOLID")],False)
+                # Beams
+                if(len(INelemBeams)>0):
+                    f.write(self.writeLineFortran('(A4,I6,I6)',['BEAM',NBEAM,NGEOBEAM])+"\n")
+                    #
+                    # NG Beam
+                    tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","NG BEAM")],False)
                     val=int(tmp0['values'][0])
-                else:
-                    val=0
-                f.write(self.writeLineFortran('(A2,I6)',['NG',val])+"\n")
-            #
-            # Springs
-            if(len(INelemSpring)>0):
-                f.write(self.writeLineFortran('(A5,I6)',['SPRING',NSPRING])+"\n")
+                    f.write(self.writeLineFortran('(A2,I6)',['NG',val])+"\n")
+                    #
+                    # NFIBER
+                    f.write(self.writeLineFortran('(A6,I6)',['NFIBER',NFIBER])+"\n")
+                #
+                # Truss
+                if(len(INelemTruss)>0):
+                    f.write(self.writeLineFortran('(A5,I6,I6)',['TRUSS',NTRUSS,NGEOTRUSS])+"\n")
+                #
+                # Shells
+                if(len(INelemShells)>0):
+                    f.write(self.writeLineFortran('(A5,I6,I6)',['SHELL',NSHELL,NGEOSHELL])+"\n")
+                    #
+                    # NG Shells
+                    if(ndims==3):
+                        tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","NG SHELLTHICK")],False)
+                        val=int(tmp0['values'][0])
+                    else:
+                        val=0
+                    f.write(self.writeLineFortran('(A7,I6)',['NGTHICK',val])+"\n")
+                    #
+                    # Shell rebars
+                    f.write(self.writeLineFortran('(A7,I6)',['NREBARS',NREBARS])+"\n")
+                #
+                # Solids
+                if(len(INelemSolid)>0 or self.isThermal):
+                    f.write(self.writeLineFortran('(A6,I6)',['SOLID',NSOLID])+"\n")
+                    #
+                    # NG Solids
+                    if(ndims==3):
+                        tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","NG SOLID")],False)
+                        val=int(tmp0['values'][0])
+                    else:
+                        val=0
+                    f.write(self.writeLineFortran('(A2,I6)',['NG',val])+"\n")
+                #
+                # Springs
+                if(len(INelemSpring)>0):
+                    f.write(self.writeLineFortran('(A5,I6)',['SPRING',NSPRING])+"\n")
+                #
+            f.write(self.writeLineFortran('(A11)',['END_ELEM'])+"\n")
             #
-        f.write(self.writeLineFortran('(A11)',['END_ELEM'])+"\n")
-        #
-
-        # SERIES 12 (thermal) and SERIES 11 (meca) - Nodes
-        # 2/ Write down all nodes (Thermal and Structural)
-        f.write(self.writeLineFortran('(A10)',['NODES'])+"\n")
-        for i in range(len(INnodes)):
-            ivals=[]
-            for ival in range(len(INnodes[i]['val'])):
-                if(ival>1):
-                    ivals.append("%.6f" % float(INnodes[i]['val'][ival]))
-                else:
-                    ivals.append(INnodes[i]['val'][ival])
-            f.write(self.writeLineFortran(INnodes[i]['fmt'],ivals)+"\n")
 
-        #
+            # SERIES 12 (thermal) and SERIES 11 (meca) - Nodes
+            # 2/ Write down all nodes (Thermal and Structural)
+            f.write(self.writeLineFortran('(A10)',['NODES'])+"\n")
+            self.writeBlockFortran(f,INnodes)
 
-        # SERIES 13 (thermal) - Nodeline
-        # Write nodelines (Thermal 2D only)
-        if(ndims==2 and self.isThermal and not istsh):
-            tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","Global center (Yo)")],False)
-            y0=tmp0['values'][0]
-            tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","Global center (Xo)")],False)
-            z0=tmp0['values'][0]
-            #
-            tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","Center of torsion (Yc)")],False)
-            yc=tmp0['values'][0]
-            tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","Center of torsion (Xc)")],False)
-            zc=tmp0['values'][0]
             #
-            if(typcal=="USE_CURVES" or typcal=="USE_HASEMI"  or typcal=="USE_LOCAFI" or typcal=="USE_CFD" and not istorsrun) or istorsrun:
-                f.write(self.writeLineFortran('(A10,F5.1,F5.1)',['NODELINE',float(y0),float(z0)])+"\n")
-                f.write(self.writeLineFortran('(A10,F5.1,F5.1)',['YC_ZC',float(yc),float(zc)])+"\n")
+
+            # SERIES 13 (thermal) - Nodeline
+            # Write nodelines (Thermal 2D only)
+            if(ndims==2 and self.isThermal and not istsh):
+                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","Global center (Yo)")],False)
+                y0=tmp0['values'][0]
+                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","Global center (Xo)")],False)
+                z0=tmp0['values'][0]
+                #
+                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","Center of torsion (Yc)")],False)
+                yc=tmp0['values'][0]
+                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","Center of torsion (Xc)")],False)
+                zc=tmp0['values'][0]
+                #
+                if(typcal=="USE_CURVES" or typcal=="USE_HASEMI"  or typcal=="USE_LOCAFI" or typcal=="USE_CFD" and not istorsrun) or istorsrun:
+                    f.write(self.writeLineFortran('(A10,F5.1,F5.1)',['NODELINE',float(y0),float(z0)])+"\n")
+                    f.write(self.writeLineFortran('(A10,F5.1,F5.1)',['YC_ZC',float(yc),float(zc)])+"\n")
+                #
+                #
+            # SERIES 14 (thermal) - Imposed termperatures, and SERIES 12 (meca) - Supports and imposed
+            # Write fixations (Thermal and Structural)
+            f.write(self.writeLineFortran('(A10)',['FIXATIONS'])+"\n")
             #
+            self.writeBlockFortran(f,INfixnodes)
             #
-        # SERIES 14 (thermal) - Imposed termperatures, and SERIES 12 (meca) - Supports and imposed
-        # Write fixations (Thermal and Structural)
-        f.write(self.writeLineFortran('(A10)',['FIXATIONS'])+"\n")
-        #
-        for i in range(len(INfixnodes)):
-            f.write(self.writeLineFortran(INfixnodes[i]['fmt'],INfixnodes[i]['val'])+"\n")
-        #
-        for i in range(len(SAMEnodes)):
-            f.write(self.writeLineFortran(SAMEnodes[i]['fmt'],SAMEnodes[i]['val'])+"\n")
-        f.write(self.writeLineFortran('(A10)',['END_FIX'])+"\n")
+            self.writeBlockFortran(f,SAMEnodes)
+            f.write(self.writeLineFortran('(A10)',['END_FIX'])+"\n")
 
 
-        # SERIES 15 (thermal) - Solid elements
-        # Write F.E. and constraints, separately for Thermal and Structural
-        if(self.isThermal):
-            # 5/ Write elems (Thermal)
-            f.write(self.writeLineFortran('(A10)',['NODOFSOLID'])+"\n")
-            for i in range(len(INelems)):
-                f.write(self.writeLineFortran(INelems[i]['fmt'],INelems[i]['val'])+"\n")
+            # SERIES 15 (thermal) - Solid elements
+            # Write F.E. and constraints, separately for Thermal and Structural
+            if(self.isThermal):
+                # 5/ Write elems (Thermal)
+                f.write(self.writeLineFortran('(A10)',['NODOFSOLID'])+"\n")
+                self.writeBlockFortran(f,INelems)
 
 
 
-        # SERIES 12 (meca) - Beam elements
-        if(not self.isThermal):
-            #
-            # Write Beams (Structural)
-            if(len(INelemBeams)>0):
-                f.write(self.writeLineFortran('(A10)',['NODOFBEAM'])+"\n")
+            # SERIES 12 (meca) - Beam elements
+            if(not self.isThermal):
                 #
-                for i in range(len(INsectionBeams)):
-                    imat=INsectionBeams[i]
-                    ifile=imat.split(self.sep3)[0].strip()
-                    imatstr=imat.split(self.sep3)[1].strip()
-                    f.write(self.writeLineFortran('(A20)',[ifile])+"\n")
-                    imattab=imatstr.strip().split() #Split on spaces
-
-                    for k in range(len(imattab)):
-                        try:
-                            iglomat=[i0 for i0 in range(len(self.listMats)) if list(self.listMats[i0].keys())[0].split('/')[0]==imattab[k]+";1"][0]
-                        except Exception as emsg:
-                            gmsh.logger.write("Material "+imattab[k]+" recovered from your .TEM files is not assigned correctly in the current structural case:"+str(emsg), level="error")
-                            return -1
+                # Write Beams (Structural)
+                if(len(INelemBeams)>0):
+                    f.write(self.writeLineFortran('(A10)',['NODOFBEAM'])+"\n")
+                    #
+                    for i in range(len(INsectionBeams)):
+                        imat=INsectionBeams[i]
+                        ifile=imat.split(self.sep3)[0].strip()
+                        imatstr=imat.split(self.sep3)[1].strip()
+                        f.write(self.writeLineFortran('(A20)',[ifile])+"\n")
+                        imattab=imatstr.strip().split() #Split on spaces
+
+                        for k in range(len(imattab)):
+                            try:
+                                iglomat=self.getGlobalMatIdx(imattab[k],1)
+                            except Exception as emsg:
+                                gmsh.logger.write("Material "+imattab[k]+" recovered from your .TEM files is not assigned correctly in the current structural case:"+str(emsg), level="error")
+                                return -1
 
-                        f.write(self.writeLineFortran('(A9,I11,I11)',['TRANSLATE',k+1,iglomat+1])+"\n")
-                    f.write(self.writeLineFortran('(A9)',['END_TRANS'])+"\n")
-                #
-                for i in range(len(INelemBeams)):
-                    f.write(self.writeLineFortran(INelemBeams[i]['fmt'],INelemBeams[i]['val'])+"\n")
+                            f.write(self.writeLineFortran('(A9,I11,I11)',['TRANSLATE',k+1,iglomat+1])+"\n")
+                        f.write(self.writeLineFortran('(A9)',['END_TRANS'])+"\n")
+                    #
+                    self.writeBlockFortran(f,INelemBeams)
 
 
-        # SERIES 15 (meca) - Solid elements
-        if(not self.isThermal):
-            # Write Solid (Structural)
-            if(len(INelemSolid)>0):
-                f.write(self.writeLineFortran('(A10)',['NODOFSOLID'])+"\n")
-                f.write(self.writeLineFortran('(A10)',[self.SolidFilename])+"\n")
-                for i in range(len(INelemSolid)):
-                    f.write(self.writeLineFortran(INelemSolid[i]['fmt'],INelemSolid[i]['val'])+"\n")
+            # SERIES 15 (meca) - Solid elements
+            if(not self.isThermal):
+                # Write Solid (Structural)
+                if(len(INelemSolid)>0):
+                    f.write(self.writeLineFortran('(A10)',['NODOFSOLID'])+"\n")
+                    f.write(self.writeLineFortran('(A10)',[self.SolidFilename])+"\n")
+                    self.writeBlockFortran(f,INelemSolid)
 
-            #
-        # SERIES 16 (meca) - Shell elements
-        if(not self.isThermal):
-            # Write Shells (Structural)
-            if(len(INelemShells)>0):
-                f.write(self.writeLineFortran('(A10)',['NODOFSHELL'])+"\n")
                 #
-                for i in range(len(INsectionShells)):
-                     ikey=INsectionShells[i]
-                     imat,irebar=ikey.split("//")
-                     ifile,thick,zzero,imatstr=imat.split(self.sep3)
-                     if(irebar!="-1"):
-                         nbar,matrebar,sectrebar,levrebar,strangles=irebar.split('/')
-                     else:
-                         nbar="0"
-                     f.write(self.writeLineFortran('(A10)',[ifile])+"\n")
-                     f.write(self.writeLineFortran('(A10,F10.3)',["THICKNESS",float(thick)])+"\n")
-                     f.write(self.writeLineFortran('(A10,F10.3)',["Z0",float(zzero)])+"\n")
-                     iglomat=[i0 for i0 in range(len(self.listMats)) if list(self.listMats[i0].keys())[0].split('/')[0]==imatstr+";2"][0]
-                     f.write(self.writeLineFortran('(A10,I3)',["MATERIAL",iglomat+1])+"\n")
-                     f.write(self.writeLineFortran('(A10,I3)',["REBARS",nbar])+"\n")
-                     #
-                     if(nbar!="0"):
-                         imattab=matrebar.strip().split() #Split on spaces
-                         isecttab=sectrebar.strip().split() #Split on spaces
-                         ilevtab=levrebar.strip().split() #Split on spaces
-                         angles=ast.literal_eval(strangles)
+            # SERIES 16 (meca) - Shell elements
+            if(not self.isThermal):
+                # Write Shells (Structural)
+                if(len(INelemShells)>0):
+                    f.write(self.writeLineFortran('(A10)',['NODOFSHELL'])+"\n")
+                    #
+                    for i in range(len(INsectionShells)):
+                         ikey=INsectionShells[i]
+                         imat,irebar=ikey.split("//")
+                         ifile,thick,zzero,imatstr=imat.split(self.sep3)
+                         if(irebar!="-1"):
+                             nbar,matrebar,sectrebar,levrebar,strangles=irebar.split('/')
+                         else:
+                             nbar="0"
+                         f.write(self.writeLineFortran('(A10)',[ifile])+"\n")
+                         f.write(self.writeLineFortran('(A10,F10.3)',["THICKNESS",float(thick)])+"\n")
+                         f.write(self.writeLineFortran('(A10,F10.3)',["Z0",float(zzero)])+"\n")
+                         iglomat=self.getGlobalMatIdx(imatstr,2)
+                         f.write(self.writeLineFortran('(A10,I3)',["MATERIAL",iglomat+1])+"\n")
+                         f.write(self.writeLineFortran('(A10,I3)',["REBARS",nbar])+"\n")
                          #
-                         for k in range(len(imattab)):
-                             try:
-                                 iglomat2=[i0 for i0 in range(len(self.listMats)) if list(self.listMats[i0].keys())[0].split('/')[0]==imattab[k]+";1"][0]
-                             except Exception as emsg:
-                                 print(self.listMats)
-                                 gmsh.logger.write("Material "+imattab[k]+" recovered from your .TSH files is not assigned correctly in the current structural case:"+str(emsg), level="error")
-                                 return -1
-                             f.write(self.writeLineFortran('(A20,I3)',["REBARMAT",iglomat2+1])+"\n")
-                             f.write(self.writeLineFortran('(A20,F10.3)',["SECTION",float(isecttab[k])])+"\n")
-                             f.write(self.writeLineFortran('(A20,F10.3)',["LEVEL",float(ilevtab[k])])+"\n")
-                             iangle=[val for i,val in angles.items() if i==k][0]
-                             if(type(iangle)==list):
-                                f.write(self.writeLineFortran('(A20,F10.3,F10.3,F10.3)',["NORMAL",iangle[0],iangle[1],iangle[2]])+"\n")
-                             else:
-                                f.write(self.writeLineFortran('(A20,F10.3)',["ANGLE",iangle])+"\n")
-                     #
-                for i in range(len(INelemShells)):
-                    f.write(self.writeLineFortran(INelemShells[i]['fmt'],INelemShells[i]['val'])+"\n")
-            #
-
-        # SERIES 17 (meca) -Truss elements
-        if(not self.isThermal):
-            # Write Truss (Structural)
-            if(len(INelemTruss)>0):
-                f.write(self.writeLineFortran('(A10)',['NODOFTRUSS'])+"\n")
-                #
-                for i in range(len(INgroupTruss)):
-                    iparam=INgroupTruss[i]
-                    ifile=iparam.split(self.sep3)[0].strip()
-                    isect=iparam.split(self.sep3)[1].strip()
-                    ires=iparam.split(self.sep3)[2].strip()
-                    imat=iparam.split(self.sep3)[3].strip()
-                    iglomat=[i0 for i0 in range(len(self.listMats)) if list(self.listMats[i0].keys())[0].split('/')[0]==imat+";1"][0]
-                    f.write(self.writeLineFortran('(A10,F10.3,F10.3,I3)',[ifile,float(isect),float(ires),iglomat+1])+"\n")
+                         if(nbar!="0"):
+                             imattab=matrebar.strip().split() #Split on spaces
+                             isecttab=sectrebar.strip().split() #Split on spaces
+                             ilevtab=levrebar.strip().split() #Split on spaces
+                             angles=ast.literal_eval(strangles)
+                             #
+                             for k in range(len(imattab)):
+                                 try:
+                                     iglomat2=self.getGlobalMatIdx(imattab[k],1)
+                                 except Exception as emsg:
+                                     print(self.listMats)
+                                     gmsh.logger.write("Material "+imattab[k]+" recovered from your .TSH files is not assigned correctly in the current structural case:"+str(emsg), level="error")
+                                     return -1
+                                 f.write(self.writeLineFortran('(A20,I3)',["REBARMAT",iglomat2+1])+"\n")
+                                 f.write(self.writeLineFortran('(A20,F10.3)',["SECTION",float(isecttab[k])])+"\n")
+                                 f.write(self.writeLineFortran('(A20,F10.3)',["LEVEL",float(ilevtab[k])])+"\n")
+                                 iangle=[val for i,val in angles.items() if i==k][0]
+                                 if(type(iangle)==list):
+                                    f.write(self.writeLineFortran('(A20,F10.3,F10.3,F10.3)',["NORMAL",iangle[0],iangle[1],iangle[2]])+"\n")
+                                 else:
+                                    f.write(self.writeLineFortran('(A20,F10.3)',["ANGLE",iangle])+"\n")
+                         #
+                    self.writeBlockFortran(f,INelemShells)
                 #
-                for i in range(len(INelemTruss)):
-                    f.write(self.writeLineFortran(INelemTruss[i]['fmt'],INelemTruss[i]['val'])+"\n")
-
-            #
 
-        # SERIES 18 (meca) -Spring elements
-        if(not self.isThermal):
-            # Write Spring (Structural)
-            if(len(INelemSpring)>0):
-                f.write(self.writeLineFortran('(A10)',['NDFSPRING'])+"\n")
-                #                #
-                for i in range(len(INelemSpring)):
-                    f.write(self.writeLineFortran(INelemSpring[i]['fmt'],INelemSpring[i]['val'])+"\n")
-
-        # SERIES 16 (thermal) - Frontiers
-        if(self.isThermal):
-            #6 /Write Frontiers (Thermal)
-            if not istorsrun:
-                f.write(self.writeLineFortran('(A10)',['FRONTIER'])+"\n")
-                for i in range(len(INfrontiers)):
-                    f.write(self.writeLineFortran(INfrontiers[i]['fmt'],INfrontiers[i]['val'])+"\n")
+            # SERIES 17 (meca) -Truss elements
+            if(not self.isThermal):
+                # Write Truss (Structural)
+                if(len(INelemTruss)>0):
+                    f.write(self.writeLineFortran('(A10)',['NODOFTRUSS'])+"\n")
+                    #
+                    for i in range(len(INgroupTruss)):
+                        iparam=INgroupTruss[i]
+                        ifile=iparam.split(self.sep3)[0].strip()
+                        isect=iparam.split(self.sep3)[1].strip()
+                        ires=iparam.split(self.sep3)[2].strip()
+                        imat=iparam.split(self.sep3)[3].strip()
+                        iglomat=self.getGlobalMatIdx(imat,1)
+                        f.write(self.writeLineFortran('(A10,F10.3,F10.3,I3)',[ifile,float(isect),float(ires),iglomat+1])+"\n")
                     #
-                f.write(self.writeLineFortran('(A10)',['END_FRONT'])+"\n")
+                    self.writeBlockFortran(f,INelemTruss)
 
-        # SERIES 17 (thermal) - Voids
-        if(self.isThermal):
-            # 7/ Write Voids (Thermal 2D)
-            if(ndims==2 and self.nvoids>0 and not istorsrun) or (ndims==3 and self.nvoids>0):
-                for ivoid,tmpvoid in INvoids.items():
-                    f.write(self.writeLineFortran('(A10)',['VOID'])+"\n")
-                    for i in range(len(tmpvoid)):
-                        f.write(self.writeLineFortran(tmpvoid[i]['fmt'],tmpvoid[i]['val'])+"\n")
-                    f.write(self.writeLineFortran('(A10)',['END_VOID'])+"\n")
-            #
+                #
 
-        # SERIES 18 (thermal) - Symmetries
-        if(self.isThermal):
-            #8/ Write Symmetries (Thermal)
-            f.write(self.writeLineFortran('(A10)',['SYMMETRY'])+"\n")
+            # SERIES 18 (meca) -Spring elements
+            if(not self.isThermal):
+                # Write Spring (Structural)
+                if(len(INelemSpring)>0):
+                    f.write(self.writeLineFortran('(A10)',['NDFSPRING'])+"\n")
+                    #                #
+                    self.writeBlockFortran(f,INelemSpring)
+
+            # SERIES 16 (thermal) - Frontiers
+            if(self.isThermal):
+                #6 /Write Frontiers (Thermal)
+                if not istorsrun:
+                    f.write(self.writeLineFortran('(A10)',['FRONTIER'])+"\n")
+                    self.writeBlockFortran(f,INfrontiers)
+                        #
+                    f.write(self.writeLineFortran('(A10)',['END_FRONT'])+"\n")
+
+            # SERIES 17 (thermal) - Voids
+            if(self.isThermal):
+                # 7/ Write Voids (Thermal 2D)
+                if(ndims==2 and self.nvoids>0 and not istorsrun) or (ndims==3 and self.nvoids>0):
+                    for ivoid,tmpvoid in INvoids.items():
+                        f.write(self.writeLineFortran('(A10)',['VOID'])+"\n")
+                        self.writeBlockFortran(f,tmpvoid)
+                        f.write(self.writeLineFortran('(A10)',['END_VOID'])+"\n")
+                #
 
-            # Write Realsym (Thermal 2D)
-            if(ndims==2):
-                try:
-                    for k,v in syms['real_sym;1'].items():
-                        f.write(self.writeLineFortran('(A10,I6,I6)',['REALSYM',v[0],v[1]])+"\n")
-                except Exception as emsg:
-                    gmsh.logger.write("Pb in writing real symmetry axis:"+str(emsg), level="error")
-                    return -1
+            # SERIES 18 (thermal) - Symmetries
+            if(self.isThermal):
+                #8/ Write Symmetries (Thermal)
+                f.write(self.writeLineFortran('(A10)',['SYMMETRY'])+"\n")
 
-            #Write VoidSym (Thermal 2D)
-            if(ndims==2 and self.nvoids>0):
-                try:
-                    for k,v in syms['void_sym;1'].items():
-                        val=symvals['void_sym;1'][k]
-                        f.write(self.writeLineFortran('(A10,I6,I6,I6)',['SYMVOID',v[0],v[1],val])+"\n")
-                except Exception as emsg:
-                    gmsh.logger.write("Pb in writing void symmetry axis:"+str(emsg), level="error")
-                    return -1
+                # Write Realsym (Thermal 2D)
+                if(ndims==2):
+                    try:
+                        for k,v in syms['real_sym;1'].items():
+                            f.write(self.writeLineFortran('(A10,I6,I6)',['REALSYM',v[0],v[1]])+"\n")
+                    except Exception as emsg:
+                        gmsh.logger.write("Pb in writing real symmetry axis:"+str(emsg), level="error")
+                        return -1
 
+                #Write VoidSym (Thermal 2D)
+                if(ndims==2 and self.nvoids>0):
+                    try:
+                        for k,v in syms['void_sym;1'].items():
+                            val=symvals['void_sym;1'][k]
+                            f.write(self.writeLineFortran('(A10,I6,I6,I6)',['SYMVOID',v[0],v[1],val])+"\n")
+                    except Exception as emsg:
+                        gmsh.logger.write("Pb in writing void symmetry axis:"+str(emsg), level="error")
+                        return -1
 
-            #Write VoidSym (Thermal 3D)
-            if(ndims==3 and self.nvoids>0):
-                try:
-                    for k,v in syms['void_sym;2'].items():
-                        val=symvals['void_sym;2'][k]
-                        f.write(self.writeLineFortran('(A10,I6,I6,I6)',['SYMVOID',v[0],v[1],v[2],val])+"\n")
-                except Exception as emsg:
-                    gmsh.logger.write("Pb in writing void symmetry axis:"+str(emsg), level="error")
-                    return -1
 
-            f.write(self.writeLineFortran('(A10)',['END_SYM'])+"\n")
+                #Write VoidSym (Thermal 3D)
+                if(ndims==3 and self.nvoids>0):
+                    try:
+                        for k,v in syms['void_sym;2'].items():
+                            val=symvals['void_sym;2'][k]
+                            f.write(self.writeLineFortran('(A10,I6,I6,I6)',['SYMVOID',v[0],v[1],v[2],val])+"\n")
+                    except Exception as emsg:
+                        gmsh.logger.write("Pb in writing void symmetry axis:"+str(emsg), level="error")
+                        return -1
 
-        # SERIES 19 (meca) - Oblique supports
-            # Write Oblique Supports (Structural)
-        if(not self.isThermal):
-            if(len(INOblique)>0):
-                for i in range(len(INOblique)):
-                    f.write(self.writeLineFortran(INOblique[i]['fmt'],INOblique[i]['val'])+"\n")
-                f.write(self.writeLineFortran('(A10)',['END_INCLIN'])+"\n")
+                f.write(self.writeLineFortran('(A10)',['END_SYM'])+"\n")
 
+            # SERIES 19 (meca) - Oblique supports
+                # Write Oblique Supports (Structural)
+            if(not self.isThermal):
+                if(len(INOblique)>0):
+                    self.writeBlockFortran(f,INOblique)
+                    f.write(self.writeLineFortran('(A10)',['END_INCLIN'])+"\n")
 
-        # SERIES 20 (meca) - Relaxation
-            # Write Beam Relaxations (Structural)
-        if(not self.isThermal):
-            if(len(INelemRelax)>0):
-                f.write(self.writeLineFortran('(A10)',['RELAX_ELEM'])+"\n")
-                f.write(self.writeLineFortran('(A15)',['BEAMS'])+"\n")
-                for i in range(len(INelemRelax)):
-                    f.write(self.writeLineFortran(INelemRelax[i]['fmt'],INelemRelax[i]['val'])+"\n")
-                f.write(self.writeLineFortran('(A9)',['END_BEAMS'])+"\n")
-                f.write(self.writeLineFortran('(A9)',['END_RELAX'])+"\n")
 
+            # SERIES 20 (meca) - Relaxation
+                # Write Beam Relaxations (Structural)
+            if(not self.isThermal):
+                if(len(INelemRelax)>0):
+                    f.write(self.writeLineFortran('(A10)',['RELAX_ELEM'])+"\n")
+                    f.write(self.writeLineFortran('(A15)',['BEAMS'])+"\n")
+                    self.writeBlockFortran(f,INelemRelax)
+                    f.write(self.writeLineFortran('(A9)',['END_BEAMS'])+"\n")
+                    f.write(self.writeLineFortran('(A9)',['END_RELAX'])+"\n")
 
-        #
-        # SERIES 19 (thermal) and SERIES 21 (meca) - Precision
-        tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","PRECISION")],False)
-        prec=float(tmp0['values'][0])
-        f.write(self.writeLineFortran('(A9,E10.1)',['PRECISION',prec])+"\n")
 
-        # SERIES 22 (meca) - Limiting displacement
-        if(not self.isThermal):
-            tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","Consider max displacement")],False)
-            if tmp0['values'][0]==1 :
-                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","MAX DISPL")],False)
-                maxdispl=float(tmp0['values'][0])
-                f.write(self.writeLineFortran('(A9,E10.1)',['MAX_DISPL',maxdispl])+"\n")
-        #
+            #
+            # SERIES 19 (thermal) and SERIES 21 (meca) - Precision
+            tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","PRECISION")],False)
+            prec=float(tmp0['values'][0])
+            f.write(self.writeLineFortran('(A9,E10.1)',['PRECISION',prec])+"\n")
 
-        # SERIES 23 (meca) - Loads
-        if(not self.isThermal):
-            f.write(self.writeLineFortran('(A5)',['LOADS'])+"\n")
-            #
-            # Write Loads (Structural)
-            if(len(INelemLoads)>0):
-                for ifunc in INelemLoads:
-                    f.write(self.writeLineFortran('(A10,A10)',['FUNCTION',ifunc])+"\n")
-                    for i in range(len(INelemLoads[ifunc])):
-                        f.write(self.writeLineFortran(INelemLoads[ifunc][i]['fmt'],INelemLoads[ifunc][i]['val'])+"\n")
+            # SERIES 22 (meca) - Limiting displacement
+            if(not self.isThermal):
+                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","Consider max displacement")],False)
+                if tmp0['values'][0]==1 :
+                    tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","MAX DISPL")],False)
+                    maxdispl=float(tmp0['values'][0])
+                    f.write(self.writeLineFortran('(A9,E10.1)',['MAX_DISPL',maxdispl])+"\n")
+            #
+
+            # SERIES 23 (meca) - Loads
+            if(not self.isThermal):
+                f.write(self.writeLineFortran('(A5)',['LOADS'])+"\n")
+                #
+                # Write Loads (Structural)
+                if(len(INelemLoads)>0):
+                    for ifunc in INelemLoads:
+                        f.write(self.writeLineFortran('(A10,A10)',['FUNCTION',ifunc])+"\n")
+                        self.writeBlockFortran(f,INelemLoads[ifunc])
+                        f.write(self.writeLineFortran('(A10)',['END_LOAD'])+"\n")
+                else:
                     f.write(self.writeLineFortran('(A10)',['END_LOAD'])+"\n")
-            else:
-                f.write(self.writeLineFortran('(A10)',['END_LOAD'])+"\n")
 
 
-        # SERIES 24 (meca) - Hydrostatic loads
-            # Write Beam Hydrostatic Loads (Structural)
-        if(not self.isThermal):
-            if(len(INelemHydrost)>0):
-                for ifuncwght in INelemHydrost:
-                    ifunc,iweight=ifuncwght.split(',')
-                    f.write(self.writeLineFortran('(A10,A10)',['WATERTABLE',ifunc])+"\n")
-                    f.write(self.writeLineFortran('(A10,A10)',['SPECWEIGHT',iweight])+"\n")
-                    for i in range(len(INelemHydrost[ifuncwght])):
-                        f.write(self.writeLineFortran(INelemHydrost[ifuncwght][i]['fmt'],INelemHydrost[ifuncwght][i]['val'])+"\n")
-                f.write(self.writeLineFortran('(A10)',['END_HYDRO'])+"\n")
-
-        # SERIES 25 (meca) - Mass characteristics
-        if(not self.isThermal):
-            # Write Mass (Structural)
-            f.write(self.writeLineFortran('(A10)',['MASS'])+"\n")
-            if(len(INelemMass)>0):
-                for i in range(len(INelemMass)):
-                    f.write(self.writeLineFortran(INelemMass[i]['fmt'],INelemMass[i]['val'])+"\n")
-            f.write(self.writeLineFortran('(A10)',['END_MASS'])+"\n")
+            # SERIES 24 (meca) - Hydrostatic loads
+                # Write Beam Hydrostatic Loads (Structural)
+            if(not self.isThermal):
+                if(len(INelemHydrost)>0):
+                    for ifuncwght in INelemHydrost:
+                        ifunc,iweight=ifuncwght.split(',')
+                        f.write(self.writeLineFortran('(A10,A10)',['WATERTABLE',ifunc])+"\n")
+                        f.write(self.writeLineFortran('(A10,A10)',['SPECWEIGHT',iweight])+"\n")
+                        self.writeBlockFortran(f,INelemHydrost[ifuncwght])
+                    f.write(self.writeLineFortran('(A10)',['END_HYDRO'])+"\n")
 
-        #
-        # SERIES 20 (thermal) and SERIES 26 (meca) - Materials
-        # Write materials (Thermal and Structural)
-        f.write(self.writeLineFortran('(A10)',['MATERIALS'])+"\n")
+            # SERIES 25 (meca) - Mass characteristics
+            if(not self.isThermal):
+                # Write Mass (Structural)
+                f.write(self.writeLineFortran('(A10)',['MASS'])+"\n")
+                if(len(INelemMass)>0):
+                    self.writeBlockFortran(f,INelemMass)
+                f.write(self.writeLineFortran('(A10)',['END_MASS'])+"\n")
 
-        try:
             #
-            for i in range(len(self.listMats)):
-                iprop=self.listMats[i]
-                imatstr=list(iprop.keys())[0]
-                imat=imatstr.split('/')[1].split("-")[-1].upper()
-                imatg4s="! "+imatstr.split(';')[0]
-                tmpvals=list(iprop.values())[0]
+            # SERIES 20 (thermal) and SERIES 26 (meca) - Materials
+            # Write materials (Thermal and Structural)
+            f.write(self.writeLineFortran('(A10)',['MATERIALS'])+"\n")
+
+            try:
                 #
-                if not istorsrun:
+                for i in range(len(self.listMats)):
+                    iprop=self.listMats[i]
+                    imatstr=list(iprop.keys())[0]
+                    imat=imatstr.split('/')[1].split("-")[-1].upper()
+                    imatg4s="! "+imatstr.split(';')[0]
+                    tmpvals=list(iprop.values())[0]
                     #
-                    if not 'User-defined' in imatstr:
+                    if not istorsrun:
                         #
-                        vallst=[];fmtstr="("
-                        #
-                        print("ndim=",ndims,", isTherm=",self.isThermal,", len(tmpvals)=",len(tmpvals),": ",tmpvals)
-                        if ndims==2 and self.isThermal:
-                            leng1=len(tmpvals)-5 #Remove from the list the material name, the torsname, the Young module and Poisson coeff
-                        #
-                        elif(self.isThermal):
-                            leng1=len(tmpvals)-3 #Remove from the list the material name and torsname
-                        else:
-                            leng1=len(tmpvals)-1 # Remove from the list the material name (no torsname)
-                        #
-                        begin=True
+                        if not 'User-defined' in imatstr:
+                            #
+                            vallst=[];fmtstr="("
+                            #
+                            print("ndim=",ndims,", isTherm=",self.isThermal,", len(tmpvals)=",len(tmpvals),": ",tmpvals)
+                            if ndims==2 and self.isThermal:
+                                leng1=len(tmpvals)-5 #Remove from the list the material name, the torsname, the Young module and Poisson coeff
+                            #
+                            elif(self.isThermal):
+                                leng1=len(tmpvals)-3 #Remove from the list the material name and torsname
+                            else:
+                                leng1=len(tmpvals)-1 # Remove from the list the material name (no torsname)
+                            #
+                            begin=True
 
-                        if 'STAINLESS_STEELS' in imat:
-                            f.write(self.writeLineFortran('(A9)',["SLS1.4301"])+"\n")
-                            f.write(self.writeLineFortran('(F15.2,F15.2,F15.2)',[25.,4.,0.4])+"\n")
-                        #
-                        elif 'ALUMINUM' in imat:
-                            f.write(self.writeLineFortran('(A9)',["AL6061_T6"])+"\n")
-                            f.write(self.writeLineFortran('(F15.2,F15.2,F15.2)',[25.,4.,0.7])+"\n")
+                            if 'STAINLESS_STEELS' in imat:
+                                f.write(self.writeLineFortran('(A9)',["SLS1.4301"])+"\n")
+                                f.write(self.writeLineFortran('(F15.2,F15.2,F15.2)',[25.,4.,0.4])+"\n")
+                            #
+                            elif 'ALUMINUM' in imat:
+                                f.write(self.writeLineFortran('(A9)',["AL6061_T6"])+"\n")
+                                f.write(self.writeLineFortran('(F15.2,F15.2,F15.2)',[25.,4.,0.7])+"\n")
+
+                            else:
+                                f.write(self.writeLineFortran('(A10,A10)',[imat,imatg4s])+"\n")
+                                if(leng1>0):
+                                    for i0 in range(leng1):
+                                        key=list(tmpvals[i0].keys())[0]
+                                        if(re.search("^0",key)==None): #Reserved to menus, not to params].keys())[0]
+                                            val0=list(tmpvals[i0].values())[0][0]
+                                            vallst.append(val0)
+                                            if str(val0).replace('.','',1).isdigit():
+                                                format1="F15.2"
+                                            else:
+                                                format1="A15"
+                                            if(begin):
+                                                fmtstr+=format1
+                                                begin=False
+                                            else:
+                                                fmtstr+=","+format1
+                                    fmtstr+=")"
+                                    f.write(self.writeLineFortran(fmtstr,vallst)+"\n")
+                            #
 
-                        else:
-                            f.write(self.writeLineFortran('(A10,A10)',[imat,imatg4s])+"\n")
-                            if(leng1>0):
-                                for i0 in range(leng1):
-                                    key=list(tmpvals[i0].keys())[0]
-                                    if(re.search("^0",key)==None): #Reserved to menus, not to params].keys())[0]
-                                        val0=list(tmpvals[i0].values())[0][0]
-                                        vallst.append(val0)
-                                        if str(val0).replace('.','',1).isdigit():
-                                            format1="F15.2"
-                                        else:
-                                            format1="A15"
-                                        if(begin):
-                                            fmtstr+=format1
-                                            begin=False
-                                        else:
-                                            fmtstr+=","+format1
-                                fmtstr+=")"
-                                f.write(self.writeLineFortran(fmtstr,vallst)+"\n")
                         #
+                        else:# User-defined material
+                            ikey=[i for i in range(len(tmpvals)) if "Filename" in list(tmpvals[i].keys())[0]][0]
+                            fname=list(tmpvals[ikey].values())[0][0]
+                            #
+                            if os.path.exists(os.path.join(self.dir,fname)):
+                                fn=os.path.join(self.dir,fname)
+                            elif os.path.exists(fname):
+                                fn=fname
+                            else:
+                                gmsh.logger.write("User-defined material: Pb with inexistant file:"+fname, level="error")
+                                return -1
+                            f0=open(fn,'r')
+                            #
+                            try:
+                                lines=f0.readlines()
+                                if(lines==[]):
+                                    raise ValueError("Empty file")
+                                tmpl=re.split(r'\s+',lines[0].replace('\n',''))
+                                pattern=re.compile("USER.*[0-9]+$")
+                                if((not len(tmpl)==2) or re.search(pattern,lines[0])==None):
+                                    raise ValueError("First line shall be in the form: USER[X] [nb]")
+                                inam=tmpl[0]
+                                inb=int(tmpl[1])
+                                if(inb+1!=len(lines) or inb<2):
+                                    raise ValueError("Incorrect number of lines")
+                                tmpl=re.split(r'\s+',lines[1].replace('\n','').strip())
+                                print("user-defined len(tmpl)=",len(tmpl))
+                                print("user-defined tmpl=",tmpl)
+                                if(len(tmpl)!=11):
+                                    raise ValueError("Second line shall contain 11 parameters: T,k,c,rho,w,Tstart,Tend,hh,hu,emissiv,r")
+                                for iline in lines[2:]:
+                                    tmpl=re.split(r'\s+',iline.replace('\n',''))
+                                    while '' in tmpl:
+                                        tmpl.remove('')
+                                    if(len(tmpl)!=4):
+                                        raise ValueError("From third line on, it shall contain 4 parameters: T,k,c,rho")
+                                # Success in reading
+                                firstline=True
+                                for iline in lines:
+                                    #f.write(iline)
+                                    if(firstline):
+                                        f.write(self.writeLineFortran('(A12,A12)',[iline.replace('\n',''),imatg4s])+"\n")
+                                        firstline=False
+                                    else:
+                                        f.write(self.writeLineFortran('(A12)',[iline.replace('\n','')])+"\n")
+                            except Exception as emsg:
+                                raise ValueError("User-defined material: Pb in file "+fname+": "+str(emsg))
+                            f0.close()
 
                     #
-                    else:# User-defined material
-                        ikey=[i for i in range(len(tmpvals)) if "Filename" in list(tmpvals[i].keys())[0]][0]
-                        fname=list(tmpvals[ikey].values())[0][0]
+                    else:
+                        torsname=[list(k.values())[0] for k in tmpvals if "torsname" in list(k.keys())[0]][0][0]
                         #
-                        if os.path.exists(os.path.join(self.dir,fname)):
-                            fn=os.path.join(self.dir,fname)
-                        elif os.path.exists(fname):
-                            fn=fname
-                        else:
-                            gmsh.logger.write("User-defined material: Pb with inexistant file:"+fname, level="error")
-                            return -1
-                        f0=open(fn,'r')
+                        # Write imat and not torsname, because SAFIR knows that, and this name is just for better viewing materials in the .IN file
+                        if("DEFINED" in imat):
+                            imat="USER-DEFINED"
+                        f.write(self.writeLineFortran('(A12,A12)',[imat,imatg4s])+"\n")
                         #
-                        try:
-                            lines=f0.readlines()
-                            if(lines==[]):
-                                raise ValueError("Empty file")
-                            tmpl=re.split(r'\s+',lines[0].replace('\n',''))
-                            pattern=re.compile("USER.*[0-9]+$")
-                            if((not len(tmpl)==2) or re.search(pattern,lines[0])==None):
-                                raise ValueError("First line shall be in the form: USER[X] [nb]")
-                            inam=tmpl[0]
-                            inb=int(tmpl[1])
-                            if(inb+1!=len(lines) or inb<2):
-                                raise ValueError("Incorrect number of lines")
-                            tmpl=re.split(r'\s+',lines[1].replace('\n','').strip())
-                            print("user-defined len(tmpl)=",len(tmpl))
-                            print("user-defined tmpl=",tmpl)
-                            if(len(tmpl)!=11):
-                                raise ValueError("Second line shall contain 11 parameters: T,k,c,rho,w,Tstart,Tend,hh,hu,emissiv,r")
-                            for iline in lines[2:]:
-                                tmpl=re.split(r'\s+',iline.replace('\n',''))
-                                while '' in tmpl:
-                                    tmpl.remove('')
-                                if(len(tmpl)!=4):
-                                    raise ValueError("From third line on, it shall contain 4 parameters: T,k,c,rho")
-                            # Success in reading
-                            firstline=True
-                            for iline in lines:
-                                #f.write(iline)
-                                if(firstline):
-                                    f.write(self.writeLineFortran('(A12,A12)',[iline.replace('\n',''),imatg4s])+"\n")
-                                    firstline=False
+                        if(not "INSULATION" in torsname):
+                            #
+                            torsparams=['Young module','Poisson coefficient']
+                            vallst=[];fmtstr="("
+                            for i in range(len(torsparams)):
+                                iparam=torsparams[i]
+
+                                if(i==0):
+                                    fmtstr+="F15.2"
                                 else:
-                                    f.write(self.writeLineFortran('(A12)',[iline.replace('\n','')])+"\n")
-                        except Exception as emsg:
-                            raise ValueError("User-defined material: Pb in file "+fname+": "+str(emsg))
-                        f0.close()
+                                    fmtstr+=",F15.2"
+                                ikey=[i0 for i0 in range(len(tmpvals)) if iparam in list(tmpvals[i0].keys())[0]][0]
+                                vallst.append(list(tmpvals[ikey].values())[0][0])
+                            fmtstr+=")"
+                            f.write(self.writeLineFortran(fmtstr,vallst)+"\n")
+                    #
+            except Exception as emsg:
+                gmsh.logger.write("Pb in writing materials:"+str(emsg), level="error")
+                return -1
 
+            # SERIES 21 (thermal) and SERIES 27 (meca) - Time discretization
+            # Write final elements in .IN file (run duration...)
+            if not (self.isThermal and istorsrun):
+                f.write(self.writeLineFortran('(A10)',['TIME'])+"\n")
                 #
+                if iscomeback:
+                    tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","key","Convergence"),("props","name","TIMESTEP,UPTIME,TIMESTEPMAX")],False)
+                    tstep,uptime,tstepmax=tmp0['values'][0].split(",")
+                    tstep=float(tstep);uptime=float(uptime);tstepmax=float(tstepmax)
+                    f.write(self.writeLineFortran('(I6,I6,I6)',[tstep,uptime,tstepmax])+"\n")
                 else:
-                    torsname=[list(k.values())[0] for k in tmpvals if "torsname" in list(k.keys())[0]][0][0]
-                    #
-                    # Write imat and not torsname, because SAFIR knows that, and this name is just for better viewing materials in the .IN file
-                    if("DEFINED" in imat):
-                        imat="USER-DEFINED"
-                    f.write(self.writeLineFortran('(A12,A12)',[imat,imatg4s])+"\n")
-                    #
-                    if(not "INSULATION" in torsname):
-                        #
-                        torsparams=['Young module','Poisson coefficient']
-                        vallst=[];fmtstr="("
-                        for i in range(len(torsparams)):
-                            iparam=torsparams[i]
+                    tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","key","Convergence"),("props","name","TIMESTEP,UPTIME(1)")],False)
+                    tstep,uptime=tmp0['values'][0].split(",")
+                    tstep=float(tstep);uptime=float(uptime)
+                    f.write(self.writeLineFortran('(I6,I6)',[tstep,uptime])+"\n")
+                    tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","key","Convergence"),("props","name","TIMESTEP,UPTIME(2)")],False)
+                    tstep,uptime=tmp0['values'][0].split(",")
+                    tstep=float(tstep);uptime=float(uptime)
+                    f.write(self.writeLineFortran('(I6,I6)',[tstep,uptime])+"\n")
+                #
+                f.write(self.writeLineFortran('(A10)',['END_TIME'])+"\n")
+                #
 
-                            if(i==0):
-                                fmtstr+="F15.2"
-                            else:
-                                fmtstr+=",F15.2"
-                            ikey=[i0 for i0 in range(len(tmpvals)) if iparam in list(tmpvals[i0].keys())[0]][0]
-                            vallst.append(list(tmpvals[ikey].values())[0][0])
-                        fmtstr+=")"
-                        f.write(self.writeLineFortran(fmtstr,vallst)+"\n")
+            # SERIES 28 (meca) - Thermal elongation
+                if not self.isThermal:
+                    tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","Thermal elongation")],False)
+                    valnum=tmp0['values'][0]
+                    lbls=tmp0['valueLabels']
+                    val0=[k for k,v in lbls.items() if v==valnum][0]
+                    f.write(self.writeLineFortran('(A7)',[val0])+"\n")
                 #
-        except Exception as emsg:
-            gmsh.logger.write("Pb in writing materials:"+str(emsg), level="error")
-            return -1
 
-        # SERIES 21 (thermal) and SERIES 27 (meca) - Time discretization
-        # Write final elements in .IN file (run duration...)
-        if not (self.isThermal and istorsrun):
-            f.write(self.writeLineFortran('(A10)',['TIME'])+"\n")
-            #
-            if iscomeback:
-                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","key","Convergence"),("props","name","TIMESTEP,UPTIME,TIMESTEPMAX")],False)
-                tstep,uptime,tstepmax=tmp0['values'][0].split(",")
-                tstep=float(tstep);uptime=float(uptime);tstepmax=float(tstepmax)
-                f.write(self.writeLineFortran('(I6,I6,I6)',[tstep,uptime,tstepmax])+"\n")
-            else:
-                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","key","Convergence"),("props","name","TIMESTEP,UPTIME(1)")],False)
-                tstep,uptime=tmp0['values'][0].split(",")
-                tstep=float(tstep);uptime=float(uptime)
-                f.write(self.writeLineFortran('(I6,I6)',[tstep,uptime])+"\n")
-                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","key","Convergence"),("props","name","TIMESTEP,UPTIME(2)")],False)
+            # SERIES 22 (thermal) and SERIES 29 (meca) - Output results
+                f.write(self.writeLineFortran('(A10)',['IMPRESSION'])+"\n")
+                f.write(self.writeLineFortran('(A10)',['TIMEPRINT'])+"\n")
+                #
+                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","TIMEPRINT,UPTIMEPRINT")],False)
                 tstep,uptime=tmp0['values'][0].split(",")
                 tstep=float(tstep);uptime=float(uptime)
                 f.write(self.writeLineFortran('(I6,I6)',[tstep,uptime])+"\n")
-            #
-            f.write(self.writeLineFortran('(A10)',['END_TIME'])+"\n")
-            #
+                f.write(self.writeLineFortran('(A10)',['END_TIMEPR'])+"\n")
 
-        # SERIES 28 (meca) - Thermal elongation
+            # Write the different prints
             if not self.isThermal:
-                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","Thermal elongation")],False)
-                valnum=tmp0['values'][0]
-                lbls=tmp0['valueLabels']
-                val0=[k for k,v in lbls.items() if v==valnum][0]
-                f.write(self.writeLineFortran('(A7)',[val0])+"\n")
-            #
-
-        # SERIES 22 (thermal) and SERIES 29 (meca) - Output results
-            f.write(self.writeLineFortran('(A10)',['IMPRESSION'])+"\n")
-            f.write(self.writeLineFortran('(A10)',['TIMEPRINT'])+"\n")
+                oprints=["PRINTDEPL","PRINTTMPRT","PRINTVELAC","PRINTFHE","PRINTREACT","PRINTMN","PRNEIBEAM","PRINTSHELL","PRNNXSHELL","PRNMXSHELL","PRNEASHELL","PRNEISHELL"]
+                #
+                for ipo in oprints:
+                    print('ipo=',ipo)
+                    tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","key","outputs"),("props","name",ipo+ ' Print')],False)
+                    hasprint=tmp0["values"]==[1]
+                    if hasprint:
+                        f.write(self.writeLineFortran('(A10)',[ipo])+"\n")
+                        #
+                        if(ipo=="PRINTDEPL" or ipo=="PRINTFHE"):
+                            tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","key","outputs"),("props","name",ipo+ ' Tstart')],False)
+                            val=int(tmp0["values"][0])
+                            f.write(self.writeLineFortran('(I6)',[val])+"\n")
             #
-            tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("props","name","TIMEPRINT,UPTIMEPRINT")],False)
-            tstep,uptime=tmp0['values'][0].split(",")
-            tstep=float(tstep);uptime=float(uptime)
-            f.write(self.writeLineFortran('(I6,I6)',[tstep,uptime])+"\n")
-            f.write(self.writeLineFortran('(A10)',['END_TIMEPR'])+"\n")
-
-        # Write the different prints
-        if not self.isThermal:
-            oprints=["PRINTDEPL","PRINTTMPRT","PRINTVELAC","PRINTFHE","PRINTREACT","PRINTMN","PRNEIBEAM","PRINTSHELL","PRNNXSHELL","PRNMXSHELL","PRNEASHELL","PRNEISHELL"]
-            #
-            for ipo in oprints:
-                print('ipo=',ipo)
-                tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","key","outputs"),("props","name",ipo+ ' Print')],False)
-                hasprint=tmp0["values"]==[1]
-                if hasprint:
-                    f.write(self.writeLineFortran('(A10)',[ipo])+"\n")
-                    #
-                    if(ipo=="PRINTDEPL" or ipo=="PRINTFHE"):
-                        tmp0=self.getDBValue(self.safirDB,[("children","name",self.pbType),("children","key","outputs"),("props","name",ipo+ ' Tstart')],False)
-                        val=int(tmp0["values"][0])
-                        f.write(self.writeLineFortran('(I6)',[val])+"\n")
-        #
-        f.close()
+            f.close()
+            os.replace(INtmpfile,INpath)
+            INdone=True
+        finally:
+            # Interrupted writing of the .IN file (error, exception or Ctrl-C): the temporary file is removed, the previous .IN file is kept
+            if not INdone:
+                f.close()
+                if(os.path.exists(INtmpfile)):
+                    os.remove(INtmpfile)
 
         gmsh.logger.write("Create SAFIR .IN file with the given parameters... DONE", level="info")
         #
@@ -7037,8 +7173,277 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
                                     isToReverse=self.checkReverse(ient,irev)
                                 if isToReverse:
                                     gmsh.model.mesh.reverse([(1,ient)])
-        gmsh.fltk.update()
-        gmsh.graphics.draw()
+        if not self.nopopup:
+            gmsh.fltk.update()
+            gmsh.graphics.draw()
+
+
+    # Batch mode: list of the cases (GEO file, G4S file) to process
+    def getBatchCases(self):
+        cases=[]
+        if(re.search('.g4s$',self.dir)!=None): # process all GEO files found in the directory with this G4S file
+            g4sfile=self.dir
+            idir=os.path.dirname(g4sfile)
+            gmsh.logger.write("Ok, G4S file, "+os.path.basename(g4sfile)+" is used for all GEO files in the directory.", level="info")
+            tmpfiles=[k for k in os.listdir(idir) if (re.search('.geo$',k)!=None)]
+            if(tmpfiles!=[]):
+                gmsh.logger.write("Ok, found the following GEO files, process them in batch mode:\n"+str(tmpfiles), level="info")
+            for gfile in tmpfiles:
+                cases.append((os.path.join(idir,gfile),g4sfile))
+        #
+        elif(os.path.isdir(self.dir)): # process all couples (GEO,G4S) found in the directory
+            tmpfiles2=[k for k in os.listdir(self.dir) if (re.search('.g4s$',k)!=None)]
+            for ig4s in tmpfiles2:
+                g4sfile=os.path.join(self.dir,ig4s)
+                gfile=g4sfile.replace('g4s','geo')
+                if(os.path.exists(gfile)):
+                    cases.append((gfile,g4sfile))
+                else:
+                    gmsh.logger.write("No GEO found in the folder associated with G4S file "+ig4s, level="warning")
+        #
+        else:
+            msg="-- Batch mode: No G4S file in the directory - need at least one --"
+            gmsh.logger.write(msg+"\n", level="error")
+        return cases
+
+
+    # Content hash (sha256) of a file, read by chunks
+    def getFileHash(self,ifile):
+        h=hashlib.sha256()
+        with open(ifile,'rb') as f:
+            for chunk in iter(lambda: f.read(1024*1024),b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+
+    # Files read by a GEO file: targets of its Include, Merge and ShapeFromFile statements (CAD files, other GEO files...), recursively for the GEO files
+    # Relative paths are taken from the directory of the referencing file, only the existing files are returned (paths built with StrCat... are not resolved)
+    def getGeoInputFiles(self,geofile,found=None):
+        found=[] if found==None else found
+        with open(geofile,'r',errors='replace') as f:
+            txt=f.read()
+        txt=re.sub(r"/\*.*?\*/","",txt,flags=re.S) # comments
+        txt=re.sub(r"//[^\n]*","",txt)
+        for m in re.finditer(r'\b(Include|Merge|ShapeFromFile)\s*\(?\s*"([^"]+)"',txt):
+            ifile=os.path.normpath(os.path.join(os.path.dirname(geofile),m.group(2)))
+            if(os.path.isfile(ifile) and not ifile in found):
+                found.append(ifile)
+                if(m.group(1)=="Include" or ifile.lower().endswith(".geo")):
+                    self.getGeoInputFiles(ifile,found)
+        return found
+
+
+    # Files referenced in the properties assigned in the G4S file (TEM/TSH sections, user-defined materials...): the "Filename" values of contextDB
+    # Relative to the case directory or absolute, as in createIN - only the existing files are returned
+    def getG4sInputFiles(self,g4sfile):
+        idir=os.path.dirname(g4sfile)
+        found=[]
+        def findFiles(tmpg):
+            for iprop in tmpg.get("props",[]):
+                if 'name' in iprop:
+                    continue
+                for ityp in ['ents','pgs']:
+                    for v in iprop.get(ityp,{}).values():
+                        for iv in v:
+                            for k,ival in iv.items():
+                                if("Filename" in k and ival!=[] and isinstance(ival[0],str) and ival[0].strip()!=""):
+                                    fname=ival[0].strip()
+                                    ifile=os.path.join(idir,fname) if os.path.exists(os.path.join(idir,fname)) else fname
+                                    if(os.path.isfile(ifile) and not os.path.normpath(ifile) in found):
+                                        found.append(os.path.normpath(ifile))
+            for ichild in tmpg.get("children",[]):
+                findFiles(ichild)
+        self.getG4sJson(g4sfile)
+        findFiles(self.contextDB)
+        return found
+
+
+    # Batch mode: content hash of all the inputs of a case: GEO, G4S, the files read by the GEO (Include, Merge...) and the files referenced in the G4S (TEM/TSH sections, user-defined materials...)
+    def getBatchCaseHashes(self,geofile,g4sfile):
+        idir=os.path.dirname(geofile)
+        inputs=[geofile,g4sfile]
+        try:
+            refs=self.getGeoInputFiles(geofile)+self.getG4sInputFiles(g4sfile)
+        except Exception as emsg:
+            gmsh.logger.write("Pb in finding the files referenced by "+os.path.basename(geofile)+" or "+os.path.basename(g4sfile)+", only these two files are checked:"+str(emsg), level="warning")
+            refs=[]
+        for ifile in refs:
+            if not ifile in inputs:
+                inputs.append(ifile)
+        #
+        hashes={}
+        for ifile in inputs:
+            try:
+                ikey=os.path.relpath(ifile,idir)
+            except ValueError: # other drive (Windows)
+                ikey=ifile
+            hashes[ikey]=self.getFileHash(ifile)
+        return hashes
+
+
+    # Batch mode: build stamp of a case, written next to the GEO file after a successful createIN
+    def getBatchCaseStampFile(self,geofile):
+        return os.path.splitext(geofile)[0]+".gmsafir.build"
+
+
+    # Batch mode: options of the run that change the .IN file, recorded in the build stamp
+    # GmSAFIR options (-sharelaxnodes) and the mesh options set on the gmsh command line (the mesh options set in the GEO file are covered by its hash)
+    # To be taken before any case is opened: the GEO files of the cases change the gmsh options
+    def getBatchCaseOptions(self):
+        options={"sharelaxnodes":self.shareLAXNodes}
+        for iopt in self.meshCacheOpts:
+            try:
+                options[iopt]=gmsh.option.getNumber(iopt)
+            except Exception:
+                pass
+        return options
+
+
+    # Batch mode: reasons why a case needs to be rebuilt (empty list if the .IN file is up to date)
+    def getBatchCaseRebuildReasons(self,geofile,hashes,options):
+        stampfile=self.getBatchCaseStampFile(geofile)
+        INfile=os.path.join(os.path.dirname(geofile),os.path.basename(geofile).replace(".geo",".IN"))
+        if not os.path.exists(stampfile):
+            return ["no previous build"]
+        if not os.path.exists(INfile):
+            return ["output "+os.path.basename(INfile)+" missing"]
+        try:
+            with open(stampfile,'r') as f:
+                stamp=json.load(f)
+        except Exception:
+            return ["unreadable build stamp"]
+        #
+        reasons=[]
+        if(stamp.get("version")!=self.version):
+            reasons.append("GmSAFIR version changed ("+str(stamp.get("version"))+" -> "+self.version+")")
+        oldoptions=stamp.get("options",{})
+        for iopt in options:
+            if(oldoptions.get(iopt)!=options[iopt]):
+                reasons.append("option changed ("+iopt+": "+str(oldoptions.get(iopt))+" -> "+str(options[iopt])+")")
+        oldhashes=stamp.get("inputs",{})
+        for ifile in hashes:
+            if not ifile in oldhashes:
+                reasons.append(ifile+" added")
+            elif(oldhashes[ifile]!=hashes[ifile]):
+                reasons.append(ifile+" changed")
+        for ifile in oldhashes:
+            if not ifile in hashes:
+                reasons.append(ifile+" removed")
+        return reasons
+
+
+    def writeBatchCaseStamp(self,geofile,hashes,options):
+        with open(self.getBatchCaseStampFile(geofile),'w') as f:
+            json.dump({"version":self.version,"options":options,"inputs":hashes},f,indent=1)
+
+
+    # Mesh cache (-meshcache option): the mesh is saved as [case].gmsafir.msh, with its key in [case].gmsafir.mshkey
+    # Key: hash of the GEO file, of the files it reads (Include, Merge... see getGeoInputFiles) and of the mesh options
+    def getMeshCacheKey(self,geofile):
+        h=hashlib.sha256()
+        for ifile in [geofile]+self.getGeoInputFiles(geofile):
+            h.update((os.path.basename(ifile)+"="+self.getFileHash(ifile)+";").encode())
+        for iopt in self.meshCacheOpts:
+            try:
+                h.update((iopt+"="+repr(gmsh.option.getNumber(iopt))+";").encode())
+            except Exception:
+                pass
+        h.update(("gmsh="+str(gmsh.GMSH_API_VERSION)).encode())
+        return h.hexdigest()
+
+
+    def getMeshCacheFiles(self,geofile):
+        return os.path.splitext(geofile)[0]+".gmsafir.msh",os.path.splitext(geofile)[0]+".gmsafir.mshkey"
+
+
+    def isMeshCacheValid(self,geofile):
+        mshfile,keyfile=self.getMeshCacheFiles(geofile)
+        if not (os.path.exists(mshfile) and os.path.exists(keyfile)):
+            return False
+        with open(keyfile,'r') as f:
+            return f.read().strip()==self.getMeshCacheKey(geofile)
+
+
+    # Merge the cached mesh into the current model when its key matches - returns True if the mesh has been loaded
+    def loadMeshCache(self,geofile):
+        if not self.meshCache or geofile=="" or not os.path.exists(geofile):
+            return False
+        try:
+            if not self.isMeshCacheValid(geofile):
+                return False
+            mshfile,keyfile=self.getMeshCacheFiles(geofile)
+            gmsh.merge(mshfile)
+            gmsh.logger.write("Mesh loaded from cache "+os.path.basename(mshfile), level="info")
+            return True
+        except Exception as emsg:
+            gmsh.logger.write("Pb in loading the mesh cache, the mesh will be generated:"+str(emsg), level="warning")
+            return False
+
+
+    # Save the current mesh in the cache (nothing done if the cache is already up to date)
+    # Only to be called just after the mesh has been generated from the freshly opened GEO file: a mesh edited or regenerated in the GUI may not match the GEO anymore
+    def saveMeshCache(self,geofile):
+        if not self.meshCache or geofile=="" or not os.path.exists(geofile):
+            return
+        try:
+            if self.isMeshCacheValid(geofile):
+                return
+            mshfile,keyfile=self.getMeshCacheFiles(geofile)
+            key=self.getMeshCacheKey(geofile)
+            saveall=gmsh.option.getNumber("Mesh.SaveAll")
+            gmsh.option.setNumber("Mesh.SaveAll",1) # all elements, including those outside physical groups
+            gmsh.write(mshfile)
+            gmsh.option.setNumber("Mesh.SaveAll",saveall)
+            with open(keyfile,'w') as f:
+                f.write(key+"\n")
+        except Exception as emsg:
+            gmsh.logger.write("Pb in saving the mesh cache:"+str(emsg), level="warning")
+
+
+    # GUI: GEO file just opened - its cached mesh is loaded, or its first generated mesh will be saved in the cache (see eventLoop)
+    # Nothing done if the GEO file already generates its mesh (Mesh command)
+    # The curves of the loaded mesh are reoriented (updateReverse) by the event loop, once the G4S file is loaded
+    def openMeshCache(self,geofile):
+        self.meshCachePending=False
+        if not self.meshCache or gmsh.model.mesh.getElements()[1]!=[]:
+            return
+        if self.loadMeshCache(geofile):
+            self.ReverseOnce=True
+        else:
+            self.meshCachePending=True
+
+
+    # Batch mode: process a single case (GEO file, G4S file) in the current gmsh session - returns the createIN return code
+    def runBatchCase(self,geofile,g4sfile):
+        gmsh.clear()
+        gmsh.open(geofile)
+        self.geofile=geofile
+        self.dir=os.path.dirname(geofile)
+        self.g4sfile=g4sfile
+        self.getG4sJson(self.g4sfile)
+        self.updateGeneralLists()
+        self.INfile=os.path.basename(geofile).replace(".geo",".IN")
+        self.isThermal="Thermal" in self.pbType
+        pattern=re.compile("[0-9]")
+        ndims=int(re.search(pattern, self.pbType).group(0))
+        gmsh.model.geo.synchronize()
+        #
+        elemTypes, elemTags, elemNodeTags = gmsh.model.mesh.getElements(0, -1)
+
+        if(elemTags!=[]):
+            gmsh.logger.write("Mesh is already generated from GEO file", level="info")
+        elif(self.loadMeshCache(geofile)):
+            self.updateReverse()
+        else:
+            if(ndims==2):
+                gmsh.model.mesh.generate(2)
+            if(ndims==3):
+                gmsh.model.mesh.generate(3)
+            self.saveMeshCache(geofile) # generated from the GEO in this run: safe to cache
+        #
+            self.updateReverse()
+
+        return self.createIN()
 
 
     def eventLoop(self):
@@ -7052,6 +7457,7 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
         if(tmp!=self.geofile):
             self.geofile=tmp
             gmsh.open(self.geofile)
+            self.openMeshCache(self.geofile)
             self.dir=os.path.dirname(self.geofile)
             #if(TOTO):
             filetmp=os.path.basename(self.geofile)
@@ -7104,6 +7510,11 @@ class Myapp: # Use of class only in order to share 'params' as a global variable
 
         action = gmsh.onelab.getString("ONELAB/Action")
 
+        # Mesh cache: 1st mesh seen after the opening of the GEO file, i.e. generated from it
+        if self.meshCachePending and gmsh.model.mesh.getElements()[1]!=[]:
+            self.meshCachePending=False
+            self.saveMeshCache(self.geofile)
+
         #print(str(gmsh.model.mesh.getElements()[1]!=[] ),str(self.ReverseOnce))
         if gmsh.model.mesh.getElements()[1]!=[] and self.ReverseOnce:
             #print("Mesh is now existing and reverse x' axis has been updated.")
@@ -9929,10 +10340,46 @@ inspectDBstring="""
 # "children":[]
 # }
 
+# Batch mode: run one case with its own log file [case].gmsafir.log (python prints and gmsh messages)
+# The build stamp of the case (input hashes and options) is updated on success, removed on failure
+def runBatchCaseLogged(myapp,case):
+    geofile,g4sfile,hashes,options=case
+    logfile=os.path.splitext(geofile)[0]+".gmsafir.log"
+    t0=time.time()
+    with open(logfile,'w') as flog:
+        with contextlib.redirect_stdout(flog):
+            gmsh.logger.start()
+            try:
+                rc=myapp.runBatchCase(geofile,g4sfile)
+                if(rc==0):
+                    myapp.writeBatchCaseStamp(geofile,hashes,options)
+                elif os.path.exists(myapp.getBatchCaseStampFile(geofile)):
+                    os.remove(myapp.getBatchCaseStampFile(geofile))
+            except Exception as emsg:
+                gmsh.logger.write("Pb in processing "+geofile+":"+str(emsg), level="error")
+                rc=-1
+            for iline in gmsh.logger.get():
+                flog.write(iline+"\n")
+            gmsh.logger.stop()
+    return geofile,rc,logfile,time.time()-t0
+
+
+# Batch mode: each worker process gets its own Myapp (and gmsh session), for a single case (maxtasksperchild=1)
+batchapp=None
+def batchWorkerInit():
+    global batchapp
+    batchapp=Myapp()
+    gmsh.option.setNumber("General.Terminal",0) # messages go to the log of the case
+
+def batchWorkerRun(case):
+    return runBatchCaseLogged(batchapp,case)
+
+
 if __name__ == "__main__":
     print(sys.argv)
 
     myapp=Myapp()
+    rcmain=0
 
     if not myapp.nopopup: # GUI MODE
         gmsh.fltk.initialize()
@@ -9941,80 +10388,45 @@ if __name__ == "__main__":
     else: # BATCH MODE
         gmsh.logger.write("Run GmSAFIR in Batch mode", level="info")
         #
-        if(re.search('.g4s$',myapp.dir)!=None): # process all GEO files found in the directory with this G4S file
-            #
-            myapp.g4sfile=myapp.dir
-            myapp.dir=os.path.dirname(myapp.dir)
-            #
-            tmpfiles2=[k for k in os.listdir(myapp.dir) if (re.search('.g4s$',k)!=None)]
-            gmsh.logger.write("Ok, G4S file, "+os.path.basename(myapp.g4sfile)+" is used for all GEO files in the directory.", level="info")
-            myapp.getG4sJson(myapp.g4sfile) # if existing DB in input director
-            #
-            tmpfiles=[k for k in os.listdir(myapp.dir) if (re.search('.geo$',k)!=None)]
-            if(tmpfiles!=[]):
-                gmsh.logger.write("Ok, found the following GEO files, process them in batch mode:\n"+str(tmpfiles), level="info")
-                #
-                for gfile in tmpfiles:
-                    gmsh.open(os.path.join(myapp.dir,gfile))
-                    myapp.INfile=gfile.replace(".geo",".IN")
-                    myapp.isThermal="Thermal" in myapp.pbType
-                    pattern=re.compile("[0-9]")
-                    ndims=int(re.search(pattern, myapp.pbType).group(0))
-                    gmsh.model.geo.synchronize()
-                    gmsh.model.mesh.synchronize()
-                    #
-                    elemTypes, elemTags, elemNodeTags = gmsh.model.mesh.getElements(0, -1)
-
-                    if(elemTags!=[]):
-                        gmsh.logger.write("Mesh is already generated from GEO file", level="info")
-                    else:
-                        if(ndims==2):
-                            gmsh.model.mesh.generate(2)
-                        if(ndims==3):
-                            gmsh.model.mesh.generate(3)
-                    #
-                        self.updateReverse()
-
-                    myapp.createIN()
-        #
-        elif(os.path.isdir(myapp.dir)): # process all couples (GEO,G4S) found in the directory
-            tmpfiles=[k for k in os.listdir(myapp.dir) if (re.search('.geo$',k)!=None)]
-            tmpfiles2=[k for k in os.listdir(myapp.dir) if (re.search('.g4s$',k)!=None)]
-            for ig4s in tmpfiles2:
-                myapp.g4sfile=os.path.join(myapp.dir,ig4s)
-                gfile=myapp.g4sfile.replace('g4s','geo')
-                #
-                if(os.path.exists(gfile)):
-                    gmsh.open(os.path.join(myapp.dir,gfile))
-                    myapp.getG4sJson(myapp.g4sfile)
-                    myapp.INfile=gfile.replace(".geo",".IN")
-                    myapp.isThermal="Thermal" in myapp.pbType
-                    pattern=re.compile("[0-9]")
-                    ndims=int(re.search(pattern, myapp.pbType).group(0))
-                    gmsh.model.geo.synchronize()
-                    gmsh.model.geo.synchronize()
-                    #
-                    elemTypes, elemTags, elemNodeTags = gmsh.model.mesh.getElements(0, -1)
-
-                    if(elemTags!=[]):
-                        gmsh.logger.write("Mesh is already generated from GEO file", level="info")
-                    else:
-                        if(ndims==2):
-                            gmsh.model.mesh.generate(2)
-                        if(ndims==3):
-                            gmsh.model.mesh.generate(3)
-                    #
-                        self.updateReverse()
-
-                    myapp.createIN()
-                else:
-                    gmsh.logger.write("No GEO found in the folder associated with G4S file "+ig4s, level="warning")
-        #
-        else:
-            msg="-- Batch mode: No G4S file in the directory - need at least one --"
-            gmsh.logger.write(msg+"\n", level="error")
+        allcases=myapp.getBatchCases()
+        #
+        # Incremental build: skip the cases whose inputs did not change since their last successful build (unless -rebuild)
+        cases=[];nskipped=0
+        options=myapp.getBatchCaseOptions()
+        for geofile,g4sfile in allcases:
+            hashes=myapp.getBatchCaseHashes(geofile,g4sfile)
+            reasons=["-rebuild option"] if myapp.rebuildAll else myapp.getBatchCaseRebuildReasons(geofile,hashes,options)
+            if(reasons==[]):
+                gmsh.logger.write("Case "+os.path.basename(geofile)+": up to date, skipped", level="info")
+                nskipped+=1
+            else:
+                gmsh.logger.write("Case "+os.path.basename(geofile)+": rebuild ("+", ".join(reasons)+")", level="info")
+                cases.append((geofile,g4sfile,hashes,options))
+        #
+        nworkers=min(myapp.nworkers,len(cases))
+        results=[]
+        if(nworkers<=1): # in the current process
+            for case in cases:
+                results.append(runBatchCaseLogged(myapp,case))
+                gmsh.logger.write("Case "+os.path.basename(case[0])+": "+("OK" if results[-1][1]==0 else "FAILED"), level="info")
+        elif(cases!=[]): # one process per case (spawn: no gmsh state inherited from this process)
+            gmsh.logger.write("Process "+str(len(cases))+" cases on "+str(nworkers)+" workers...", level="info")
+            with multiprocessing.get_context("spawn").Pool(nworkers,initializer=batchWorkerInit,maxtasksperchild=1) as pool:
+                for res in pool.imap_unordered(batchWorkerRun,cases):
+                    results.append(res)
+                    gmsh.logger.write("Case "+os.path.basename(res[0])+": "+("OK" if res[1]==0 else "FAILED"), level="info")
+        #
+        # Summary
+        nfailed=len([k for k in results if k[1]!=0])
+        msg="Batch mode summary: "+str(len(results)-nfailed)+" succeeded, "+str(nfailed)+" failed, "+str(nskipped)+" up to date"
+        for geofile,rc,logfile,dt in sorted(results):
+            msg+="\n   "+("OK    " if rc==0 else "FAILED")+" "+os.path.basename(geofile)+" ("+"%.1f" % dt+" s) - log: "+logfile
+        gmsh.logger.write(msg, level="info" if nfailed==0 else "error")
+        if(nfailed>0 or allcases==[]):
+            rcmain=1
 
 
         #self.INfile=gfile.replace(".geo",".IN")
 
     gmsh.finalize()
+    sys.exit(rcmain)